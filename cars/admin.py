@@ -1,9 +1,80 @@
-from django.contrib import admin
-from .models import Car, CarMake, CarModel, CarImage, CarInquiry
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from . import cache
+from .forms import BaseCarImageFormSet
+from .importer import detect_format, import_file
+from .listings import save_images
+from .models import Car, CarMake, CarModel, CarImage, CarInquiry, Feature
+from .pagination import CachedCountPaginator
+from .search import search_cars
+from .slugs import save_with_unique_slug
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filter on a foreign key picked through the admin's autocomplete, so the
+    changelist never lists the related table. The related model's admin
+    needs search_fields, as for autocomplete_fields.
+    """
+    template = 'admin/cars/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        if params.get(self.lookup_kwarg) == ['']:
+            # Cleared in the widget
+            del params[self.lookup_kwarg]
+        self.lookup_val = params.get(self.lookup_kwarg, [None])[-1]
+        self.choice_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={
+                'data-width': '100%', 'onchange': 'this.form.submit()',
+            }),
+        )
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def widget(self):
+        # Only the selected object is loaded, to label it
+        return self.choice_field.widget.render(self.lookup_kwarg, self.lookup_val)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            # The other filters, carried over by the widget's form
+            'params': [
+                (name, value)
+                for name, values in changelist.filter_params.items() if name != self.lookup_kwarg
+                for value in values
+            ],
+        }
+
+
+class CarCountPaginator(CachedCountPaginator):
+    namespace = cache.CAR_COUNTS
+
+
+class InquiryCountPaginator(CachedCountPaginator):
+    namespace = cache.INQUIRY_COUNTS
 
 
 class CarImageInline(admin.TabularInline):
     model = CarImage
+    formset = BaseCarImageFormSet
     extra = 3
 
 
@@ -22,18 +93,59 @@ class CarMakeAdmin(admin.ModelAdmin):
 @admin.register(CarModel)
 class CarModelAdmin(admin.ModelAdmin):
     list_display = ('name', 'make')
+    list_select_related = ('make',)
     list_filter = ('make',)
     search_fields = ('name', 'make__name')
+    autocomplete_fields = ('make',)
+
+
+@admin.register(Feature)
+class FeatureAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name', 'slug')
+
+
+class CarAdminForm(forms.ModelForm):
+    class Meta:
+        model = Car
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance._state.adding:
+            self.fields['slug'].required = False
+            self.fields['slug'].help_text = "Leave empty to generate one from the year, make and model."
+
+
+class ImportCarsForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or JSON Lines (.jsonl)")
+    seller = forms.ModelChoiceField(
+        queryset=get_user_model().objects.order_by('username'),
+        widget=AutocompleteSelect(Car._meta.get_field('seller'), admin.site),
+    )
+    create_missing = forms.BooleanField(
+        required=False, initial=True, label="Create unknown makes and models",
+    )
 
 
 @admin.register(Car)
 class CarAdmin(admin.ModelAdmin):
+    form = CarAdminForm
     list_display = ('make', 'model', 'year', 'car_type', 'price', 'is_sold', 'is_featured', 'posted_on')
-    list_filter = ('car_type', 'make', 'is_sold', 'is_featured', 'transmission', 'fuel_type')
-    search_fields = ('make__name', 'model__name', 'description', 'features')
+    # CarModel's __str__ shows its make too
+    list_select_related = ('make', 'model__make')
+    list_filter = (
+        'car_type', ('make', AutocompleteFilter), 'is_sold', 'is_featured', 'transmission', 'fuel_type',
+    )
+    # Searches go through the full-text index instead, see get_search_results
+    search_fields = ('slug',)
+    autocomplete_fields = ('make', 'model', 'seller')
     readonly_fields = ('posted_on', 'updated_on')
-    prepopulated_fields = {'slug': ('year', 'make', 'model')}
     inlines = [CarImageInline]
+    # Newest first by primary key, which needs no extra index over all cars
+    ordering = ('-id',)
+    paginator = CarCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         ('Basic Information', {
@@ -54,10 +166,104 @@ class CarAdmin(admin.ModelAdmin):
         }),
     )
 
+    @property
+    def media(self):
+        # The changelist doesn't collect its list filters' media
+        return super().media + AutocompleteSelect(Car._meta.get_field('make'), self.admin_site).media
+
+    def get_queryset(self, request):
+        # Autocomplete results are labelled with str(car) too. (The changelist
+        # skips list_select_related once this has joined anything.)
+        return super().get_queryset(request).select_related(*self.list_select_related)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_cars(queryset, search_term), False
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            super().save_model(request, obj, form, change)
+        else:
+            save_with_unique_slug(obj, base=obj.slug or None)
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is CarImage:
+            # Same ordering and bulk insert as the seller's own form
+            save_images(formset)
+        else:
+            super().save_formset(request, form, formset, change)
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='cars_car_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """
+        Bulk import from an uploaded file. Responds with the rejected rows as
+        a CSV download when some rows couldn't be imported.
+        """
+        if not self.has_add_permission(request):
+            return redirect('admin:cars_car_changelist')
+
+        form = ImportCarsForm(request.POST or None, request.FILES or None, initial={'seller': request.user})
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            result = import_file(
+                stream,
+                form.cleaned_data['seller'],
+                detect_format(upload.name),
+                create_missing=form.cleaned_data['create_missing'],
+            )
+            self.message_user(
+                request,
+                f"Imported {result.created} cars in {result.elapsed:.1f}s "
+                f"({result.rows_per_second:.0f} rows/s).",
+                messages.SUCCESS,
+            )
+            if not result.errors:
+                return redirect('admin:cars_car_changelist')
+
+            self.message_user(request, f"{len(result.errors)} rows were rejected.", messages.WARNING)
+            response = HttpResponse(content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="import-errors.csv"'
+            result.write_errors(response)
+            return response
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': "Import cars",
+        }
+        return TemplateResponse(request, 'admin/cars/car/import_cars.html', context)
+
 
 @admin.register(CarInquiry)
 class CarInquiryAdmin(admin.ModelAdmin):
     list_display = ('name', 'car', 'email', 'phone', 'created_at', 'responded')
+    list_select_related = ('car__make', 'car__model')
     list_filter = ('responded', 'created_at')
-    search_fields = ('name', 'email', 'phone', 'message', 'car__make__name', 'car__model__name')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    # Searches are by exact email or by car, see get_search_results
+    search_fields = ('email',)
+    autocomplete_fields = ('car',)
+    readonly_fields = ('created_at',)
+    paginator = InquiryCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        An email address finds that sender's inquiries through the email
+        index; anything else finds the inquiries about matching cars through
+        the cars' full-text index. Substring scans over a million messages
+        aren't offered.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if '@' in term:
+            return queryset.filter(email=term), False
+        cars = search_cars(Car.objects.all(), term).values('pk')
+        return queryset.filter(car__in=cars), False
\ No newline at end of file
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Cached data is grouped into namespaces. Each namespace has a generation
+# number baked into its keys; bumping the generation orphans every entry at
+# once (they simply expire) instead of having to find and delete them.
+# Generations only reach every worker through a shared cache, which is why
+# prod settings require Redis; the local memory cache is for one process.
+HOME = 'home'
+MAKES = 'makes'
+LISTINGS = 'listings'
+DETAIL = 'detail'
+# Result counts of the admin changelists
+CAR_COUNTS = 'car-counts'
+INQUIRY_COUNTS = 'inquiry-counts'
+
+NAMESPACES = (HOME, MAKES, LISTINGS, DETAIL, CAR_COUNTS, INQUIRY_COUNTS)
+
+
+def _generation_key(namespace):
+    return f'cars:gen:{namespace}'
+
+
+def get_generation(namespace):
+    return cache.get_or_set(_generation_key(namespace), 1, None)
+
+
+def bump_generation(*namespaces):
+    for namespace in namespaces:
+        try:
+            cache.incr(_generation_key(namespace))
+        except ValueError:
+            # Never set (or evicted); any fresh value invalidates old keys
+            # as long as it differs from what they were built with.
+            cache.set(_generation_key(namespace), 2, None)
+
+
+def bump_generation_on_commit(*namespaces):
+    """
+    ``bump_generation`` once the current transaction commits (at once outside
+    one). Bumped any earlier, a concurrent request could still read the rows
+    as they were and cache them under the new generation.
+    """
+    transaction.on_commit(lambda: bump_generation(*namespaces))
+
+
+def _count(namespace, outcome):
+    key = f'cars:stats:{namespace}:{outcome}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def cached(namespace, key, producer, timeout=None):
+    """
+    Return the cached value for ``key`` in ``namespace``, calling
+    ``producer()`` to build and store it on a miss.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'CAR_CACHE_TIMEOUT', 60 * 60)
+    full_key = f'cars:{namespace}:{get_generation(namespace)}:{key}'
+    value = cache.get(full_key)
+    if value is not None:
+        _count(namespace, 'hits')
+        return value
+    _count(namespace, 'misses')
+    value = producer()
+    cache.set(full_key, value, timeout)
+    return value
+
+
+def cache_stats():
+    """
+    Hit and miss counters per namespace, with the resulting hit rate.
+    """
+    stats = {}
+    for namespace in NAMESPACES:
+        hits = cache.get(f'cars:stats:{namespace}:hits', 0)
+        misses = cache.get(f'cars:stats:{namespace}:misses', 0)
+        total = hits + misses
+        stats[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None,
+            'generation': get_generation(namespace),
+        }
+    return stats
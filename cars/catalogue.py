@@ -0,0 +1,149 @@
+"""
+In-memory index of every make and model, for typeahead and for the make and
+model selects. Names are kept in sorted arrays, so a prefix lookup is a
+bisect plus a short walk.
+
+Each process builds the index on first use and rebuilds it when the MAKES
+cache generation moves, which signals bump on any make or model change, or
+once it is CATALOGUE_MAX_AGE seconds old: a change made by another process
+only moves the generation this one sees if they share the cache.
+"""
+import hashlib
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from . import cache
+from .models import CarMake, CarModel
+
+
+def _fold(name):
+    return name.casefold()
+
+
+def _prefix_search(keys, prefix, limit):
+    """
+    ``keys`` is a sorted list of ``(folded name, id)``. Returns the ids of
+    the names starting with ``prefix``, in name order.
+    """
+    prefix = _fold(prefix)
+    ids = []
+    for name, pk in keys[bisect_left(keys, (prefix,)):]:
+        if not name.startswith(prefix) or (limit is not None and len(ids) >= limit):
+            break
+        ids.append(pk)
+    return ids
+
+
+class Catalogue:
+    def __init__(self, makes, models, generation=None):
+        """
+        ``makes`` are ``(id, name)`` pairs, ``models`` ``(id, make_id, name)``
+        triples.
+        """
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+        self.make_names = dict(makes)
+        self.model_names = {}
+        self.model_makes = {}
+        by_make = defaultdict(list)
+        for pk, make_id, name in models:
+            self.model_names[pk] = name
+            self.model_makes[pk] = make_id
+            by_make[make_id].append((_fold(name), pk))
+
+        self._makes = sorted((_fold(name), pk) for pk, name in self.make_names.items())
+        self._models = sorted((_fold(name), pk) for pk, name in self.model_names.items())
+        self._models_by_make = {make_id: sorted(keys) for make_id, keys in by_make.items()}
+        # Identifies the contents, whichever process loaded them (for ETags)
+        self.version = hashlib.md5(
+            repr((sorted(self.make_names.items()), sorted(self.model_makes.items()),
+                  sorted(self.model_names.items()))).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+
+    @classmethod
+    def load(cls, generation=None):
+        return cls(
+            CarMake.objects.values_list('id', 'name'),
+            CarModel.objects.values_list('id', 'make_id', 'name'),
+            generation,
+        )
+
+    def make_choices(self):
+        return [(pk, self.make_names[pk]) for _, pk in self._makes]
+
+    def model_choices(self, make_id):
+        return [(pk, self.model_names[pk]) for _, pk in self._models_by_make.get(make_id, [])]
+
+    def search_makes(self, prefix='', limit=None):
+        return [(pk, self.make_names[pk]) for pk in _prefix_search(self._makes, prefix, limit)]
+
+    def search_models(self, prefix='', make_id=None, limit=None):
+        keys = self._models if make_id is None else self._models_by_make.get(make_id, [])
+        return [(pk, self.model_names[pk]) for pk in _prefix_search(keys, prefix, limit)]
+
+    def resolve_make(self, value):
+        """
+        The id of the make ``value`` names, by id or by exact name ignoring
+        case; None when there's no such make.
+        """
+        value = str(value).strip()
+        if value.isdigit():
+            return int(value) if int(value) in self.make_names else None
+        matches = [pk for pk in _prefix_search(self._makes, value, None) if _fold(self.make_names[pk]) == _fold(value)]
+        return matches[0] if matches else None
+
+    def resolve_model(self, value, make_id=None):
+        """
+        Like ``resolve_make``, for a model of ``make_id`` if given.
+        """
+        value = str(value).strip()
+        if value.isdigit():
+            pk = int(value)
+            if pk in self.model_names and make_id in (None, self.model_makes[pk]):
+                return pk
+            return None
+        for pk, name in self.search_models(value, make_id):
+            if _fold(name) == _fold(value):
+                return pk
+        return None
+
+
+_catalogue = None
+_lock = threading.Lock()
+
+
+def get_catalogue():
+    """
+    This process's catalogue, rebuilt first if makes or models changed or
+    it's too old.
+    """
+    global _catalogue
+    generation = cache.get_generation(cache.MAKES)
+
+    def stale():
+        max_age = getattr(settings, 'CATALOGUE_MAX_AGE', 300)
+        return (
+            _catalogue is None
+            or _catalogue.generation != generation
+            or time.monotonic() - _catalogue.loaded_at >= max_age
+        )
+
+    if stale():
+        with _lock:
+            if stale():
+                _catalogue = Catalogue.load(generation)
+    return _catalogue
+
+
+def reset_catalogue():
+    """
+    Drop this process's catalogue, so the next use loads it afresh.
+    """
+    global _catalogue
+    with _lock:
+        _catalogue = None
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import cache
+from .models import Car, CarInquiry
+from .tasks import refresh_similar_cars
+
+DASHBOARD_PAGE_SIZE = 24
+
+ACTIVE = 'active'
+SOLD = 'sold'
+STATUSES = (ACTIVE, SOLD)
+
+
+def _inquiry_stat(aggregate, **filters):
+    """
+    ``aggregate`` over the inquiries of the outer car, as a correlated
+    subquery. Unlike a JOIN + GROUP BY over all the seller's cars, it is
+    only evaluated for the rows on the page, each from the inquiry index.
+    """
+    inquiries = (
+        CarInquiry.objects.filter(car=OuterRef('pk'), **filters)
+        .order_by()
+        .values('car')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    return Subquery(inquiries)
+
+
+def seller_listings(seller, status=None):
+    """
+    ``seller``'s cars, newest first, ready to render on the dashboard: card
+    data plus ``view_count``, ``inquiry_count``, ``open_inquiry_count`` and
+    ``latest_inquiry_at``, all in the same query. View counts lag behind by
+    up to a flush interval (see cars.tracking). Narrowed to ACTIVE or SOLD
+    cars when ``status`` says so.
+    """
+    queryset = (
+        Car.objects.with_card_data()
+        .filter(seller=seller)
+        .annotate(
+            view_count=Coalesce(F('stats__views'), Value(0)),
+            inquiry_count=Coalesce(_inquiry_stat(Count('id')), Value(0), output_field=IntegerField()),
+            open_inquiry_count=Coalesce(
+                _inquiry_stat(Count('id'), responded=False), Value(0), output_field=IntegerField()
+            ),
+            latest_inquiry_at=_inquiry_stat(Max('created_at')),
+        )
+        .order_by('-posted_on', '-id')
+    )
+    if status in STATUSES:
+        queryset = queryset.filter(is_sold=status == SOLD)
+    return queryset
+
+
+def listing_counts(seller):
+    """
+    How many cars ``seller`` has in total, still for sale and sold, in one
+    aggregate query.
+    """
+    return Car.objects.filter(seller=seller).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_sold=False)),
+        sold=Count('id', filter=Q(is_sold=True)),
+    )
+
+
+def mark_sold(seller, car_ids):
+    """
+    Mark every unsold car in ``car_ids`` that belongs to ``seller`` as sold
+    with one UPDATE. Other ids are ignored. Returns the number of cars
+    marked.
+
+    A queryset update sends no signals, so this does what saving each car
+    would have: drop the cached listings and refresh the similar cars.
+    """
+    cars = Car.objects.filter(seller=seller, pk__in=car_ids, is_sold=False)
+    sold_ids = list(cars.values_list('pk', flat=True))
+    if not sold_ids:
+        return 0
+    Car.objects.filter(pk__in=sold_ids).update(is_sold=True, updated_on=timezone.now())
+    cache.bump_generation(cache.HOME, cache.LISTINGS)
+    transaction.on_commit(lambda: refresh_similar_cars.delay(sold_ids))
+    return len(sold_ids)
+
+
+def delete_listings(seller, car_ids):
+    """
+    Delete every car in ``car_ids`` that belongs to ``seller``, with its
+    images and inquiries. Returns the number of cars deleted.
+    """
+    deleted = Car.objects.filter(seller=seller, pk__in=car_ids).delete()[1]
+    return deleted.get(Car._meta.label, 0)
@@ -0,0 +1,177 @@
+"""
+Counts for the list page's filter sidebar: how many cars each option would
+leave given the other filters in force. A facet ignores its own filter, so
+the counts of the options that aren't picked stay visible.
+
+All fixed-option facets (car type, transmission, fuel type, price and year
+buckets) are counted in one query with a filtered COUNT per option; makes
+take a second, grouped query. Counts are cached per normalized filter
+state until the inventory changes.
+"""
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.db.models import Count, Q
+
+from .cache import LISTINGS, cached
+from .filters import filter_conditions
+from .models import Car
+from .search import search_cars
+
+# Inclusive (min, max) ranges, matching the min_/max_ filters a bucket sets
+PRICE_BUCKETS = [
+    (None, Decimal('10000')),
+    (Decimal('10000'), Decimal('20000')),
+    (Decimal('20000'), Decimal('35000')),
+    (Decimal('35000'), Decimal('50000')),
+    (Decimal('50000'), None),
+]
+YEAR_BUCKETS = [
+    (None, 2009),
+    (2010, 2014),
+    (2015, 2019),
+    (2020, None),
+]
+
+CHOICE_FACETS = {
+    'car_type': Car.CAR_TYPE_CHOICES,
+    'transmission': Car.TRANSMISSION_CHOICES,
+    'fuel_type': Car.FUEL_TYPE_CHOICES,
+}
+RANGE_FACETS = {
+    'price': ('price', PRICE_BUCKETS),
+    'year': ('year', YEAR_BUCKETS),
+}
+
+# Filter parameters that pick an option in each facet
+FACET_PARAMS = {
+    'car_type': ('car_type',),
+    'make': ('make',),
+    'transmission': ('transmission',),
+    'fuel_type': ('fuel_type',),
+    'price': ('min_price', 'max_price'),
+    'year': ('min_year', 'max_year'),
+}
+
+
+def _range_condition(field, low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(**{f'{field}__gte': low})
+    if high is not None:
+        condition &= Q(**{f'{field}__lte': high})
+    return condition
+
+
+def _others(conditions, facet):
+    """
+    Every filter in ``conditions`` except ``facet``'s own.
+    """
+    combined = Q()
+    for key, condition in conditions.items():
+        if key != facet:
+            combined &= condition
+    return combined
+
+
+def compute_facet_counts(data, query=''):
+    """
+    Count the unsold cars for every facet option under cleaned
+    ``CarFilterForm`` data and an optional search ``query``.
+    """
+    queryset = Car.objects.filter(is_sold=False)
+    if query:
+        queryset = search_cars(queryset, query)
+    conditions = filter_conditions(data)
+    # Filters without a facet of their own narrow every count alike
+    for key in list(conditions):
+        if key not in FACET_PARAMS:
+            queryset = queryset.filter(conditions.pop(key))
+
+    aggregates = {}
+    for facet, choices in CHOICE_FACETS.items():
+        others = _others(conditions, facet)
+        for value, _ in choices:
+            aggregates[f'{facet}:{value}'] = Count('id', filter=others & Q(**{facet: value}))
+    for facet, (field, buckets) in RANGE_FACETS.items():
+        others = _others(conditions, facet)
+        for index, (low, high) in enumerate(buckets):
+            aggregates[f'{facet}:{index}'] = Count('id', filter=others & _range_condition(field, low, high))
+    totals = queryset.aggregate(**aggregates)
+
+    counts = {facet: {} for facet in FACET_PARAMS}
+    for key, count in totals.items():
+        facet, value = key.split(':')
+        counts[facet][int(value) if facet in RANGE_FACETS else value] = count
+
+    makes = queryset.filter(_others(conditions, 'make')).order_by().values_list('make').annotate(count=Count('id'))
+    counts['make'] = dict(makes)
+    return counts
+
+
+def facet_cache_key(data, query=''):
+    """
+    The same key for equivalent filter states, whatever order or blank
+    parameters their URLs had.
+    """
+    items = sorted((key, str(value)) for key, value in data.items() if value not in (None, ''))
+    if query:
+        items.append(('q', query.strip().lower()))
+    return urlencode(items)
+
+
+def facet_counts(data, query=''):
+    return cached(LISTINGS, f'facets:{facet_cache_key(data, query)}', lambda: compute_facet_counts(data, query))
+
+
+def _range_label(low, high, money):
+    def show(value):
+        return f'${value:,.0f}' if money else str(value)
+    if low is None:
+        return f'Under {show(high)}' if money else f'{show(high)} or older'
+    if high is None:
+        return f'{show(low)}+'
+    return f'{show(low)} – {show(high)}'
+
+
+def build_facets(counts, params, makes):
+    """
+    Sidebar-ready facets: for each one a list of options with a ``label``,
+    ``count`` and ``selected`` flag. Range buckets also get the ``query``
+    string that applies them on top of the current ``params`` (a QueryDict).
+    """
+    def selected(facet, values):
+        return [params.get(name, '') for name in FACET_PARAMS[facet]] == [
+            '' if value is None else str(value) for value in values
+        ]
+
+    facets = {}
+    for facet, choices in CHOICE_FACETS.items():
+        facets[facet] = [
+            {'value': value, 'label': label, 'count': counts[facet].get(value, 0),
+             'selected': selected(facet, [value])}
+            for value, label in choices
+        ]
+    facets['make'] = [
+        {'value': make.pk, 'label': make.name, 'count': counts['make'].get(make.pk, 0),
+         'selected': selected('make', [make.pk])}
+        for make in makes
+    ]
+    for facet, (field, buckets) in RANGE_FACETS.items():
+        options = []
+        for index, (low, high) in enumerate(buckets):
+            query = params.copy()
+            for name in ('page', 'cursor'):
+                query.pop(name, None)
+            for name, value in zip(FACET_PARAMS[facet], (low, high)):
+                query[name] = '' if value is None else str(value)
+            options.append({
+                'label': _range_label(low, high, money=field == 'price'),
+                'count': counts[facet].get(index, 0),
+                'selected': selected(facet, [low, high]),
+                'query': urlencode(sorted(
+                    (key, value) for key, values in query.lists() for value in values if value
+                )),
+            })
+        facets[facet] = options
+    return facets
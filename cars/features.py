@@ -0,0 +1,127 @@
+"""
+The feature catalogue: each car's free-text ``features`` parsed into links
+to shared Feature rows, so cars can be filtered by feature from an index
+instead of by matching text.
+
+Features are separated by commas or new lines. Each car's links are kept in
+step with its text by ``sync_features``, which the post_save signal and the
+importer call.
+"""
+import unicodedata
+
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils.text import slugify
+
+from .cache import MAKES, cached
+from .models import Car, CarFeature, Feature
+
+MAX_NAME_LENGTH = Feature._meta.get_field('name').max_length
+
+# Share of all cars above which a feature counts as common, see
+# features_condition
+COMMON_FEATURE_SHARE = 0.05
+
+
+def feature_slug(name):
+    """
+    The slug of a feature called ``name``. Accents are folded away, so
+    "Climatisation élec" and "Climatisation elec" are one feature, but
+    letters with no ASCII form (Cyrillic, CJK, ß...) are kept rather than
+    dropped.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    return slugify(''.join(char for char in decomposed if not unicodedata.combining(char)), allow_unicode=True)
+
+
+def parse_features(text):
+    """
+    The ``(slug, name)`` pairs ``text`` lists, in order, each slug once.
+    """
+    features = {}
+    for line in (text or '').splitlines():
+        for part in line.split(','):
+            name = ' '.join(part.split())[:MAX_NAME_LENGTH]
+            slug = feature_slug(name)[:MAX_NAME_LENGTH]
+            if slug and slug not in features:
+                features[slug] = name
+    return list(features.items())
+
+
+def feature_ids(names_by_slug):
+    """
+    Map each slug in ``names_by_slug`` to its Feature id, adding the
+    features the catalogue doesn't have yet under the given names.
+    """
+    if not names_by_slug:
+        return {}
+    Feature.objects.bulk_create(
+        [Feature(slug=slug, name=name) for slug, name in names_by_slug.items()],
+        ignore_conflicts=True,
+    )
+    return dict(Feature.objects.filter(slug__in=names_by_slug).values_list('slug', 'id'))
+
+
+def sync_features(cars):
+    """
+    Link each of ``cars`` to exactly the features its text lists.
+    """
+    parsed = {car.pk: parse_features(car.features) for car in cars}
+    names = {}
+    for features in parsed.values():
+        for slug, name in features:
+            names.setdefault(slug, name)
+    ids = feature_ids(names)
+    wanted = {(car_id, ids[slug]) for car_id, features in parsed.items() for slug, _ in features}
+
+    existing = {}
+    for pk, car_id, feature_id in CarFeature.objects.filter(car_id__in=parsed).values_list('pk', 'car', 'feature'):
+        existing[car_id, feature_id] = pk
+    stale = [pk for link, pk in existing.items() if link not in wanted]
+    if stale:
+        CarFeature.objects.filter(pk__in=stale).delete()
+    CarFeature.objects.bulk_create(
+        [CarFeature(car_id=car_id, feature_id=feature_id) for car_id, feature_id in wanted - existing.keys()],
+        ignore_conflicts=True,
+    )
+
+
+def feature_stats():
+    """
+    How many cars there are, and how many have each feature (by Feature id),
+    counted from the feature index. Cached with the make and model catalogue,
+    so the counts can lag behind new listings by up to the cache timeout.
+    """
+    def count():
+        links = CarFeature.objects.order_by().values_list('feature').annotate(cars=Count('*'))
+        return {'cars': Car.objects.count(), 'features': dict(links)}
+    return cached(MAKES, 'feature-stats', count)
+
+
+def features_condition(ids):
+    """
+    A condition matching the cars that have every feature in ``ids``.
+
+    Each feature is an EXISTS probe of the (car, feature) index. When even
+    the rarest feature asked for is common, that's all: walking the page's
+    sort order and probing finds a page after a few rows. Otherwise the cars
+    come from the rarest feature's index entries, with probes for the rest,
+    rather than walking most of the table to find the few matches.
+    """
+    stats = feature_stats()
+    ids = sorted(ids, key=lambda pk: stats['features'].get(pk, 0))
+    has_feature = [Exists(CarFeature.objects.filter(car=OuterRef('pk'), feature_id=pk)) for pk in ids]
+    if stats['features'].get(ids[0], 0) > COMMON_FEATURE_SHARE * stats['cars']:
+        return Q(*has_feature)
+    return Q(Q(pk__in=CarFeature.objects.filter(feature_id=ids[0]).values('car')), *has_feature[1:])
+
+
+def popular_features(limit=12):
+    """
+    The ``limit`` features on the most cars, for the filter sidebar.
+    """
+    counts = feature_stats()['features']
+    top = sorted(counts, key=lambda pk: -counts[pk])[:limit]
+    features = sorted(Feature.objects.filter(pk__in=top), key=lambda feature: (-counts[feature.pk], feature.name))
+    for feature in features:
+        feature.car_count = counts[feature.pk]
+    return features
@@ -0,0 +1,69 @@
+from urllib.parse import urlencode
+
+from django.db.models import Q
+
+from .features import features_condition
+
+
+def normalize_query(params):
+    """
+    Canonical form of a request's query parameters: blank values dropped and
+    everything sorted, so equivalent URLs share a cache key.
+    """
+    return urlencode(sorted(
+        (key, value) for key, values in params.lists() for value in values if value
+    ))
+
+
+def filter_conditions(data):
+    """
+    The conditions that cleaned ``CarFilterForm`` data puts on cars, keyed
+    by the facet each one narrows (see cars.facets). Range bounds share a
+    key: ``price`` holds both ``min_price`` and ``max_price``.
+    """
+    conditions = {}
+
+    def add(key, condition):
+        conditions[key] = conditions[key] & condition if key in conditions else condition
+
+    if data.get('make'):
+        add('make', Q(make_id=data['make']))
+
+    if data.get('model'):
+        add('model', Q(model_id=data['model']))
+
+    if data.get('car_type'):
+        add('car_type', Q(car_type=data['car_type']))
+
+    if data.get('min_price'):
+        add('price', Q(price__gte=data['min_price']))
+
+    if data.get('max_price'):
+        add('price', Q(price__lte=data['max_price']))
+
+    if data.get('min_year'):
+        add('year', Q(year__gte=data['min_year']))
+
+    if data.get('max_year'):
+        add('year', Q(year__lte=data['max_year']))
+
+    if data.get('transmission'):
+        add('transmission', Q(transmission=data['transmission']))
+
+    if data.get('fuel_type'):
+        add('fuel_type', Q(fuel_type=data['fuel_type']))
+
+    if data.get('feature'):
+        add('feature', features_condition(data['feature']))
+
+    return conditions
+
+
+def filter_cars(queryset, data):
+    """
+    Apply cleaned ``CarFilterForm`` data to a Car queryset. Makes, models
+    and features are matched by id; cars must have every feature asked for.
+    """
+    for condition in filter_conditions(data).values():
+        queryset = queryset.filter(condition)
+    return queryset
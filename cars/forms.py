@@ -1,8 +1,12 @@
 from django import forms
-from .models import Car, CarInquiry, CarImage
+from django.urls import reverse_lazy
+
+from .catalogue import get_catalogue
+from .models import Car, CarInquiry, CarImage, CarModel, Feature
 
 
 class CarFilterForm(forms.Form):
+    # By id, or by name for older links; cleaned to the id either way
     make = forms.CharField(required=False)
     model = forms.CharField(required=False)
     car_type = forms.ChoiceField(
@@ -21,15 +25,57 @@ class CarFilterForm(forms.Form):
         choices=[('', 'All')] + list(Car.FUEL_TYPE_CHOICES),
         required=False
     )
+    # Feature slugs, any number of them; cleaned to the Feature ids
+    feature = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+
+    def clean_feature(self):
+        value = self.cleaned_data['feature'] or []
+        slugs = sorted({slug for slug in ([value] if isinstance(value, str) else value) if slug})
+        if not slugs:
+            return []
+        ids = dict(Feature.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+        unknown = [slug for slug in slugs if slug not in ids]
+        if unknown:
+            # CarListView then leaves out the feature filter, not the others
+            raise forms.ValidationError("Unknown feature: %(slugs)s.", params={'slugs': ', '.join(unknown)})
+        return sorted(ids.values())
+
+    def clean(self):
+        cleaned_data = super().clean()
+        make = cleaned_data.get('make')
+        if make:
+            cleaned_data['make'] = get_catalogue().resolve_make(make)
+            if cleaned_data['make'] is None:
+                self.add_error('make', "Unknown make.")
+        model = cleaned_data.get('model')
+        if model:
+            cleaned_data['model'] = get_catalogue().resolve_model(model, cleaned_data.get('make'))
+            if cleaned_data['model'] is None:
+                self.add_error('model', "Unknown model.")
+        return cleaned_data
 
 
 class CarForm(forms.ModelForm):
     class Meta:
         model = Car
-        exclude = ['seller', 'is_featured', 'is_sold', 'posted_on', 'updated_on']
+        exclude = ['seller', 'is_featured', 'is_sold', 'posted_on', 'updated_on', 'feature_tags']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # New listings get a slug allocated on save when this is left empty
+        self.fields['slug'].required = not self.instance._state.adding
+
+        # Makes and models are listed from the in-memory catalogue, and only
+        # the chosen make's models at that; the browser fetches another
+        # make's models when it changes. The querysets are for validation.
+        catalogue = get_catalogue()
+        make_id = catalogue.resolve_make(self['make'].value() or '')
+        blank = [('', '---------')]
+        self.fields['make'].choices = blank + catalogue.make_choices()
+        self.fields['model'].queryset = CarModel.objects.filter(make_id=make_id)
+        self.fields['model'].choices = blank + catalogue.model_choices(make_id)
+        self.fields['make'].widget.attrs['data-models-url'] = reverse_lazy('catalogue-json')
+
         # Make specific fields not required for New cars
         if self.data.get('car_type') == Car.NEW:
             self.fields['mileage'].required = False
@@ -43,9 +89,22 @@ class CarImageForm(forms.ModelForm):
         fields = ['image', 'is_primary']
 
 
+class BaseCarImageFormSet(forms.BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        # The carimage_one_primary constraint would reject the save otherwise
+        primaries = [
+            form for form in self.forms
+            if form.cleaned_data.get('is_primary') and not self._should_delete_form(form)
+        ]
+        if len(primaries) > 1:
+            raise forms.ValidationError("Only one image can be the primary image.")
+
+
 CarImageFormSet = forms.inlineformset_factory(
     Car, CarImage,
     form=CarImageForm,
+    formset=BaseCarImageFormSet,
     extra=5,
     can_delete=True
 )
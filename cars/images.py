@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import os
+from collections import namedtuple
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+Spec = namedtuple('Spec', ['width', 'height', 'crop'])
+
+# Cropped specs fill their box exactly (listing cards); the others fit inside
+# their box and keep the photo's aspect ratio (gallery, hero, zoom). A srcset
+# only ever mixes specs of the same kind, so the browser never swaps aspect
+# ratios under a layout.
+CAR_IMAGE_DERIVATIVES = {
+    'thumb': Spec(300, 220, True),
+    'card': Spec(600, 440, True),
+    'gallery': Spec(1024, 768, False),
+    'hero': Spec(1600, 1000, False),
+    'zoom': Spec(2400, 1800, False),
+}
+
+MAKE_LOGO_DERIVATIVES = {
+    'logo': Spec(120, 120, False),
+    'logo-large': Spec(240, 240, False),
+}
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+Image.init()
+AVIF_SUPPORTED = 'AVIF' in Image.SAVE
+
+
+def derivative_name(source_name, preset, extension, content=None):
+    """
+    Storage name of one derivative. With ``content``, the name carries a hash
+    of it (``front-card.3f2a9c1b7d4e.webp``), so a URL always refers to the
+    same bytes and can be cached indefinitely.
+    """
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    digest = f'.{hashlib.md5(content, usedforsecurity=False).hexdigest()[:12]}' if content is not None else ''
+    return os.path.join(directory, 'derivatives', f'{stem}-{preset}{digest}.{extension}')
+
+
+def _resize(image, spec):
+    if spec.crop:
+        return ImageOps.fit(image, (spec.width, spec.height), Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail((spec.width, spec.height), Image.LANCZOS)
+    return resized
+
+
+def _flatten(image, background=(255, 255, 255)):
+    """
+    JPEG has no alpha channel; composite transparent images onto white.
+    """
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        flattened = Image.new('RGB', image.size, background)
+        flattened.paste(image, mask=image.getchannel('A'))
+        return flattened
+    return image.convert('RGB')
+
+
+def _save(image, source_name, preset, extension, fmt, storage, **params):
+    buffer = BytesIO()
+    image.save(buffer, fmt, **params)
+    content = buffer.getvalue()
+    name = derivative_name(source_name, preset, extension, content)
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def render_derivatives(field_file, specs, storage=None):
+    """
+    Build every derivative in ``specs`` for an uploaded image and return the
+    metadata to store on the model: source dimensions plus, per preset, the
+    stored file names and pixel size of each format.
+    """
+    storage = storage or default_storage
+    with field_file.open('rb') as f:
+        source = Image.open(f)
+        source = ImageOps.exif_transpose(source)
+        source.load()
+
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if source.mode in ('LA', 'P', 'PA') else 'RGB')
+
+    derivatives = {
+        'source': field_file.name,
+        'width': source.width,
+        'height': source.height,
+    }
+    for preset, spec in specs.items():
+        resized = _resize(source, spec)
+        entry = {
+            'width': resized.width,
+            'height': resized.height,
+            'webp': _save(resized, field_file.name, preset, 'webp', 'WEBP', storage,
+                          quality=WEBP_QUALITY, method=4),
+            'jpeg': _save(_flatten(resized), field_file.name, preset, 'jpg', 'JPEG', storage,
+                          quality=JPEG_QUALITY, optimize=True, progressive=True),
+        }
+        if AVIF_SUPPORTED:
+            entry['avif'] = _save(resized, field_file.name, preset, 'avif', 'AVIF', storage,
+                                  quality=AVIF_QUALITY)
+        derivatives[preset] = entry
+    return derivatives
+
+
+def delete_derivatives(derivatives, storage=None):
+    storage = storage or default_storage
+    for entry in derivatives.values():
+        if not isinstance(entry, dict):
+            continue
+        for key in ('webp', 'jpeg', 'avif'):
+            if entry.get(key):
+                storage.delete(entry[key])
+
+
+def needs_derivatives(instance):
+    field_file = getattr(instance, instance.derivative_field)
+    return bool(field_file) and instance.derivatives.get('source') != field_file.name
+
+
+def generate_derivatives(instance, force=False):
+    """
+    Render and store derivatives for a CarImage or CarMake whose source image
+    changed (or always, with ``force``). Saves with a queryset update so no
+    save signals fire again. Returns True if anything was generated.
+    """
+    if not force and not needs_derivatives(instance):
+        return False
+    field_file = getattr(instance, instance.derivative_field)
+    if not field_file or not field_file.storage.exists(field_file.name):
+        return False
+
+    # Drop the previous set first: re-rendering identical pixels produces
+    # the same hashed names.
+    delete_derivatives(instance.derivatives)
+    try:
+        derivatives = render_derivatives(field_file, instance.derivative_specs)
+    except OSError:
+        # Missing or unreadable source; templates fall back to the original.
+        logger.warning("Could not render derivatives for %s", field_file.name, exc_info=True)
+        derivatives = {}
+
+    instance.derivatives = derivatives
+    updates = {'derivatives': derivatives}
+    if hasattr(instance, 'width'):
+        instance.width, instance.height = derivatives.get('width'), derivatives.get('height')
+        updates.update(width=instance.width, height=instance.height)
+    type(instance).objects.filter(pk=instance.pk).update(**updates)
+    return bool(derivatives)
+
+
+def srcset(derivatives, preset, fmt):
+    """
+    ``srcset`` value for ``fmt`` over every derivative that is cropped the
+    same way as ``preset``.
+    """
+    specs = CAR_IMAGE_DERIVATIVES if preset in CAR_IMAGE_DERIVATIVES else MAKE_LOGO_DERIVATIVES
+    crop = specs[preset].crop
+    candidates = {}
+    for name, entry in derivatives.items():
+        # Small sources aren't upscaled, so several presets can share a width.
+        if name in specs and specs[name].crop == crop and entry.get(fmt):
+            candidates.setdefault(entry['width'], entry[fmt])
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w' for width, name in sorted(candidates.items())
+    )
+
+
+def derivative_url(instance, preset, fmt='webp'):
+    """
+    URL of one derivative of a CarImage or CarMake logo, or of the original
+    upload if it hasn't been processed yet.
+    """
+    field_file = getattr(instance, instance.derivative_field)
+    entry = instance.derivatives.get(preset)
+    if not entry or not entry.get(fmt):
+        return field_file.url
+    return field_file.storage.url(entry[fmt])
@@ -0,0 +1,239 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from . import cache
+from .features import sync_features
+from .models import Car, CarMake, CarModel
+from .search import index_cars
+from .slugs import allocate_slugs, car_base_slug, resync_counters
+from .tasks import refresh_similar_cars
+
+# Columns read from each row; make and model are given by name.
+IMPORT_FIELDS = [
+    'make', 'model', 'year', 'car_type', 'price', 'mileage', 'engine_capacity', 'transmission',
+    'fuel_type', 'color', 'doors', 'seats', 'features', 'description', 'country_of_origin',
+    'recondition_status',
+]
+
+REQUIRED_FIELDS = ['make', 'model']
+
+FORMATS = ('csv', 'jsonl')
+
+
+def read_csv(stream):
+    """
+    Yield ``(line number, row)`` pairs from a CSV file with a header row.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(stream):
+    """
+    Yield ``(line number, row)`` pairs from a file with one JSON object per
+    line. Lines that aren't JSON objects come through as their error message.
+    """
+    for line_num, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = f"Invalid JSON: {e}"
+        else:
+            if not isinstance(row, dict):
+                row = "Expected a JSON object"
+        yield line_num, row
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return 'jsonl' if extension in ('jsonl', 'ndjson', 'json') else 'csv'
+
+
+class RowError(Exception):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows(self):
+        return self.created + len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def write_errors(self, stream):
+        """
+        Write one CSV line per rejected row: its line number in the source
+        file and what was wrong with it.
+        """
+        writer = csv.writer(stream)
+        writer.writerow(['line', 'error'])
+        writer.writerows(self.errors)
+
+
+class CarImporter:
+    """
+    Bulk inventory import for one seller. Rows are validated against the Car
+    model fields and inserted with ``bulk_create``, one transaction per batch.
+    Makes and models are looked up by name (case-insensitively) through an
+    in-memory cache, and created on first sight unless ``create_missing`` is
+    off. Slugs are allocated in bulk: one query per batch for the bases it
+    hasn't seen before.
+    """
+
+    def __init__(self, seller, batch_size=1000, create_missing=True):
+        self.seller = seller
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.created_lookups = False
+        self.fields = {name: Car._meta.get_field(name) for name in IMPORT_FIELDS if name not in ('make', 'model')}
+        # Valid values of the choice fields, checked without a full clean()
+        self.choices = {
+            name: {value for value, _ in field.flatchoices}
+            for name, field in self.fields.items() if field.choices
+        }
+        self.makes = {make.name.lower(): make for make in CarMake.objects.all()}
+        self.models = {
+            (model.make_id, model.name.lower()): model
+            for model in CarModel.objects.all()
+        }
+
+    def get_make(self, name):
+        make = self.makes.get(name.lower())
+        if make is None:
+            if not self.create_missing:
+                raise RowError(f"Unknown make '{name}'")
+            make = self.makes[name.lower()] = CarMake.objects.create(name=name)
+            self.created_lookups = True
+        return make
+
+    def get_model(self, make, name):
+        key = (make.pk, name.lower())
+        model = self.models.get(key)
+        if model is None:
+            if not self.create_missing:
+                raise RowError(f"Unknown model '{name}' for {make.name}")
+            model = self.models[key] = CarModel.objects.create(make=make, name=name)
+            self.created_lookups = True
+        return model
+
+    def build_car(self, row):
+        if isinstance(row, str):
+            raise RowError(row)
+        row = {key.strip().lower(): value for key, value in row.items() if key}
+        names = {}
+        for name in REQUIRED_FIELDS:
+            value = str(row.get(name) or '').strip()
+            if not value:
+                raise RowError(f"{name}: This field is required.")
+            names[name] = value
+
+        values = {}
+        errors = []
+        for name, field in self.fields.items():
+            value = row.get(name)
+            if isinstance(value, float):
+                # Go through the shortest repr so 1.8 doesn't become 1.800000000000000044
+                value = str(value)
+            if isinstance(value, str):
+                value = value.strip()
+                if name in self.choices:
+                    value = value.lower()
+                    if value in self.choices[name]:
+                        values[name] = value
+                        continue
+            if value in (None, '') and field.has_default():
+                continue
+            if value == '':
+                value = None if field.null else ''
+            try:
+                values[name] = field.clean(value, None)
+            except ValidationError as e:
+                errors.append(f"{name}: {' '.join(e.messages)}")
+        if errors:
+            raise RowError('; '.join(errors))
+
+        make = self.get_make(names['make'])
+        model = self.get_model(make, names['model'])
+        return Car(make=make, model=model, seller=self.seller, **values)
+
+    def run(self, rows):
+        """
+        Import every ``(line number, row)`` pair from ``rows`` and return an
+        ImportResult.
+        """
+        result = ImportResult()
+        started = time.perf_counter()
+        created_ids = []
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.batch_size))
+            if not chunk:
+                break
+            cars = []
+            for line_num, row in chunk:
+                try:
+                    cars.append(self.build_car(row))
+                except RowError as e:
+                    result.errors.append((line_num, str(e)))
+            if cars:
+                self.insert(cars)
+                result.created += len(cars)
+                created_ids.extend(car.pk for car in cars)
+
+        if result.created:
+            cache.bump_generation(cache.HOME, cache.LISTINGS, cache.CAR_COUNTS)
+            # Nor do the similar cars see bulk inserts
+            transaction.on_commit(lambda: refresh_similar_cars.delay(created_ids))
+        if self.created_lookups:
+            cache.bump_generation(cache.MAKES)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def insert(self, cars, attempts=3):
+        bases = [car_base_slug(car) for car in cars]
+        for attempt in range(attempts):
+            for car, slug in zip(cars, allocate_slugs(bases)):
+                car.slug = slug
+            try:
+                # bulk_create skips the save signals, so index the batch here
+                with transaction.atomic():
+                    Car.objects.bulk_create(cars)
+                    index_cars(cars)
+                    sync_features(cars)
+                return
+            except IntegrityError:
+                # One of the slugs was taken by hand, ahead of its counter;
+                # allocate again past every slug in use
+                if attempt == attempts - 1:
+                    raise
+                resync_counters(bases)
+                for car in cars:
+                    car.pk = None
+
+
+def import_file(stream, seller, fmt='csv', **kwargs):
+    """
+    Import cars from an open text file in one of ``FORMATS``.
+    """
+    return CarImporter(seller, **kwargs).run(READERS[fmt](stream))
@@ -0,0 +1,63 @@
+from django.db.models import Count, Q
+
+from . import cache
+from .models import Car, CarInquiry
+
+INBOX_PAGE_SIZE = 25
+
+# Newest first; id breaks ties between inquiries sent in the same instant.
+INBOX_ORDERING = ['-created_at', '-id']
+
+OPEN = 'open'
+RESPONDED = 'responded'
+STATUSES = (OPEN, RESPONDED)
+
+
+def seller_inquiries(seller, car_id=None, status=None):
+    """
+    Inquiries about ``seller``'s cars, newest first, joined to the car,
+    make and model they're about. Narrowed to one car and/or to OPEN or
+    RESPONDED inquiries, which the (car, responded, created_at) index
+    serves directly.
+    """
+    queryset = (
+        CarInquiry.objects.filter(car__seller=seller)
+        .select_related('car__make', 'car__model')
+        .order_by(*INBOX_ORDERING)
+    )
+    if car_id:
+        queryset = queryset.filter(car_id=car_id)
+    if status in STATUSES:
+        queryset = queryset.filter(responded=status == RESPONDED)
+    return queryset
+
+
+def inquiry_counts(seller):
+    """
+    ``seller``'s cars that have inquiries, each annotated with
+    ``inquiry_count`` and ``open_count``, in a single aggregate query.
+    Cars with open inquiries come first.
+    """
+    return (
+        Car.objects.filter(seller=seller)
+        .select_related('make', 'model')
+        .annotate(
+            inquiry_count=Count('inquiries'),
+            open_count=Count('inquiries', filter=Q(inquiries__responded=False)),
+        )
+        .filter(inquiry_count__gt=0)
+        .order_by('-open_count', '-inquiry_count', '-id')
+    )
+
+
+def mark_responded(seller, inquiry_ids, responded=True):
+    """
+    Set ``responded`` on every inquiry in ``inquiry_ids`` that is about one
+    of ``seller``'s cars, with one UPDATE. Other ids are ignored. Returns
+    the number of inquiries matched.
+    """
+    updated = CarInquiry.objects.filter(pk__in=inquiry_ids, car__seller=seller).update(responded=responded)
+    # UPDATE sends no post_save, so the admin's counts by status are dropped here
+    if updated:
+        cache.bump_generation(cache.INQUIRY_COUNTS)
+    return updated
@@ -0,0 +1,65 @@
+"""
+Saving a listing from the car form and its image formset.
+
+Both are validated before anything is written, and everything is written in
+one transaction: the car, then its images, with every new image inserted by
+a single bulk INSERT. On SQLite that is one commit, so one fsync, per
+listing instead of one per row.
+"""
+from django.db import transaction
+
+from . import cache
+from .images import needs_derivatives
+from .models import CarImage
+from .slugs import save_with_unique_slug
+from .tasks import process_image_derivatives
+
+
+def save_listing(form, formset, seller=None):
+    """
+    Save the car of a valid ``CarForm`` and the images of its valid
+    ``CarImageFormSet``. A new car is given to ``seller`` and saved under a
+    free slug (the one typed in, or one generated from year, make and
+    model). Returns the car.
+    """
+    with transaction.atomic():
+        car = form.save(commit=False)
+        if car._state.adding:
+            car.seller = seller
+            save_with_unique_slug(car, base=car.slug or None)
+        else:
+            car.save()
+        form.save_m2m()
+
+        formset.instance = car
+        save_images(formset)
+    return car
+
+
+def save_images(formset):
+    """
+    Apply a valid ``CarImageFormSet``: delete the removed images, update the
+    changed ones and insert the new ones in one statement.
+    """
+    images = formset.save(commit=False)
+    deleted = [image.pk for image in formset.deleted_objects]
+    if deleted:
+        CarImage.objects.filter(pk__in=deleted).delete()
+
+    # Demote before promoting, so the car never has two primary images
+    # in between (see the carimage_one_primary constraint)
+    changed = sorted((image for image in images if image.pk), key=lambda image: image.is_primary)
+    for image in changed:
+        image.save()
+
+    new = [image for image in images if not image.pk]
+    if not new:
+        return
+    # bulk_create sends no post_save, so do what its receivers would have
+    CarImage.objects.bulk_create(new)
+    cache.bump_generation_on_commit(cache.HOME, cache.LISTINGS, cache.DETAIL)
+    for image in new:
+        if needs_derivatives(image):
+            transaction.on_commit(
+                lambda pk=image.pk: process_image_derivatives.delay(CarImage._meta.label, pk)
+            )
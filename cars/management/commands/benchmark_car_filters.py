@@ -0,0 +1,198 @@
+import random
+import re
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from cars.features import sync_features
+from cars.filters import filter_cars
+from cars.forms import CarFilterForm
+from cars.models import Car, CarMake, CarModel
+
+User = get_user_model()
+
+MAKES = {
+    'Toyota': ['Corolla', 'Camry', 'Prius', 'RAV4', 'Hilux'],
+    'Honda': ['Civic', 'Accord', 'CR-V', 'Fit', 'Vezel'],
+    'Nissan': ['Sunny', 'X-Trail', 'Leaf', 'Note', 'Patrol'],
+    'Mitsubishi': ['Pajero', 'Lancer', 'Outlander', 'Mirage'],
+    'BMW': ['320i', '530e', 'X1', 'X5'],
+    'Mercedes-Benz': ['C200', 'E300', 'GLA', 'GLE'],
+    'Hyundai': ['Elantra', 'Tucson', 'Santa Fe', 'Ioniq'],
+    'Ford': ['Focus', 'Ranger', 'Escape', 'Mustang'],
+}
+
+# Seeded features and the share of cars that have each
+FEATURES = {
+    'Bluetooth': 0.8,
+    'Air conditioning': 0.7,
+    'Sunroof': 0.3,
+    'Leather seats': 0.2,
+    'Head-up display': 0.01,
+}
+
+# Every CarFilterForm field on its own, plus the combinations the sidebar
+# produces most often.
+FILTER_CASES = [
+    ('no filters', {}),
+    ('car_type', {'car_type': Car.USED}),
+    ('make', {'make': 'Toyota'}),
+    ('make + model', {'make': 'Toyota', 'model': 'Corolla'}),
+    ('min_price', {'min_price': '40000'}),
+    ('max_price', {'max_price': '8000'}),
+    ('price range', {'min_price': '15000', 'max_price': '16000'}),
+    ('min_year', {'min_year': '2023'}),
+    ('max_year', {'max_year': '2002'}),
+    ('year range', {'min_year': '2010', 'max_year': '2011'}),
+    ('transmission', {'transmission': Car.CVT}),
+    ('fuel_type', {'fuel_type': Car.ELECTRIC}),
+    ('transmission + fuel_type', {'transmission': Car.MANUAL, 'fuel_type': Car.DIESEL}),
+    ('feature', {'feature': 'sunroof'}),
+    ('features', {'feature': ['sunroof', 'bluetooth']}),
+    ('car_type + price range', {'car_type': Car.NEW, 'min_price': '15000', 'max_price': '20000'}),
+    ('car_type + year range', {'car_type': Car.RECONDITIONED, 'min_year': '2015', 'max_year': '2016'}),
+    ('all filters', {
+        'make': 'Honda', 'car_type': Car.USED, 'min_price': '5000', 'max_price': '30000',
+        'min_year': '2010', 'max_year': '2020', 'transmission': Car.AUTOMATIC, 'fuel_type': Car.PETROL,
+    }),
+]
+
+FULL_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN cars_car\b(?! USING)'),  # SQLite
+    re.compile(r'Seq Scan on cars_car\b'),  # PostgreSQL
+]
+
+
+def is_full_scan(plan):
+    return any(pattern.search(plan) for pattern in FULL_SCAN_PATTERNS)
+
+
+def seed_cars(count, rng, batch_size=5000):
+    """
+    Fill the current database with ``count`` random cars over a fixed set of
+    makes and models, then refresh the planner statistics.
+    """
+    seller = User.objects.create_user('benchmark-seller')
+    models_by_make = []
+    for make_name, model_names in MAKES.items():
+        make = CarMake.objects.create(name=make_name)
+        for model_name in model_names:
+            models_by_make.append((make, CarModel.objects.create(make=make, name=model_name)))
+
+    # posted_on is auto_now_add; switch that off so listings get spread-out dates.
+    posted_on = Car._meta.get_field('posted_on')
+    posted_on.auto_now_add = False
+    now = timezone.now()
+    try:
+        for start in range(0, count, batch_size):
+            cars = []
+            for i in range(start, min(start + batch_size, count)):
+                make, model = rng.choice(models_by_make)
+                cars.append(Car(
+                    make=make,
+                    model=model,
+                    year=rng.randint(1995, 2025),
+                    car_type=rng.choice([Car.NEW, Car.RECONDITIONED, Car.USED]),
+                    price=Decimal(rng.randint(2_000, 80_000)),
+                    mileage=rng.randint(0, 250_000),
+                    engine_capacity=Decimal(rng.choice(['1.0', '1.5', '1.8', '2.0', '3.0'])),
+                    transmission=rng.choice([Car.AUTOMATIC, Car.MANUAL, Car.CVT]),
+                    fuel_type=rng.choice([Car.PETROL, Car.DIESEL, Car.HYBRID, Car.ELECTRIC]),
+                    color=rng.choice(['White', 'Black', 'Silver', 'Red', 'Blue']),
+                    features=', '.join(name for name, share in FEATURES.items() if rng.random() < share),
+                    description='Benchmark listing',
+                    seller=seller,
+                    is_featured=rng.random() < 0.02,
+                    is_sold=rng.random() < 0.3,
+                    posted_on=now - timedelta(minutes=i),
+                    slug=f'benchmark-{i}',
+                ))
+            Car.objects.bulk_create(cars)
+            sync_features(cars)
+    finally:
+        posted_on.auto_now_add = True
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with cars and report the query plan and "
+        "timings of every CarFilterForm combination used by CarListView"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cars', type=int, default=200_000,
+                            help="Number of cars to seed (default: 200000)")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Timed runs per query; the median is reported (default: 5)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            started = time.perf_counter()
+            seed_cars(options['cars'], random.Random(options['seed']))
+            self.stdout.write(f"Seeded {options['cars']} cars in {time.perf_counter() - started:.1f}s")
+            failures, skipped = self.run_cases(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Not benchmarked (invalid filters): {', '.join(skipped)}"))
+        if failures:
+            self.stdout.write(self.style.ERROR(f"Full table scans: {', '.join(failures)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No filter path does a full table scan of cars_car"))
+
+    def time_query(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def run_cases(self, repeat):
+        """
+        Time and explain every case; returns the labels of the cases that
+        scan the whole table, and of those skipped as invalid.
+        """
+        failures, skipped = [], []
+        for label, params in FILTER_CASES:
+            form = CarFilterForm(params)
+            if not form.is_valid():
+                # Timing what's left of the filters would pass the unfiltered
+                # query off under this label
+                skipped.append(label)
+                self.stdout.write(self.style.WARNING(f"{label:<28} skipped: {form.errors.as_text()}"))
+                continue
+            queryset = filter_cars(Car.objects.filter(is_sold=False), form.cleaned_data)
+            page = queryset[:12]
+
+            page_ms = self.time_query(lambda: list(page.all()), repeat)
+            count_ms = self.time_query(queryset.count, repeat)
+            page_plan = page.explain()
+            count_plan = queryset.order_by().values('pk').explain()
+            full_scan = is_full_scan(page_plan) or is_full_scan(count_plan)
+            if full_scan:
+                failures.append(label)
+
+            status = self.style.ERROR('FULL SCAN') if full_scan else self.style.SUCCESS('indexed')
+            self.stdout.write(
+                f"{label:<28} rows={queryset.count():>7}  page={page_ms:7.2f}ms  "
+                f"count={count_ms:7.2f}ms  {status}"
+            )
+            for title, plan in (('page', page_plan), ('count', count_plan)):
+                self.stdout.write(f"    {title} plan:")
+                for line in plan.splitlines():
+                    self.stdout.write(f"      {line}")
+        return failures, skipped
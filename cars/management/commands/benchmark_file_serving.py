@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from core.serve import serve_media
+
+
+def consume(response):
+    """
+    Read the whole body the way a WSGI server would, returning its size.
+    """
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    response.close()
+    return size
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare serving a media file through django.views.static.serve (the "
+        "DEBUG-only path) with core.serve.serve_media"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000,
+                            help="Requests per case (default: 2000)")
+        parser.add_argument('--size', type=int, default=250_000,
+                            help="Size of the served file in bytes (default: 250000)")
+
+    def handle(self, *args, **options):
+        root = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(root, 'cars', 'derivatives'))
+            name = 'cars/derivatives/photo-card.0123456789ab.webp'
+            with open(os.path.join(root, name), 'wb') as f:
+                f.write(os.urandom(options['size']))
+            with override_settings(MEDIA_ROOT=root):
+                self.run(root, name, options['requests'])
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def run(self, root, name, count):
+        factory = RequestFactory()
+        first = serve_media(factory.get('/'), name)
+        etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+        consume(first)
+
+        cases = [
+            ("full GET", {}),
+            ("revalidate (If-None-Match)", {'HTTP_IF_NONE_MATCH': etag}),
+            ("revalidate (If-Modified-Since)", {'HTTP_IF_MODIFIED_SINCE': last_modified}),
+            ("range (64 KiB)", {'HTTP_RANGE': 'bytes=0-65535'}),
+        ]
+        views = [
+            ("static.serve", lambda request: serve(request, name, document_root=root)),
+            ("serve_media", lambda request: serve_media(request, name)),
+        ]
+        self.stdout.write(f"{'case':<32} {'view':<14} {'req/s':>9} {'status':>7} {'bytes':>9}")
+        for label, headers in cases:
+            for view_label, view in views:
+                self.measure(label, view_label, view, factory.get('/', **headers), count)
+        with override_settings(X_ACCEL_REDIRECT_PREFIX='/internal/'):
+            self.measure("full GET", "X-Accel", lambda request: serve_media(request, name),
+                         factory.get('/'), count)
+
+    def measure(self, label, view_label, view, request, count):
+        started = time.perf_counter()
+        for _ in range(count):
+            response = view(request)
+            size = consume(response)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label:<32} {view_label:<14} {count / elapsed:9.0f} {response.status_code:>7} {size:>9}"
+        )
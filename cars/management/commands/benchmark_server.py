@@ -0,0 +1,137 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from cars.models import Car
+from core.gunicorn_config import PROFILES
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Start gunicorn under each worker profile from core/gunicorn_config.py "
+        "and load-test the home, listing and detail pages, reporting req/s and "
+        "latency percentiles. Serves whatever database the settings point at: "
+        "use a copy with realistic data, never production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Concurrent keep-alive clients (default: 8)")
+        parser.add_argument('--duration', type=float, default=10,
+                            help="Seconds of load per page (default: 10)")
+        parser.add_argument('--workers', type=int,
+                            help="Worker processes (default: the profile's CPU-based count)")
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        car = Car.objects.filter(is_sold=False).order_by('-id').first()
+        if car is None:
+            raise CommandError("The database has no unsold cars to request")
+        pages = [
+            ('home', reverse('home')),
+            ('list', reverse('car-list')),
+            ('detail', car.get_absolute_url()),
+        ]
+        self.stdout.write(
+            f"{'profile':<9} {'page':<7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for profile in options['profiles']:
+            server = self.start(profile, options)
+            try:
+                for label, path in pages:
+                    self.load(profile, label, path, options)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def start(self, profile, options):
+        env = {
+            **os.environ,
+            'GUNICORN_PROFILE': profile,
+            'PORT': str(options['port']),
+            'GUNICORN_ACCESS_LOG': '',
+            'GUNICORN_LOG_LEVEL': 'warning',
+        }
+        if options['workers']:
+            env['WEB_CONCURRENCY'] = str(options['workers'])
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'python:core.gunicorn_config'], env=env,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn ({profile}) exited with status {server.returncode}")
+            try:
+                with socket.create_connection(('127.0.0.1', options['port']), timeout=1):
+                    return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"gunicorn ({profile}) didn't start listening within 60s")
+
+    def load(self, profile, label, path, options):
+        port = options['port']
+        # Warm up every worker's connection and caches
+        warmup = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        for _ in range(20):
+            warmup.request('GET', path)
+            warmup.getresponse().read()
+        warmup.close()
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + options['duration']
+
+        def client():
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            mine, failed = [], 0
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path)
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    ok = False
+                if ok:
+                    mine.append(time.perf_counter() - started)
+                else:
+                    failed += 1
+            conn.close()
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if not latencies:
+            self.stdout.write(f"{profile:<9} {label:<7} {'-':>8} {'-':>8} {'-':>8} {sum(errors):>7}")
+            return
+        self.stdout.write(
+            f"{profile:<9} {label:<7} {len(latencies) / elapsed:8.1f} "
+            f"{statistics.median(latencies) * 1000:8.1f} {percentile(latencies, 0.99) * 1000:8.1f} "
+            f"{sum(errors):>7}"
+        )
@@ -0,0 +1,63 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from cars import recommendations
+from cars.models import Car, SimilarCar
+
+from .benchmark_car_filters import is_full_scan, seed_cars
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with cars and time a full rebuild of the "
+        "similar cars, an incremental refresh and the detail page lookup"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cars', type=int, default=100_000,
+                            help="Number of cars to seed (default: 100000)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            started = time.perf_counter()
+            seed_cars(options['cars'], random.Random(options['seed']))
+            self.stdout.write(f"Seeded {options['cars']} cars in {time.perf_counter() - started:.1f}s")
+            self.run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def timed(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f"{label:<32} {(time.perf_counter() - started) * 1000:10.1f}ms")
+        return result
+
+    def run(self):
+        matrix = self.timed("load feature matrix", recommendations.FeatureMatrix.load)
+        self.timed("score one car against all", lambda: matrix.scores([0]))
+        self.timed("compute all neighbours", lambda: sum(1 for _ in matrix.neighbours(np.arange(len(matrix)))))
+        self.timed("full rebuild (compute + store)", recommendations.rebuild)
+        self.stdout.write(f"{'stored neighbours':<32} {SimilarCar.objects.count():>10}")
+
+        car = Car.objects.filter(is_sold=False).order_by('id').first()
+        car.price = car.price * 2
+        Car.objects.filter(pk=car.pk).update(price=car.price)
+        affected = self.timed("refresh after a price change", lambda: recommendations.refresh([car.pk]))
+        self.stdout.write(f"{'lists recomputed':<32} {affected:>10}")
+
+        query = recommendations.similar_cars(car)
+        self.timed("detail page lookup", lambda: list(query.all()))
+        plan = query.explain()
+        if is_full_scan(plan):
+            self.stdout.write(self.style.ERROR("Detail page lookup scans cars_car:"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Detail page lookup is index-only on cars_car:"))
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
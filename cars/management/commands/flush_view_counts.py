@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from cars.tracking import flush, get_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the buffered listing view counts to CarStats. Only the shared "
+        "Redis buffer is reachable from here; without Redis every web process "
+        "flushes its own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Cars per UPDATE (default: 500)")
+
+    def handle(self, *args, **options):
+        if not get_buffer().shared:
+            self.stdout.write(self.style.WARNING("The cache isn't Redis: there's no shared buffer to flush"))
+            return
+        views = flush(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {views} views"))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars import cache
+from cars.images import generate_derivatives, needs_derivatives
+from cars.models import PROCESSING_FAILED, PROCESSING_READY, CarImage, CarMake
+from cars.tasks import process_image_derivatives
+
+
+class Command(BaseCommand):
+    help = "Render resized WebP/JPEG derivatives for existing car photos and make logos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Re-render derivatives that already exist")
+        parser.add_argument('--queue', action='store_true',
+                            help="Hand each image to a Celery worker instead of rendering inline")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        for label, queryset in (
+            ('car images', CarImage.objects.exclude(image='')),
+            ('make logos', CarMake.objects.exclude(logo='').exclude(logo__isnull=True)),
+        ):
+            generated = skipped = queued = 0
+            for instance in queryset.order_by('pk').iterator(chunk_size=200):
+                if options['queue'] and (options['force'] or needs_derivatives(instance)):
+                    process_image_derivatives.delay(instance._meta.label, instance.pk, options['force'])
+                    queued += 1
+                    continue
+                if not options['queue'] and generate_derivatives(instance, force=options['force']):
+                    generated += 1
+                else:
+                    skipped += 1
+                # The task records its own outcome; skipped images are ready
+                # if they already had derivatives
+                status = PROCESSING_READY if instance.derivatives else PROCESSING_FAILED
+                if instance.processing_status != status:
+                    type(instance).objects.filter(pk=instance.pk).update(processing_status=status)
+            if options['queue']:
+                self.stdout.write(f"{label}: {queued} queued, {skipped} skipped")
+            else:
+                self.stdout.write(f"{label}: {generated} rendered, {skipped} skipped")
+
+        # Cached pages still point at the original uploads
+        cache.bump_generation(*cache.NAMESPACES)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Done in {elapsed:.1f}s"))
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cars.importer import FORMATS, detect_format, import_file
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Import a dealer's inventory from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row, or a .jsonl file")
+        parser.add_argument('--seller', required=True, help="Username the cars are listed under")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="File format (default: guessed from the extension)")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Cars inserted per transaction (default: 1000)")
+        parser.add_argument('--no-create', action='store_true',
+                            help="Reject rows with an unknown make or model instead of creating it")
+        parser.add_argument('--errors', metavar='PATH',
+                            help="Where to write rejected rows (default: <path>.errors.csv)")
+
+    def handle(self, *args, **options):
+        try:
+            seller = User.objects.get(username=options['seller'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['seller']}'")
+
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                result = import_file(
+                    stream, seller, fmt,
+                    batch_size=options['batch_size'],
+                    create_missing=not options['no_create'],
+                )
+        except OSError as e:
+            raise CommandError(e)
+
+        self.stdout.write(
+            f"Read {result.rows} rows in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s)"
+        )
+        if result.errors:
+            errors_path = options['errors'] or f'{path}.errors.csv'
+            with open(errors_path, 'w', newline='', encoding='utf-8') as stream:
+                result.write_errors(stream)
+            self.stdout.write(self.style.WARNING(
+                f"Rejected {len(result.errors)} rows; see {errors_path}"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Imported {result.created} cars"))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents for every car"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of cars indexed per INSERT (default: 1000)")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild_index(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} cars in {elapsed:.2f}s"))
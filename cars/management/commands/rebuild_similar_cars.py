@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars.recommendations import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed similar cars of every listing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Cars whose neighbours are replaced per transaction (default: 5000)")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Computed similar cars for {total} cars in {elapsed:.2f}s"))
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarMake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='makes/')),
+                ('description', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Car',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('car_type', models.CharField(choices=[('new', 'New'), ('reconditioned', 'Reconditioned'), ('used', 'Used')], max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('mileage', models.PositiveIntegerField(help_text='Mileage in km')),
+                ('engine_capacity', models.DecimalField(decimal_places=1, help_text='Engine capacity in liters', max_digits=4)),
+                ('transmission', models.CharField(choices=[('automatic', 'Automatic'), ('manual', 'Manual'), ('cvt', 'CVT')], max_length=20)),
+                ('fuel_type', models.CharField(choices=[('petrol', 'Petrol'), ('diesel', 'Diesel'), ('hybrid', 'Hybrid'), ('electric', 'Electric')], max_length=20)),
+                ('color', models.CharField(max_length=50)),
+                ('doors', models.PositiveSmallIntegerField(default=4)),
+                ('seats', models.PositiveSmallIntegerField(default=5)),
+                ('features', models.TextField(help_text='List the features of the car')),
+                ('description', models.TextField()),
+                ('country_of_origin', models.CharField(blank=True, max_length=100, null=True)),
+                ('recondition_status', models.CharField(blank=True, help_text='Details about reconditioning work done', max_length=100, null=True)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('is_sold', models.BooleanField(default=False)),
+                ('posted_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('slug', models.SlugField(max_length=200, unique=True)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cars', to=settings.AUTH_USER_MODEL)),
+                ('make', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cars', to='cars.carmake')),
+            ],
+            options={
+                'ordering': ['-posted_on'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CarImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='cars/')),
+                ('is_primary', models.BooleanField(default=False)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='cars.car')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CarInquiry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(max_length=20)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('responded', models.BooleanField(default=False)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inquiries', to='cars.car')),
+            ],
+            options={
+                'verbose_name_plural': 'Car Inquiries',
+            },
+        ),
+        migrations.CreateModel(
+            name='CarModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('make', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='models', to='cars.carmake')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='model',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cars', to='cars.carmodel'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The search index as cars.search's backends expect it, written out here so
+# later changes to that module don't change what this migration does.
+FTS_TABLE = 'cars_carsearch_fts'
+
+SQLITE_INDEX = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"document, content='cars_carsearchdocument', content_rowid='car_id', "
+    f"tokenize='porter unicode61')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON cars_carsearchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.car_id, new.document); "
+    f"END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON cars_carsearchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.car_id, old.document); "
+    f"END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON cars_carsearchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.car_id, old.document); "
+    f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.car_id, new.document); "
+    f"END",
+]
+SQLITE_DROP_INDEX = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_INDEX = [
+    "ALTER TABLE cars_carsearchdocument ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', document)) STORED",
+    "CREATE INDEX cars_carsearchdocument_vector_idx "
+    "ON cars_carsearchdocument USING GIN (search_vector)",
+]
+POSTGRES_DROP_INDEX = [
+    'DROP INDEX IF EXISTS cars_carsearchdocument_vector_idx',
+    'ALTER TABLE cars_carsearchdocument DROP COLUMN IF EXISTS search_vector',
+]
+
+# Other databases search the document table as it is
+INDEX_SQL = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX}
+DROP_INDEX_SQL = {'sqlite': SQLITE_DROP_INDEX, 'postgresql': POSTGRES_DROP_INDEX}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP_INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def build_document(car):
+    # cars.search.build_document as of this migration
+    parts = [
+        str(car.year),
+        car.make.name,
+        car.model.name,
+        car.get_car_type_display(),
+        car.get_transmission_display(),
+        car.get_fuel_type_display(),
+        car.color,
+        car.features,
+        car.description,
+    ]
+    return ' '.join(part for part in parts if part)
+
+
+def populate_search_documents(apps, schema_editor):
+    Car = apps.get_model('cars', 'Car')
+    CarSearchDocument = apps.get_model('cars', 'CarSearchDocument')
+    CarSearchDocument.objects.bulk_create(
+        [
+            CarSearchDocument(car=car, document=build_document(car))
+            for car in Car.objects.select_related('make', 'model').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarSearchDocument',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='cars.car')),
+                ('document', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0003_car_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_active_posted_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_active_type_posted_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_active_featured_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_active_trans_fuel_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_active_fuel_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_active_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_active_year_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='car_seller_posted_idx',
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['posted_on', 'id'], name='car_active_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['car_type', 'posted_on', 'id'], name='car_active_type_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['is_featured', 'posted_on', 'id'], name='car_active_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['transmission', 'fuel_type', 'posted_on', 'id'], name='car_active_trans_fuel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['fuel_type', 'posted_on', 'id'], name='car_active_fuel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['price', 'id'], name='car_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['year', 'id'], name='car_active_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['mileage', 'id'], name='car_active_mileage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['seller', 'posted_on', 'id'], name='car_seller_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['is_sold'], name='car_is_sold_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_car_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carimage',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized image files, see cars.images'),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='carmake',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized logo files, see cars.images'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0005_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carimage',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='carmake',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0006_image_processing_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarCar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_links', to='cars.car')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='cars.car')),
+            ],
+            options={
+                'ordering': ['car', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('car', 'rank'), name='similar_car_rank_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0007_similarcar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carinquiry',
+            index=models.Index(fields=['car', 'responded', 'created_at', 'id'], name='inquiry_car_status_idx'),
+        ),
+    ]
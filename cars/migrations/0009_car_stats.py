@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0008_inquiry_inbox_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarStats',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='cars.car')),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Car stats',
+            },
+        ),
+    ]
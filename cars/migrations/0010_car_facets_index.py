@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0009_car_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('is_sold', False)), fields=['make', 'car_type', 'transmission', 'fuel_type', 'year', 'price', 'is_sold'], name='car_active_facets_idx'),
+        ),
+    ]
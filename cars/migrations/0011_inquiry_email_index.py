@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0010_car_facets_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carinquiry',
+            index=models.Index(fields=['email'], name='inquiry_email_idx'),
+        ),
+    ]
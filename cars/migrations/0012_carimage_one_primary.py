@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:42
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def keep_first_primary(apps, schema_editor):
+    # Only the earliest primary image of each car stays primary
+    CarImage = apps.get_model('cars', 'CarImage')
+    first_primaries = (
+        CarImage.objects.filter(is_primary=True).values('car')
+        .annotate(first=Min('id')).values_list('first', flat=True)
+    )
+    CarImage.objects.filter(is_primary=True).exclude(id__in=list(first_primaries)).update(is_primary=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0011_inquiry_email_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_first_primary, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='carimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_primary', True)), fields=('car',), name='carimage_one_primary', violation_error_message='A car can only have one primary image.'),
+        ),
+    ]
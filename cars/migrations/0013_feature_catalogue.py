@@ -0,0 +1,80 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+MAX_NAME_LENGTH = 100
+
+
+def parse_features(text):
+    # cars.features.parse_features as of this migration
+    features = {}
+    for line in (text or '').splitlines():
+        for part in line.split(','):
+            name = ' '.join(part.split())[:MAX_NAME_LENGTH]
+            slug = slugify(name)[:MAX_NAME_LENGTH]
+            if slug and slug not in features:
+                features[slug] = name
+    return list(features.items())
+
+
+def link_existing_features(apps, schema_editor):
+    Car = apps.get_model('cars', 'Car')
+    Feature = apps.get_model('cars', 'Feature')
+    CarFeature = apps.get_model('cars', 'CarFeature')
+
+    parsed = [(pk, parse_features(text)) for pk, text in Car.objects.values_list('pk', 'features').iterator()]
+    names = {}
+    for _, features in parsed:
+        for slug, name in features:
+            names.setdefault(slug, name)
+    Feature.objects.bulk_create([Feature(slug=slug, name=name) for slug, name in names.items()], batch_size=1000)
+    ids = dict(Feature.objects.values_list('slug', 'id'))
+    CarFeature.objects.bulk_create(
+        (CarFeature(car_id=car_id, feature_id=ids[slug]) for car_id, features in parsed for slug, _ in features),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0012_carimage_one_primary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Feature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CarFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feature_links', to='cars.car')),
+                ('feature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='car_links', to='cars.feature')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='feature_tags',
+            field=models.ManyToManyField(blank=True, related_name='cars', through='cars.CarFeature', to='cars.feature'),
+        ),
+        migrations.AddIndex(
+            model_name='carfeature',
+            index=models.Index(fields=['feature', 'car'], name='car_feature_lookup_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='carfeature',
+            constraint=models.UniqueConstraint(fields=('car', 'feature'), name='car_feature_unique'),
+        ),
+        migrations.RunPython(link_existing_features, migrations.RunPython.noop),
+    ]
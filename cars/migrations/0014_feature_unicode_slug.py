@@ -0,0 +1,72 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:31
+
+import unicodedata
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+MAX_NAME_LENGTH = 100
+
+
+def feature_slug(name):
+    # cars.features.feature_slug as of this migration
+    decomposed = unicodedata.normalize('NFKD', name)
+    return slugify(''.join(char for char in decomposed if not unicodedata.combining(char)), allow_unicode=True)
+
+
+def parse_features(text):
+    features = {}
+    for line in (text or '').splitlines():
+        for part in line.split(','):
+            name = ' '.join(part.split())[:MAX_NAME_LENGTH]
+            slug = feature_slug(name)[:MAX_NAME_LENGTH]
+            if slug and slug not in features:
+                features[slug] = name
+    return list(features.items())
+
+
+def relink_non_ascii_features(apps, schema_editor):
+    """
+    Slugs used to drop letters with no ASCII form, so only cars whose
+    features aren't all ASCII can have different links now.
+    """
+    Car = apps.get_model('cars', 'Car')
+    Feature = apps.get_model('cars', 'Feature')
+    CarFeature = apps.get_model('cars', 'CarFeature')
+
+    parsed = {
+        pk: parse_features(text)
+        for pk, text in Car.objects.values_list('pk', 'features').iterator()
+        if text and not text.isascii()
+    }
+    names = {}
+    for features in parsed.values():
+        for slug, name in features:
+            names.setdefault(slug, name)
+    Feature.objects.bulk_create(
+        [Feature(slug=slug, name=name) for slug, name in names.items()], batch_size=1000, ignore_conflicts=True,
+    )
+    ids = dict(Feature.objects.values_list('slug', 'id'))
+    car_ids = list(parsed)
+    for start in range(0, len(car_ids), 500):
+        CarFeature.objects.filter(car_id__in=car_ids[start:start + 500]).delete()
+    CarFeature.objects.bulk_create(
+        (CarFeature(car_id=car_id, feature_id=ids[slug]) for car_id, features in parsed.items() for slug, _ in features),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0013_feature_catalogue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feature',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, max_length=100, unique=True),
+        ),
+        migrations.RunPython(relink_non_ascii_features, migrations.RunPython.noop),
+    ]
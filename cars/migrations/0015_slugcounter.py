@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0014_feature_unicode_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugCounter',
+            fields=[
+                ('base', models.SlugField(max_length=200, primary_key=True, serialize=False)),
+                ('next_suffix', models.PositiveIntegerField()),
+            ],
+        ),
+    ]
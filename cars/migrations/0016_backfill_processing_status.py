@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:02
+
+from django.db import migrations
+
+PROCESSING_PENDING = 'pending'
+PROCESSING_READY = 'ready'
+PROCESSING_FAILED = 'failed'
+
+
+def settle_pending_images(apps, schema_editor):
+    """
+    Images uploaded before 0006 were left pending, which templates render as
+    a placeholder that never goes away. Those with derivatives are ready; the
+    rest show their original upload until generate_image_derivatives renders
+    them.
+    """
+    for model_name in ('CarImage', 'CarMake'):
+        model = apps.get_model('cars', model_name)
+        pending = model.objects.filter(processing_status=PROCESSING_PENDING)
+        pending.exclude(derivatives={}).update(processing_status=PROCESSING_READY)
+        pending.filter(derivatives={}).update(processing_status=PROCESSING_FAILED)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0015_slugcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(settle_pending_images, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,35 @@ from django.db import models
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
+from .images import CAR_IMAGE_DERIVATIVES, MAKE_LOGO_DERIVATIVES
+
 User = get_user_model()
 
+# Derivative rendering states for uploaded images (see cars.tasks)
+PROCESSING_PENDING = 'pending'
+PROCESSING_RUNNING = 'processing'
+PROCESSING_READY = 'ready'
+PROCESSING_FAILED = 'failed'
+
+PROCESSING_STATUS_CHOICES = [
+    (PROCESSING_PENDING, 'Pending'),
+    (PROCESSING_RUNNING, 'Processing'),
+    (PROCESSING_READY, 'Ready'),
+    (PROCESSING_FAILED, 'Failed'),
+]
+
 
 class CarMake(models.Model):
     name = models.CharField(max_length=100)
     logo = models.ImageField(upload_to='makes/', blank=True, null=True)
     description = models.TextField(blank=True)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False,
+                                   help_text="Resized logo files, see cars.images")
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES,
+                                         default=PROCESSING_PENDING, editable=False)
+
+    derivative_field = 'logo'
+    derivative_specs = MAKE_LOGO_DERIVATIVES
 
     def __str__(self):
         return self.name
@@ -22,6 +44,26 @@ class CarModel(models.Model):
         return f"{self.make.name} {self.name}"
 
 
+class CarQuerySet(models.QuerySet):
+    def with_card_data(self):
+        """
+        Load everything a listing card renders in a fixed number of queries:
+        make and model are joined in, and only the primary image of each car
+        is prefetched (``is_primary`` first, falling back to the oldest image).
+        """
+        primary_images = CarImage.objects.order_by('-is_primary', 'id')[:1]
+        return self.select_related('make', 'model').prefetch_related(
+            models.Prefetch('images', queryset=primary_images, to_attr='primary_images')
+        )
+
+    def with_detail_data(self):
+        """
+        Join in everything the detail page shows about a car besides its
+        gallery, which the page loads (and caches) separately.
+        """
+        return self.select_related('make', 'model', 'seller')
+
+
 class Car(models.Model):
     # Car type choices
     NEW = 'new'
@@ -74,8 +116,10 @@ class Car(models.Model):
     doors = models.PositiveSmallIntegerField(default=4)
     seats = models.PositiveSmallIntegerField(default=5)
 
-    # Features and description
+    # Features and description. The text is what the seller typed; the
+    # catalogue links are parsed from it on save (see cars.features).
     features = models.TextField(help_text="List the features of the car")
+    feature_tags = models.ManyToManyField('Feature', through='CarFeature', related_name='cars', blank=True)
     description = models.TextField()
 
     # Reconditioned specific fields
@@ -93,21 +137,81 @@ class Car(models.Model):
     # SEO
     slug = models.SlugField(max_length=200, unique=True)
 
+    objects = CarQuerySet.as_manager()
+
     class Meta:
         ordering = ['-posted_on']
+        # Public pages only ever show unsold cars, so most indexes are partial
+        # on is_sold=False. Each ends in id so it can serve an ordering with the
+        # id tie-breaker in either direction (see cars.sorting).
+        indexes = [
+            models.Index(fields=['posted_on', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_posted_idx'),
+            models.Index(fields=['car_type', 'posted_on', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_type_posted_idx'),
+            models.Index(fields=['is_featured', 'posted_on', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_featured_idx'),
+            models.Index(fields=['transmission', 'fuel_type', 'posted_on', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_trans_fuel_idx'),
+            models.Index(fields=['fuel_type', 'posted_on', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_fuel_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_price_idx'),
+            models.Index(fields=['year', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_year_idx'),
+            models.Index(fields=['mileage', 'id'], condition=models.Q(is_sold=False),
+                         name='car_active_mileage_idx'),
+            models.Index(fields=['seller', 'posted_on', 'id'], name='car_seller_posted_idx'),
+            # Covers every column the filter sidebar's facet counts read, so
+            # they scan this instead of the wide car rows (see cars.facets).
+            # SQLite only treats it as covering with is_sold in it as well.
+            models.Index(fields=['make', 'car_type', 'transmission', 'fuel_type', 'year', 'price', 'is_sold'],
+                         condition=models.Q(is_sold=False), name='car_active_facets_idx'),
+            # Covering index for COUNT(*) over unsold cars without other filters
+            models.Index(fields=['is_sold'], name='car_is_sold_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.year} {self.make} {self.model} - {self.get_car_type_display()}"
+        return f"{self.year} {self.make.name} {self.model.name} - {self.get_car_type_display()}"
 
     def get_absolute_url(self):
         return reverse('car-detail', kwargs={'slug': self.slug})
 
+    @property
+    def primary_image(self):
+        """
+        The image shown on listing cards. Uses the prefetched row from
+        ``with_card_data()`` when available instead of querying again.
+        """
+        if hasattr(self, 'primary_images'):
+            return self.primary_images[0] if self.primary_images else None
+        return self.images.order_by('-is_primary', 'id').first()
+
 
 class CarImage(models.Model):
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='cars/')
     is_primary = models.BooleanField(default=False)
 
+    # Filled in by the derivative pipeline rather than ImageField's
+    # width_field/height_field, which would open the file on every load.
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False,
+                                   help_text="Resized image files, see cars.images")
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES,
+                                         default=PROCESSING_PENDING, editable=False)
+
+    derivative_field = 'image'
+    derivative_specs = CAR_IMAGE_DERIVATIVES
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['car'], condition=models.Q(is_primary=True),
+                                    name='carimage_one_primary',
+                                    violation_error_message="A car can only have one primary image."),
+        ]
+
     def __str__(self):
         return f"Image for {self.car}"
 
@@ -123,6 +227,108 @@ class CarInquiry(models.Model):
 
     class Meta:
         verbose_name_plural = "Car Inquiries"
+        indexes = [
+            # The seller's inbox: per car, open or answered, newest first
+            models.Index(fields=['car', 'responded', 'created_at', 'id'], name='inquiry_car_status_idx'),
+            # Admin search by sender
+            models.Index(fields=['email'], name='inquiry_email_idx'),
+        ]
+
+    def __str__(self):
+        return f"Inquiry from {self.name} about {self.car}"
+
+
+class CarSearchDocument(models.Model):
+    """
+    Denormalized, searchable text for a car. Kept in sync by signals and
+    indexed by the database's full-text engine (see ``cars.search``).
+    """
+    car = models.OneToOneField(Car, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    document = models.TextField()
+
+    def __str__(self):
+        return f"Search document for {self.car_id}"
+
+
+class SimilarCar(models.Model):
+    """
+    One of the precomputed nearest neighbours of a car, ranked from 1 (most
+    similar). Maintained by ``cars.recommendations``.
+    """
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='similar_links')
+    similar = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='similar_to')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['car', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'rank'], name='similar_car_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} similar to {self.car_id}: {self.similar_id}"
+
+
+class CarStats(models.Model):
+    """
+    Counters about a car that are written behind in batches rather than on
+    every request. Maintained by ``cars.tracking``.
+    """
+    car = models.OneToOneField(Car, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    views = models.PositiveBigIntegerField(default=0)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Car stats"
+
+    def __str__(self):
+        return f"Stats for car {self.car_id}"
+
+
+class Feature(models.Model):
+    """
+    An entry of the feature catalogue, such as "Sunroof". Spellings that
+    differ only in case, spacing or punctuation share the slug, and so the
+    entry.
+    """
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class CarFeature(models.Model):
+    """
+    A car having a catalogue feature. Maintained by ``cars.features``.
+    """
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='feature_links')
+    feature = models.ForeignKey(Feature, on_delete=models.CASCADE, related_name='car_links')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'feature'], name='car_feature_unique'),
+        ]
+        indexes = [
+            # Feature filters read the cars of a feature from this alone
+            models.Index(fields=['feature', 'car'], name='car_feature_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.feature_id} on car {self.car_id}"
+
+
+class SlugCounter(models.Model):
+    """
+    The next numeric suffix to hand out for a base slug such as
+    ``2020-toyota-corolla``. Maintained by ``cars.slugs``.
+    """
+    base = models.SlugField(max_length=200, primary_key=True)
+    next_suffix = models.PositiveIntegerField()
 
     def __str__(self):
-        return f"Inquiry from {self.name} about {self.car}"
\ No newline at end of file
+        return f"{self.base}: {self.next_suffix}"
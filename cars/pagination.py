@@ -0,0 +1,162 @@
+import base64
+import hashlib
+import json
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .cache import LISTINGS, cached
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that caches ``COUNT(*)`` per distinct query, so paging through a
+    result set only counts it once. Cached counts are dropped whenever
+    ``namespace`` is bumped; LISTINGS is bumped by any inventory change.
+    """
+    namespace = LISTINGS
+    count_timeout = 300
+
+    @cached_property
+    def count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        digest = hashlib.md5(repr((sql, params)).encode(), usedforsecurity=False).hexdigest()
+        return cached(self.namespace, f'count:{digest}', self.object_list.count, self.count_timeout)
+
+
+class CappedPaginator(CachedCountPaginator):
+    """
+    Numbered pages that stop ``max_pages`` deep, as every page further is a
+    longer OFFSET scan. Lists go on past the last one by cursor (see
+    KeysetPaginator).
+    """
+    max_pages = 50
+
+    @cached_property
+    def num_pages(self):
+        return min(Paginator.num_pages.func(self), self.max_pages)
+
+    def has_more(self, page):
+        """
+        Whether results go on past ``page``, numbered or not.
+        """
+        # Not end_index(), which on the last numbered page is the full count
+        return page.start_index() - 1 + len(page) < self.count
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset's ordering. Instead of an OFFSET, each
+    page starts strictly after the sort key of the previous page's last row,
+    so every page costs the same as the first.
+
+    The ordering must be total; ``id`` is appended as a tie-breaker when the
+    queryset's ordering doesn't already end with it.
+
+    A cursor holds every sort key of its row, but keys that aren't model
+    fields (annotations such as ``search_rank``) can change between requests
+    as the search index changes. For those, the page starts after the row
+    the cursor's id names, as it sorts now; the encoded values are only used
+    when that row is gone from the results.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not ordering or ordering[-1].lstrip('-') not in ('id', 'pk'):
+            descending = ordering[0].startswith('-') if ordering else False
+            ordering.append('-id' if descending else 'id')
+        self.ordering = ordering
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+
+    @property
+    def keys(self):
+        return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, name) for name, _ in self.keys]
+        payload = json.dumps(values, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise InvalidCursor("That cursor is not valid")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor("That cursor is not valid")
+        return [self.to_python(name, value) for (name, _), value in zip(self.keys, values)]
+
+    def to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. search_rank) round-trip through JSON as-is.
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise InvalidCursor("That cursor is not valid")
+
+    def is_field(self, name):
+        try:
+            self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def current_values(self, values):
+        """
+        The sort key of the cursor's row as it is now, if it has any
+        annotation and the row is still in the results.
+        """
+        names = [name for name, _ in self.keys]
+        if all(self.is_field(name) for name in names):
+            return values
+        current = self.queryset.filter(pk=values[-1]).values_list(*names).first()
+        return list(current) if current else values
+
+    def after(self, values):
+        """
+        Q object matching rows that sort strictly after ``values``.
+        """
+        conditions = []
+        for index, (name, descending) in enumerate(self.keys):
+            equal = {key: value for (key, _), value in zip(self.keys[:index], values)}
+            lookup = 'lt' if descending else 'gt'
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': values[index]}))
+        return reduce(lambda left, right: left | right, conditions)
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self.after(self.current_values(self.decode_cursor(cursor))))
+        object_list = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            next_cursor = self.encode_cursor(object_list[-1])
+        return KeysetPage(object_list, next_cursor)
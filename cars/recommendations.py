@@ -0,0 +1,273 @@
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Count, Min
+
+from .models import Car, SimilarCar
+
+# Neighbours stored per car; the detail page shows the first few.
+NEIGHBOURS = 6
+
+# How much each attribute contributes to a similarity score. Categorical
+# attributes score their weight on an exact match; year and price decay
+# with distance, so a car a year older or 10% dearer still scores most of
+# theirs.
+WEIGHTS = {
+    'make': 3.0,
+    'model': 4.0,
+    'car_type': 1.0,
+    'fuel_type': 1.0,
+    'transmission': 0.5,
+    'year': 2.0,
+    'price': 3.0,
+}
+CATEGORICAL = ('make', 'model', 'car_type', 'fuel_type', 'transmission')
+MAKE, MODEL = CATEGORICAL.index('make'), CATEGORICAL.index('model')
+YEAR_SCALE = 3.0  # years
+PRICE_SCALE = 0.25  # difference in log(price), about 28%
+
+# Upper bound on the number of scores held in memory at once (float32).
+BLOCK_SIZE = 8_000_000
+
+# The best score a car of another make, or of another model of the same
+# make, can reach. Once a car's n-th best neighbour within its own model
+# beats these, nothing outside the model needs scoring.
+OTHER_MAKE_MAX = sum(WEIGHTS.values()) - WEIGHTS['make'] - WEIGHTS['model']
+OTHER_MODEL_MAX = OTHER_MAKE_MAX + WEIGHTS['make']
+
+FEATURE_FIELDS = (
+    'id', 'make_id', 'model_id', 'car_type', 'fuel_type', 'transmission', 'year', 'price', 'is_sold',
+)
+
+
+def _groups(codes):
+    """
+    Map each distinct code to the positions holding it.
+    """
+    order = np.argsort(codes, kind='stable')
+    boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+    return {int(codes[group[0]]): group for group in np.split(order, boundaries) if len(group)}
+
+
+def _codes(values):
+    """
+    Integer codes for a column of hashable values, equal where values are.
+    """
+    lookup = {}
+    return np.fromiter((lookup.setdefault(value, len(lookup)) for value in values), dtype=np.int32,
+                       count=len(values))
+
+
+class FeatureMatrix:
+    """
+    Every car's comparable attributes as NumPy columns: one integer code
+    column per categorical attribute, plus year and log price. Scores
+    between cars are computed a block of rows at a time.
+    """
+
+    def __init__(self, rows):
+        columns = list(zip(*rows)) or [()] * len(FEATURE_FIELDS)
+        values = dict(zip(FEATURE_FIELDS, columns))
+        self.ids = np.array(values['id'], dtype=np.int64)
+        self.categories = np.column_stack([
+            _codes(values['make_id']),
+            _codes(values['model_id']),
+            _codes(values['car_type']),
+            _codes(values['fuel_type']),
+            _codes(values['transmission']),
+        ]) if len(self.ids) else np.empty((0, len(CATEGORICAL)), dtype=np.int32)
+        self.category_weights = np.array([WEIGHTS[name] for name in CATEGORICAL], dtype=np.float32)
+        self.year = np.array(values['year'], dtype=np.float32)
+        self.log_price = np.log(np.maximum(np.array(values['price'], dtype=np.float64), 1)).astype(np.float32)
+        # Sold cars still get recommendations, but are never recommended
+        self.available = ~np.array(values['is_sold'], dtype=bool)
+        self.positions = {car_id: index for index, car_id in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def load(cls, queryset=None):
+        queryset = Car.objects.all() if queryset is None else queryset
+        return cls(list(queryset.order_by('id').values_list(*FEATURE_FIELDS)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, rows, columns=None):
+        """
+        Similarity of the cars at positions ``rows`` to the cars at positions
+        ``columns`` (default: every car), as a ``len(rows) x len(columns)``
+        array. Higher is more similar.
+        """
+        columns = np.arange(len(self)) if columns is None else columns
+        block = np.zeros((len(rows), len(columns)), dtype=np.float32)
+        for index, weight in enumerate(self.category_weights):
+            block += weight * (self.categories[rows, index][:, None] == self.categories[columns, index][None, :])
+        year_gap = np.abs(self.year[rows][:, None] - self.year[columns][None, :])
+        block += WEIGHTS['year'] * np.exp(-year_gap / YEAR_SCALE)
+        price_gap = np.abs(self.log_price[rows][:, None] - self.log_price[columns][None, :])
+        block += WEIGHTS['price'] * np.exp(-price_gap / PRICE_SCALE)
+        return block
+
+    def top(self, rows, columns, count):
+        """
+        The ``count`` best candidates among ``columns`` for each car in
+        ``rows``: positions and scores, best first (ties go to the newer
+        listing). The car itself and sold cars score -inf.
+        """
+        block = self.scores(rows, columns)
+        block[:, ~self.available[columns]] = -np.inf
+        block[rows[:, None] == columns[None, :]] = -np.inf
+        k = min(count, len(columns))
+        if k == 0:
+            empty = np.empty((len(rows), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        positions = columns[top]
+        order = np.lexsort((-self.ids[positions], -top_scores), axis=1)
+        return np.take_along_axis(positions, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def neighbours(self, rows, count=NEIGHBOURS):
+        """
+        Yield ``(car id, [(neighbour id, score), ...])`` for the cars at
+        positions ``rows``, best neighbour first.
+
+        Candidates are searched in widening circles: the same model first,
+        then the same make, then everything. A car only moves to the next
+        circle when its n-th best score could still be beaten from outside,
+        which for a model with plenty of listings is almost never.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        by_make = _groups(self.categories[:, MAKE])
+        by_model = _groups(self.categories[:, MODEL])
+        everything = np.arange(len(self))
+        for model, group in _groups(self.categories[rows, MODEL]).items():
+            group = rows[group]
+            make = self.categories[group[0], MAKE]
+            for columns, bound in (
+                (by_model[model], OTHER_MODEL_MAX),
+                (by_make[make], OTHER_MAKE_MAX),
+                (everything, -np.inf),
+            ):
+                unresolved = []
+                step = max(1, BLOCK_SIZE // max(len(columns), 1))
+                for start in range(0, len(group), step):
+                    chunk = group[start:start + step]
+                    positions, scores = self.top(chunk, columns, count)
+                    full = scores.shape[1] == count
+                    for row, found, values in zip(chunk, positions, scores):
+                        # Ties with an outside car could go either way, so
+                        # only a strictly better n-th score settles it.
+                        if bound == -np.inf or (full and values[-1] > bound):
+                            yield int(self.ids[row]), [
+                                (int(self.ids[position]), float(score))
+                                for position, score in zip(found, values) if np.isfinite(score)
+                            ]
+                        else:
+                            unresolved.append(row)
+                group = np.array(unresolved, dtype=np.int64)
+                if not len(group):
+                    break
+
+
+def _store(matrix, rows, batch_size=5000):
+    """
+    Replace the stored neighbours of the cars at positions ``rows``.
+    """
+    links = []
+    car_ids = []
+    for car_id, neighbours in matrix.neighbours(rows):
+        car_ids.append(car_id)
+        links.extend(
+            (car_id, similar_id, rank, score)
+            for rank, (similar_id, score) in enumerate(neighbours, start=1)
+        )
+    # Plain tuples through executemany: building a model instance per link
+    # took three quarters of a full rebuild.
+    table = connection.ops.quote_name(SimilarCar._meta.db_table)
+    insert = f"INSERT INTO {table} (car_id, similar_id, rank, score) VALUES (%s, %s, %s, %s)"
+    with transaction.atomic():
+        for start in range(0, len(car_ids), batch_size):
+            SimilarCar.objects.filter(car_id__in=car_ids[start:start + batch_size]).delete()
+        with connection.cursor() as cursor:
+            for start in range(0, len(links), batch_size):
+                cursor.executemany(insert, links[start:start + batch_size])
+    return len(car_ids)
+
+
+def rebuild(batch_size=5000):
+    """
+    Recompute the neighbours of every car, ``batch_size`` cars per
+    transaction. Returns the number of cars.
+    """
+    matrix = FeatureMatrix.load()
+    total = 0
+    for start in range(0, len(matrix), batch_size):
+        total += _store(matrix, np.arange(start, min(start + batch_size, len(matrix))), batch_size)
+    return total
+
+
+def _thresholds(matrix):
+    """
+    Score a newcomer must beat to enter each car's neighbour list: the
+    lowest stored score, or -inf where the list isn't full yet.
+    """
+    thresholds = np.full(len(matrix), -np.inf, dtype=np.float32)
+    stored = (
+        SimilarCar.objects.order_by().values('car_id')
+        .annotate(lowest=Min('score'), count=Count('id'))
+        .filter(count__gte=NEIGHBOURS)
+        .values_list('car_id', 'lowest')
+    )
+    for car_id, lowest in stored:
+        position = matrix.positions.get(car_id)
+        if position is not None:
+            thresholds[position] = lowest
+    return thresholds
+
+
+def refresh(car_ids):
+    """
+    Bring the stored neighbours up to date after the cars in ``car_ids``
+    were created, edited, sold or deleted. Recomputes those cars' own lists,
+    the lists that contain them, and the lists they now belong in.
+    """
+    car_ids = set(car_ids)
+    matrix = FeatureMatrix.load()
+    affected = {matrix.positions[car_id] for car_id in car_ids if car_id in matrix.positions}
+    changed = np.array(sorted(affected), dtype=np.int64)
+
+    ordered_ids = sorted(car_ids)
+    for start in range(0, len(ordered_ids), 5000):
+        listing = SimilarCar.objects.filter(similar_id__in=ordered_ids[start:start + 5000])
+        affected.update(
+            matrix.positions[car_id]
+            for car_id in listing.values_list('car_id', flat=True) if car_id in matrix.positions
+        )
+
+    available = changed[matrix.available[changed]] if len(changed) else changed
+    if len(available) > len(matrix) // 10:
+        # A bulk import touches most lists anyway
+        affected = set(range(len(matrix)))
+    elif len(available):
+        thresholds = _thresholds(matrix)
+        step = max(1, BLOCK_SIZE // max(len(matrix), 1))
+        for start in range(0, len(available), step):
+            chunk = available[start:start + step]
+            # Scores are symmetric: how well each car would rank these ones
+            best = matrix.scores(chunk)
+            best[np.arange(len(chunk)), chunk] = -np.inf
+            affected.update(np.flatnonzero(best.max(axis=0) >= thresholds).tolist())
+
+    if affected:
+        _store(matrix, np.array(sorted(affected), dtype=np.int64))
+    return len(affected)
+
+
+def similar_cars(car, count=3):
+    """
+    The ``count`` most similar unsold cars to ``car``, ready to render as cards.
+    """
+    return (
+        Car.objects.with_card_data()
+        .filter(similar_to__car=car, is_sold=False)
+        .order_by('similar_to__rank')[:count]
+    )
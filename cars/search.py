@@ -0,0 +1,189 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Car, CarSearchDocument
+
+# Matches the words a user typed; everything else (quotes, operators, ...)
+# is dropped so the query can never be a syntax error for the search engine.
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_TABLE = 'cars_carsearch_fts'
+
+
+def build_document(car):
+    """
+    Flatten a car and its make/model into the text that gets indexed.
+    """
+    parts = [
+        str(car.year),
+        car.make.name,
+        car.model.name,
+        car.get_car_type_display(),
+        car.get_transmission_display(),
+        car.get_fuel_type_display(),
+        car.color,
+        car.features,
+        car.description,
+    ]
+    return ' '.join(part for part in parts if part)
+
+
+def parse_terms(query):
+    return TERM_RE.findall(query.lower())
+
+
+class SearchBackend:
+    """
+    Base search backend. Subclasses translate a list of terms into SQL that
+    selects matching car ids and computes a relevance score (higher is better).
+    """
+    vendor = None
+
+    def match_sql(self, terms):
+        raise NotImplementedError
+
+    def rank_sql(self, terms):
+        raise NotImplementedError
+
+    def optimize(self):
+        pass
+
+    def search(self, queryset, query):
+        """
+        Filter ``queryset`` down to cars matching ``query`` and annotate each
+        with ``search_rank``.
+        """
+        terms = parse_terms(query)
+        if not terms:
+            return queryset
+        match_sql, match_params = self.match_sql(terms)
+        rank_sql, rank_params = self.rank_sql(terms)
+        return queryset.filter(id__in=RawSQL(match_sql, match_params)).annotate(
+            search_rank=RawSQL(rank_sql, rank_params)
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 external-content table over ``CarSearchDocument``. Triggers keep
+    the FTS index in step with the document table. Migration 0002 creates both.
+    """
+    vendor = 'sqlite'
+
+    def fts_query(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def match_sql(self, terms):
+        return f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [self.fts_query(terms)]
+
+    def rank_sql(self, terms):
+        # bm25 is negative, lower being better, so flip it.
+        return (
+            f'(SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = cars_car.id)',
+            [self.fts_query(terms)],
+        )
+
+    def optimize(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL full-text search on a generated ``tsvector`` column with a GIN
+    index, both added by migration 0002.
+    """
+    vendor = 'postgresql'
+
+    def ts_query(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def match_sql(self, terms):
+        return (
+            "SELECT car_id FROM cars_carsearchdocument "
+            "WHERE search_vector @@ to_tsquery('english', %s)",
+            [self.ts_query(terms)],
+        )
+
+    def rank_sql(self, terms):
+        return (
+            "(SELECT ts_rank(search_vector, to_tsquery('english', %s)) "
+            "FROM cars_carsearchdocument WHERE car_id = cars_car.id)",
+            [self.ts_query(terms)],
+        )
+
+
+class FallbackSearchBackend(SearchBackend):
+    """
+    Substring matching on the search document for databases without a
+    supported full-text engine. Every result gets the same rank.
+    """
+
+    def search(self, queryset, query):
+        terms = parse_terms(query)
+        for term in terms:
+            queryset = queryset.filter(search_document__document__icontains=term)
+        if terms:
+            queryset = queryset.annotate(search_rank=RawSQL('0', []))
+        return queryset
+
+
+BACKENDS = {
+    backend.vendor: backend
+    for backend in (SQLiteSearchBackend, PostgresSearchBackend)
+}
+
+
+def get_search_backend(conn=None):
+    vendor = (conn or connection).vendor
+    return BACKENDS.get(vendor, FallbackSearchBackend)()
+
+
+def search_cars(queryset, query):
+    """
+    Full-text search over ``queryset``; matching cars get a ``search_rank``
+    annotation (higher is more relevant).
+    """
+    return get_search_backend().search(queryset, query)
+
+
+def index_cars(cars, batch_size=1000):
+    """
+    Create or refresh the search documents for ``cars`` (an iterable of Car
+    instances with make and model loaded).
+    """
+    documents = [CarSearchDocument(car=car, document=build_document(car)) for car in cars]
+    CarSearchDocument.objects.bulk_create(
+        documents,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['car'],
+        update_fields=['document'],
+    )
+    return len(documents)
+
+
+def reindex_queryset(queryset, batch_size=1000):
+    """
+    Re-index every car in ``queryset`` in batches, without loading the whole
+    result set into memory.
+    """
+    total = 0
+    batch = []
+    for car in queryset.select_related('make', 'model').iterator(chunk_size=batch_size):
+        batch.append(car)
+        if len(batch) >= batch_size:
+            total += index_cars(batch, batch_size)
+            batch = []
+    if batch:
+        total += index_cars(batch, batch_size)
+    return total
+
+
+def rebuild_index(batch_size=1000):
+    CarSearchDocument.objects.all().delete()
+    total = reindex_queryset(Car.objects.order_by('id'), batch_size)
+    get_search_backend().optimize()
+    return total
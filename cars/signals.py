@@ -0,0 +1,167 @@
+import logging
+
+from django.core.signals import request_finished
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache, recommendations, tracking
+from .features import sync_features
+from .images import needs_derivatives
+from .models import PROCESSING_PENDING, Car, CarImage, CarInquiry, CarMake, CarModel, Feature, SimilarCar
+from .search import index_cars, reindex_queryset
+from .tasks import process_image_derivatives, refresh_similar_cars
+
+logger = logging.getLogger(__name__)
+
+# The fields a car's neighbours are scored on, see recommendations.FeatureMatrix
+SIMILARITY_FIELDS = [Car._meta.get_field(attname) for attname in recommendations.FEATURE_FIELDS if attname != 'id']
+
+
+@receiver(post_save, sender=Car)
+def index_saved_car(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_cars([instance])
+
+
+@receiver(post_save, sender=Car)
+def link_saved_car_features(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_features([instance])
+
+
+@receiver(pre_save, sender=CarMake)
+@receiver(pre_save, sender=CarModel)
+def remember_previous_name(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._previous_name = None
+        return
+    instance._previous_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=CarMake)
+@receiver(post_save, sender=CarModel)
+def reindex_renamed_cars(sender, instance, created, raw=False, **kwargs):
+    """
+    Make and model names are copied into every car's search document, so a
+    rename has to refresh the documents of all their cars.
+    """
+    if raw or created or getattr(instance, '_previous_name', None) == instance.name:
+        return
+    lookup = 'make' if sender is CarMake else 'model'
+    reindex_queryset(Car.objects.filter(**{lookup: instance}))
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_delete, sender=Car)
+@receiver(post_save, sender=CarImage)
+@receiver(post_delete, sender=CarImage)
+@receiver(post_save, sender=CarModel)
+@receiver(post_delete, sender=CarModel)
+@receiver(post_save, sender=Feature)
+@receiver(post_delete, sender=Feature)
+def invalidate_listing_caches(sender, **kwargs):
+    if sender is Car:
+        # Detail fragments are keyed on the car's updated_on already
+        cache.bump_generation_on_commit(cache.HOME, cache.LISTINGS)
+    elif sender in (CarModel, Feature):
+        # Models and features are in their catalogues' caches as well
+        cache.bump_generation_on_commit(cache.HOME, cache.LISTINGS, cache.DETAIL, cache.MAKES)
+    else:
+        cache.bump_generation_on_commit(cache.HOME, cache.LISTINGS, cache.DETAIL)
+
+
+@receiver(post_save, sender=CarMake)
+@receiver(post_delete, sender=CarMake)
+def invalidate_make_caches(sender, **kwargs):
+    cache.bump_generation_on_commit(cache.HOME, cache.LISTINGS, cache.MAKES, cache.DETAIL)
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_delete, sender=Car)
+def invalidate_car_counts(sender, signal, created=False, **kwargs):
+    """
+    Admin car counts only go when cars come or go. An edit that moves a car
+    between filters (say, marking it sold) shows in the filtered counts once
+    they time out, after CachedCountPaginator.count_timeout.
+    """
+    if created or signal is post_delete:
+        cache.bump_generation_on_commit(cache.CAR_COUNTS)
+
+
+@receiver(post_save, sender=CarInquiry)
+@receiver(post_delete, sender=CarInquiry)
+def invalidate_inquiry_counts(sender, **kwargs):
+    cache.bump_generation_on_commit(cache.INQUIRY_COUNTS)
+
+
+@receiver(post_save, sender=CarImage)
+@receiver(post_save, sender=CarMake)
+def queue_image_derivatives(sender, instance, raw=False, **kwargs):
+    """
+    Rendering derivatives takes seconds for a large photo, so it runs on a
+    Celery worker once the upload is committed. Until then the image is
+    marked pending and templates show a placeholder.
+    """
+    if raw or not needs_derivatives(instance):
+        return
+    sender.objects.filter(pk=instance.pk).update(processing_status=PROCESSING_PENDING)
+    instance.processing_status = PROCESSING_PENDING
+    transaction.on_commit(
+        lambda: process_image_derivatives.delay(sender._meta.label, instance.pk)
+    )
+
+
+def similarity_inputs_saved(update_fields):
+    return update_fields is None or any(
+        field.name in update_fields or field.attname in update_fields for field in SIMILARITY_FIELDS
+    )
+
+
+@receiver(pre_save, sender=Car)
+def remember_similarity_inputs(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or not similarity_inputs_saved(update_fields):
+        instance._previous_similarity_inputs = None
+        return
+    attnames = [field.attname for field in SIMILARITY_FIELDS]
+    instance._previous_similarity_inputs = sender.objects.filter(pk=instance.pk).values_list(*attnames).first()
+
+
+@receiver(post_save, sender=Car)
+def queue_similar_cars_refresh(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Refreshing a car's neighbours scores it against every other car, so an
+    edit only queues one when a field the scores use changed.
+    """
+    if raw:
+        return
+    if not created:
+        if not similarity_inputs_saved(update_fields):
+            return
+        previous = getattr(instance, '_previous_similarity_inputs', None)
+        if previous == tuple(getattr(instance, field.attname) for field in SIMILARITY_FIELDS):
+            return
+    transaction.on_commit(lambda: refresh_similar_cars.delay([instance.pk]))
+
+
+@receiver(pre_delete, sender=Car)
+def queue_similar_cars_refresh_on_delete(sender, instance, **kwargs):
+    # The rows pointing at this car are about to cascade away; remember whose
+    # lists they were so those get a replacement neighbour.
+    car_ids = list(SimilarCar.objects.filter(similar=instance).values_list('car_id', flat=True))
+    if car_ids:
+        transaction.on_commit(lambda: refresh_similar_cars.delay(car_ids))
+
+
+@receiver(request_finished)
+def flush_local_view_counts(sender, **kwargs):
+    """
+    Without Redis each process writes its own buffered view counts, once a
+    response is out so that no request waits for (or is measured with) the
+    writes.
+    """
+    try:
+        tracking.flush_local()
+    except DatabaseError:
+        # The counts stay buffered for the next try
+        logger.warning("Couldn't write the buffered view counts", exc_info=True)
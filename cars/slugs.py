@@ -0,0 +1,159 @@
+import operator
+from collections import Counter
+from functools import reduce
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Car, SlugCounter
+
+SLUG_MAX_LENGTH = Car._meta.get_field('slug').max_length
+
+# Room left at the end of a truncated base for a "-<n>" suffix.
+SUFFIX_RESERVE = 8
+
+BASES_PER_QUERY = 200
+
+
+def car_base_slug(car):
+    """
+    Slug shared by every listing of the same year, make and model, e.g.
+    ``2020-toyota-corolla``. Allocated slugs add a numeric suffix to it.
+    """
+    base = slugify(f"{car.year} {car.make.name} {car.model.name}")
+    return base[:SLUG_MAX_LENGTH - SUFFIX_RESERVE].rstrip('-')
+
+
+def _family(base):
+    """
+    Condition matching ``base`` and every suffixed slug derived from it.
+    """
+    if connection.vendor == 'sqlite':
+        # LIKE can't use an index on SQLite. Under its binary collation a
+        # suffixed slug sorts between the bare base and the base followed
+        # by '.', the character after '-', so a range scan finds them all.
+        return Q(slug__gte=base, slug__lt=f'{base}.')
+    # PostgreSQL serves prefix LIKEs from the varchar_pattern_ops index
+    # Django creates for slug fields.
+    return Q(slug=base) | Q(slug__startswith=f'{base}-')
+
+
+def _taken_suffixes(bases):
+    """
+    Map each base to the set of suffixes in use for it (0 for the bare base),
+    in one query per ``BASES_PER_QUERY`` bases.
+    """
+    taken = {base: set() for base in bases}
+    bases = sorted(taken)
+    # Chunked to stay under the database's expression depth limit
+    for start in range(0, len(bases), BASES_PER_QUERY):
+        family = reduce(operator.or_, (_family(base) for base in bases[start:start + BASES_PER_QUERY]))
+        for slug in Car.objects.filter(family).order_by().values_list('slug', flat=True):
+            if slug in taken:
+                taken[slug].add(0)
+            head, _, suffix = slug.rpartition('-')
+            if head in taken and suffix.isdigit():
+                taken[head].add(int(suffix))
+    return taken
+
+
+def _with_suffix(base, suffix):
+    return base if suffix == 0 else f'{base}-{suffix}'
+
+
+def allocate_slug(base):
+    """
+    Free slug for ``base``: the base itself, or the base with the next
+    numeric suffix.
+    """
+    return allocate_slugs([base])[0]
+
+
+def next_suffixes(bases):
+    """
+    Map each of ``bases`` to the first suffix after every one in use (0 when
+    the bare base is still free).
+    """
+    taken = _taken_suffixes(set(bases))
+    return {base: (max(used) + 1 if used else 0) for base, used in taken.items()}
+
+
+def _reserve(counts):
+    """
+    Advance the counter of each base in ``counts`` by its count, and map the
+    bases that have a counter to the first suffix reserved for them. Each
+    UPDATE reserves atomically, so concurrent writers get distinct suffixes.
+    """
+    table = SlugCounter._meta.db_table
+    reserved = {}
+    bases = sorted(counts)
+    for start in range(0, len(bases), BASES_PER_QUERY):
+        chunk = bases[start:start + BASES_PER_QUERY]
+        cases = ' '.join(['WHEN %s THEN CAST(%s AS INTEGER)'] * len(chunk))
+        placeholders = ', '.join(['%s'] * len(chunk))
+        params = [value for base in chunk for value in (base, counts[base])] + chunk
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET next_suffix = next_suffix + CASE base {cases} END '
+                f'WHERE base IN ({placeholders}) RETURNING base, next_suffix',
+                params,
+            )
+            for base, next_suffix in cursor.fetchall():
+                reserved[base] = next_suffix - counts[base]
+    return reserved
+
+
+def allocate_slugs(bases):
+    """
+    Allocate a free slug for every entry in ``bases``; repeated bases get
+    consecutive suffixes. Suffixes are reserved from each base's
+    SlugCounter, with one query per ``BASES_PER_QUERY`` distinct bases,
+    which is what bulk imports need. The first time a base is seen, its
+    counter starts after the suffixes already in use.
+    """
+    counts = Counter(bases)
+    first = _reserve(counts)
+    missing = counts.keys() - first.keys()
+    if missing:
+        SlugCounter.objects.bulk_create(
+            [SlugCounter(base=base, next_suffix=suffix) for base, suffix in next_suffixes(missing).items()],
+            ignore_conflicts=True,
+        )
+        first.update(_reserve({base: counts[base] for base in missing}))
+    slugs = []
+    for base in bases:
+        slugs.append(_with_suffix(base, first[base]))
+        first[base] += 1
+    return slugs
+
+
+def resync_counters(bases):
+    """
+    Move the counters of ``bases`` past every suffix in use, after a slug
+    was taken without them (typed into the admin, say).
+    """
+    for base, suffix in next_suffixes(set(bases)).items():
+        SlugCounter.objects.filter(base=base, next_suffix__lt=suffix).update(next_suffix=suffix)
+
+
+def save_with_unique_slug(car, base=None, attempts=3):
+    """
+    Save a new ``car`` under a freshly allocated slug. A slug taken by hand
+    can still be ahead of its counter; the unique index then rejects the
+    insert, and the slug is allocated again past every one in use.
+    """
+    base = base or car_base_slug(car)
+    for attempt in range(attempts):
+        car.slug = allocate_slug(base)
+        try:
+            with transaction.atomic():
+                car.save()
+            return car
+        except IntegrityError:
+            # Only retry collisions on the slug itself
+            if attempt == attempts - 1 or not Car.objects.filter(slug=car.slug).exists():
+                raise
+            resync_counters([base])
+            car.pk = None
+            car._state.adding = True
@@ -0,0 +1,43 @@
+from collections import namedtuple
+
+SortOption = namedtuple('SortOption', ['label', 'icon', 'ordering'])
+
+# Every ordering ends in id so results (and keyset cursors) are deterministic,
+# and each leading column is backed by one of Car's partial indexes.
+SORT_OPTIONS = {
+    'newest': SortOption('Newest First', 'fas fa-clock', ('-posted_on', '-id')),
+    'oldest': SortOption('Oldest First', 'fas fa-history', ('posted_on', 'id')),
+    'price-low': SortOption('Price: Low to High', 'fas fa-arrow-up', ('price', 'id')),
+    'price-high': SortOption('Price: High to Low', 'fas fa-arrow-down', ('-price', '-id')),
+    'mileage-low': SortOption('Mileage: Low to High', 'fas fa-tachometer-alt', ('mileage', 'id')),
+    'mileage-high': SortOption('Mileage: High to Low', 'fas fa-tachometer-alt', ('-mileage', '-id')),
+    'year-new': SortOption('Year: Newest to Oldest', 'fas fa-calendar-alt', ('-year', '-id')),
+    'year-old': SortOption('Year: Oldest to Newest', 'fas fa-calendar', ('year', 'id')),
+}
+
+# Only offered when there is a search query to rank against.
+RELEVANCE = 'relevance'
+RELEVANCE_OPTION = SortOption('Best Match', 'fas fa-star', ('-search_rank', '-posted_on', '-id'))
+
+DEFAULT_SORT = 'newest'
+
+
+def get_sort_options(searching=False):
+    options = dict(SORT_OPTIONS)
+    if searching:
+        options = {RELEVANCE: RELEVANCE_OPTION, **options}
+    return options
+
+
+def resolve_sort(value, searching=False):
+    """
+    Return a valid sort key for the requested ``value``, falling back to
+    relevance for searches and newest first otherwise.
+    """
+    if value in get_sort_options(searching):
+        return value
+    return RELEVANCE if searching else DEFAULT_SORT
+
+
+def sort_cars(queryset, key, searching=False):
+    return queryset.order_by(*get_sort_options(searching)[key].ordering)
@@ -0,0 +1,60 @@
+import logging
+
+from celery import shared_task
+from django.apps import apps
+
+from . import cache, recommendations, tracking
+from .images import generate_derivatives
+from .models import PROCESSING_FAILED, PROCESSING_PENDING, PROCESSING_READY, PROCESSING_RUNNING, CarMake
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def process_image_derivatives(self, model_label, pk, force=False):
+    """
+    Render the derivatives of a CarImage or CarMake logo outside the request
+    and record the outcome in its ``processing_status``. Errors are retried
+    by the worker, and the image only marked failed once retries run out.
+    """
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        # Deleted before the worker got to it
+        return
+
+    model.objects.filter(pk=pk).update(processing_status=PROCESSING_RUNNING)
+    try:
+        generate_derivatives(instance, force=force)
+    except Exception as exc:
+        # Run inline (no broker), a retry would hold up, and an error fail,
+        # the request that saved the image
+        if not self.request.is_eager and self.request.retries < self.max_retries:
+            model.objects.filter(pk=pk).update(processing_status=PROCESSING_PENDING)
+            raise self.retry(exc=exc)
+        logger.warning("Giving up on the derivatives of %s %s", model_label, pk, exc_info=True)
+        instance.derivatives = {}
+
+    status = PROCESSING_READY if instance.derivatives else PROCESSING_FAILED
+    model.objects.filter(pk=pk).update(processing_status=status)
+    # Cached pages were rendered with placeholders or the original upload
+    if model is CarMake:
+        cache.bump_generation(cache.MAKES)
+    else:
+        cache.bump_generation(cache.HOME, cache.LISTINGS, cache.DETAIL)
+
+
+@shared_task
+def refresh_similar_cars(car_ids):
+    """
+    Update the precomputed similar cars after the given cars changed.
+    """
+    recommendations.refresh(car_ids)
+
+
+@shared_task
+def flush_view_counts():
+    """
+    Write the buffered listing view counts to CarStats. Run by Celery beat.
+    """
+    return tracking.flush()
@@ -1,36 +1,31 @@
 from django import template
+from django.utils.html import format_html, format_html_join
 from django.utils.safestring import mark_safe
 
+from cars.images import derivative_url, srcset
+from cars.models import PROCESSING_PENDING, PROCESSING_RUNNING
+
 register = template.Library()
 
 
 @register.filter
-def features_as_list(features_text):
+def features_as_list(features):
     """
-    Convert a comma-separated features text into a formatted HTML list.
+    Render Feature rows as an HTML list. Pass rows fetched (or prefetched)
+    beforehand, so rendering doesn't query.
 
-    Usage: {{ car.features|features_as_list }}
+    Usage: {{ features|features_as_list }}
     """
-    if not features_text:
+    if not features:
         return mark_safe('<p class="text-muted">No specific features listed for this vehicle.</p>')
 
-    # Split by commas and clean up each feature
-    features = [feature.strip() for feature in features_text.split(',') if feature.strip()]
-
-    # Build HTML
-    html = '<div class="row">'
-    for feature in features:
-        html += '''
-        <div class="col-md-6 mb-2">
-            <div class="d-flex align-items-center">
-                <i class="fas fa-check-circle text-success me-2"></i>
-                <span>{}</span>
-            </div>
-        </div>
-        '''.format(feature)
-    html += '</div>'
-
-    return mark_safe(html)
+    items = format_html_join(
+        '',
+        '<div class="col-md-6 mb-2"><div class="d-flex align-items-center">'
+        '<i class="fas fa-check-circle text-success me-2"></i><span>{}</span></div></div>',
+        ((feature.name,) for feature in features),
+    )
+    return format_html('<div class="row">{}</div>', items)
 
 
 @register.filter
@@ -40,4 +35,62 @@ def addclass(field, css_class):
 
     Usage: {{ form.field|addclass:"form-control" }}
     """
-    return field.as_widget(attrs={'class': css_class})
\ No newline at end of file
+    return field.as_widget(attrs={'class': css_class})
+
+
+@register.filter(name='derivative_url')
+def derivative_url_filter(image, preset):
+    """
+    URL of a single WebP derivative of a CarImage or CarMake logo.
+
+    Usage: {{ image|derivative_url:"thumb" }}
+    """
+    return derivative_url(image, preset)
+
+
+@register.simple_tag
+def responsive_image(image, preset, sizes='100vw', alt='', css_class='', loading='lazy'):
+    """
+    Render a CarImage or CarMake logo as a <picture> with AVIF/WebP sources and
+    a JPEG fallback, letting the browser pick the smallest derivative that
+    fits ``sizes``. Shows a placeholder while a worker is still rendering the
+    derivatives, and the original upload if rendering failed.
+
+    Usage: {% responsive_image car.primary_image 'card' sizes='(max-width: 768px) 100vw, 300px' alt=car css_class='car-image' %}
+    """
+    field_file = getattr(image, image.derivative_field)
+    entry = image.derivatives.get(preset)
+    if not entry and image.processing_status in (PROCESSING_PENDING, PROCESSING_RUNNING):
+        return format_html(
+            '<div class="image-placeholder {}" role="img" aria-label="{}">'
+            '<i class="fas fa-spinner fa-spin"></i><span>Processing photo&hellip;</span></div>',
+            css_class, alt,
+        )
+    if not entry:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            field_file.url, alt, css_class, loading,
+        )
+
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (mime, srcset(image.derivatives, preset, fmt), sizes)
+            for fmt, mime in (('avif', 'image/avif'), ('webp', 'image/webp'))
+            if entry.get(fmt)
+        ),
+    )
+    return format_html(
+        '<picture class="responsive-picture">{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        sources,
+        field_file.storage.url(entry['jpeg']),
+        srcset(image.derivatives, preset, 'jpeg'),
+        sizes,
+        entry['width'],
+        entry['height'],
+        alt,
+        css_class,
+        loading,
+    )
@@ -1,3 +1,2125 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.http import Http404, HttpResponse, QueryDict
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from PIL import Image
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import numpy as np
+from celery.exceptions import Retry
+
+from core import gunicorn_config
+from core.instrumentation import QueryBudgetExceeded, fingerprint, view_budget
+from core.middleware import RequestMetricsMiddleware
+from core.settings import base as base_settings
+from core.serve import serve_media, serve_static
+from core.storage import brotli
+
+from .cache import HOME, LISTINGS, cache_stats, get_generation
+from .catalogue import Catalogue, get_catalogue, reset_catalogue
+from .dashboard import DASHBOARD_PAGE_SIZE, mark_sold
+from .facets import FACET_PARAMS, RANGE_FACETS, compute_facet_counts, facet_counts
+from .features import parse_features
+from .filters import filter_cars, normalize_query
+from .management.commands.benchmark_car_filters import FILTER_CASES, Command as BenchmarkCarFilters, is_full_scan
+from .forms import CarFilterForm, CarForm
+from .images import derivative_url
+from .importer import import_file
+from .inbox import INBOX_PAGE_SIZE, mark_responded
+from .pagination import CachedCountPaginator, CappedPaginator, KeysetPaginator
+from .models import (
+    PROCESSING_FAILED, PROCESSING_PENDING, PROCESSING_READY, Car, CarImage, CarInquiry, CarMake,
+    CarModel, CarSearchDocument, CarStats, Feature, SimilarCar,
+)
+from . import recommendations, slugs, tracking
+from .tasks import process_image_derivatives
+from .search import search_cars
+from .slugs import allocate_slug, allocate_slugs, car_base_slug, save_with_unique_slug
+from .sorting import SORT_OPTIONS, resolve_sort, sort_cars
+from .views import CarDetailView, CarListView, my_inquiries
+
+User = get_user_model()
+
+
+def create_car(seller, make, model, **kwargs):
+    """
+    Create a car with sensible defaults; any field can be overridden.
+    """
+    defaults = {
+        'year': 2020,
+        'car_type': Car.USED,
+        'price': Decimal('15000.00'),
+        'mileage': 30000,
+        'engine_capacity': Decimal('1.8'),
+        'transmission': Car.AUTOMATIC,
+        'fuel_type': Car.PETROL,
+        'color': 'White',
+        'features': 'Sunroof, Bluetooth',
+        'description': 'A well kept car.',
+    }
+    defaults.update(kwargs)
+    if 'slug' not in defaults:
+        defaults['slug'] = f"car-{Car.objects.count() + 1}"
+    return Car.objects.create(seller=seller, make=make, model=model, **defaults)
+
+
+class CarTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='secret-pass-123')
+        cls.make = CarMake.objects.create(name='Toyota')
+        cls.model = CarModel.objects.create(make=cls.make, name='Corolla')
+
+    def setUp(self):
+        cache.clear()
+        tracking.reset_buffer()
+        reset_catalogue()
+
+    def create_cars(self, count, with_images=True, **kwargs):
+        cars = []
+        for _ in range(count):
+            car = create_car(self.seller, self.make, self.model, **kwargs)
+            if with_images:
+                CarImage.objects.create(car=car, image='cars/side.jpg')
+                CarImage.objects.create(car=car, image='cars/front.jpg', is_primary=True)
+            cars.append(car)
+        return cars
+
+
+class CardDataTests(CarTestMixin, TestCase):
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_primary_image_prefers_is_primary(self):
+        car = self.create_cars(1)[0]
+        prefetched = Car.objects.with_card_data().get(pk=car.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(prefetched.primary_image.image.name, 'cars/front.jpg')
+        self.assertEqual(car.primary_image.image.name, 'cars/front.jpg')
+
+    def test_primary_image_falls_back_to_first_image(self):
+        car = self.create_cars(1, with_images=False)[0]
+        CarImage.objects.create(car=car, image='cars/first.jpg')
+        CarImage.objects.create(car=car, image='cars/second.jpg')
+        prefetched = Car.objects.with_card_data().get(pk=car.pk)
+        self.assertEqual(prefetched.primary_image.image.name, 'cars/first.jpg')
+
+    def test_primary_image_is_none_without_images(self):
+        car = self.create_cars(1, with_images=False)[0]
+        self.assertIsNone(Car.objects.with_card_data().get(pk=car.pk).primary_image)
+
+    def test_car_list_query_count_is_constant(self):
+        self.create_cars(2)
+        small_page = self.count_queries(reverse('car-list'))
+        self.create_cars(10)
+        full_page = self.count_queries(reverse('car-list'))
+        self.assertEqual(small_page, full_page)
+
+    def test_home_query_count_is_constant(self):
+        self.create_cars(1, is_featured=True, car_type=Car.NEW)
+        self.create_cars(1, car_type=Car.RECONDITIONED)
+        small_page = self.count_queries(reverse('home'))
+        self.create_cars(6, is_featured=True, car_type=Car.NEW)
+        self.create_cars(6, car_type=Car.RECONDITIONED)
+        full_page = self.count_queries(reverse('home'))
+        self.assertEqual(small_page, full_page)
+
+    def test_my_listings_query_count_is_constant(self):
+        self.client.force_login(self.seller)
+        self.create_cars(1)
+        small_page = self.count_queries(reverse('my-listings'))
+        self.create_cars(8)
+        full_page = self.count_queries(reverse('my-listings'))
+        self.assertEqual(small_page, full_page)
+
+
+class SearchTests(CarTestMixin, TestCase):
+    def search(self, query):
+        return list(search_cars(Car.objects.all(), query).order_by('-search_rank', 'id'))
+
+    def test_document_is_indexed_on_save(self):
+        car = self.create_cars(1, with_images=False, description='Panoramic sunroof')[0]
+        self.assertIn('Toyota Corolla', car.search_document.document)
+        self.assertEqual(self.search('sunroof'), [car])
+        self.assertEqual(self.search('toyo coro'), [car])
+        self.assertEqual(self.search('tesla'), [])
+
+    def test_document_is_updated_and_removed(self):
+        car = self.create_cars(1, with_images=False, color='Red')[0]
+        car.color = 'Blue'
+        car.save()
+        self.assertEqual(self.search('red'), [])
+        self.assertEqual(self.search('blue'), [car])
+        car.delete()
+        self.assertEqual(self.search('blue'), [])
+
+    def test_make_and_model_renames_reindex_cars(self):
+        car = self.create_cars(1, with_images=False)[0]
+        self.make.name = 'Lexus'
+        self.make.save()
+        self.model.name = 'Camry'
+        self.model.save()
+        self.assertEqual(self.search('lexus camry'), [car])
+        self.assertEqual(self.search('toyota'), [])
+
+    def test_results_are_ranked_by_relevance(self):
+        weak = self.create_cars(1, with_images=False, description='Leather seats and a big boot.')[0]
+        strong = self.create_cars(1, with_images=False, description='Leather leather leather.',
+                                  features='Leather seats, leather wheel')[0]
+        self.assertEqual(self.search('leather'), [strong, weak])
+
+    def test_query_syntax_is_ignored(self):
+        car = self.create_cars(1, with_images=False)[0]
+        self.assertEqual(self.search('"corolla* ('), [car])
+        self.assertEqual(list(search_cars(Car.objects.all(), '"*"')), [car])
+
+    def test_list_view_uses_search(self):
+        match = self.create_cars(1, with_images=False, description='Diesel workhorse')[0]
+        self.create_cars(1, with_images=False, description='City runabout')
+        response = self.client.get(reverse('car-list'), {'q': 'workhorse'})
+        self.assertEqual(list(response.context['cars']), [match])
+
+    def test_rebuild_command(self):
+        car = self.create_cars(1, with_images=False)[0]
+        CarSearchDocument.objects.all().delete()
+        self.assertEqual(self.search('corolla'), [])
+        call_command('rebuild_search_index', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.search('corolla'), [car])
+
+
+@skipUnlessDBFeature('supports_partial_indexes')
+class FilterIndexTests(CarTestMixin, TestCase):
+    def test_filter_paths_use_indexes(self):
+        CarMake.objects.create(name='Honda')
+        self.create_cars(3, with_images=False)
+        for label, params in FILTER_CASES:
+            with self.subTest(label):
+                form = CarFilterForm(params)
+                self.assertTrue(form.is_valid())
+                queryset = filter_cars(Car.objects.filter(is_sold=False), form.cleaned_data)
+                self.assertFalse(is_full_scan(queryset[:12].explain()))
+
+    def test_benchmark_skips_invalid_cases(self):
+        self.create_cars(1, with_images=False)
+        out = StringIO()
+        cases = [('make', {'make': 'Lada'}), ('feature', {'feature': 'sunroof'})]
+        with mock.patch('cars.management.commands.benchmark_car_filters.FILTER_CASES', cases):
+            failures, skipped = BenchmarkCarFilters(stdout=out).run_cases(repeat=1)
+        self.assertEqual((failures, skipped), ([], ['make']))
+        self.assertIn('Unknown make.', out.getvalue())
+        self.assertNotIn('make                         rows=', out.getvalue())
+
+    def test_car_type_filter_uses_partial_index(self):
+        plan = Car.objects.filter(is_sold=False, car_type=Car.NEW)[:12].explain()
+        self.assertIn('car_active_type_posted_idx', plan)
+
+
+class FacetTests(CarTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.honda = CarMake.objects.create(name='Honda')
+        cls.civic = CarModel.objects.create(make=cls.honda, name='Civic')
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(7)
+        for _ in range(40):
+            make, model = rng.choice([(self.make, self.model), (self.honda, self.civic)])
+            create_car(
+                self.seller, make, model,
+                car_type=rng.choice([Car.NEW, Car.USED, Car.RECONDITIONED]),
+                fuel_type=rng.choice([Car.PETROL, Car.DIESEL, Car.HYBRID]),
+                transmission=rng.choice([Car.AUTOMATIC, Car.MANUAL]),
+                price=Decimal(rng.choice([8000, 10000, 15000, 20000, 42000, 65000])),
+                year=rng.randint(2005, 2024),
+                is_sold=rng.random() < 0.1,
+            )
+
+    def expected(self, data, facet, value):
+        if facet in RANGE_FACETS:
+            low, high = RANGE_FACETS[facet][1][value]
+            names = FACET_PARAMS[facet]
+            data = {**data, names[0]: low, names[1]: high}
+        else:
+            data = {**data, facet: value}
+        return filter_cars(Car.objects.filter(is_sold=False), data).count()
+
+    def test_counts_match_the_results_of_each_option(self):
+        states = [
+            {},
+            {'car_type': Car.NEW},
+            {'car_type': Car.USED, 'fuel_type': Car.DIESEL},
+            {'min_price': Decimal('10000'), 'max_price': Decimal('20000'), 'transmission': Car.MANUAL},
+            {'min_year': 2015, 'make': self.honda.pk},
+        ]
+        for data in states:
+            with self.subTest(data=data):
+                counts = compute_facet_counts(data)
+                for facet, options in counts.items():
+                    if facet == 'make':
+                        continue
+                    for value, count in options.items():
+                        # A facet ignores its own filter
+                        own = {key: v for key, v in data.items() if key not in FACET_PARAMS[facet]}
+                        self.assertEqual(count, self.expected(own, facet, value), (facet, value))
+                others = {key: v for key, v in data.items() if key != 'make'}
+                self.assertEqual(
+                    counts['make'].get(self.honda.pk, 0),
+                    filter_cars(Car.objects.filter(is_sold=False, make=self.honda), others).count(),
+                )
+
+    def test_two_queries_then_cached(self):
+        with self.assertNumQueries(2):
+            counts = facet_counts({'car_type': Car.NEW})
+        with self.assertNumQueries(0):
+            self.assertEqual(facet_counts({'car_type': Car.NEW, 'make': ''}), counts)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_car(self.seller, self.make, self.model, car_type=Car.NEW, fuel_type=Car.ELECTRIC)
+        fresh = facet_counts({'car_type': Car.NEW})
+        self.assertEqual(fresh['fuel_type'][Car.ELECTRIC], counts['fuel_type'][Car.ELECTRIC] + 1)
+
+    def test_search_narrows_counts(self):
+        counts = compute_facet_counts({}, 'civic')
+        self.assertEqual(counts['make'].get(self.make.pk, 0), 0)
+        self.assertEqual(
+            sum(counts['car_type'].values()), Car.objects.filter(is_sold=False, model=self.civic).count()
+        )
+
+    def test_sidebar_shows_counts(self):
+        response = self.client.get(reverse('car-list'), {'fuel_type': Car.DIESEL, 'sort': 'price-low', 'page': '1'})
+        facets = response.context['facets']
+        diesel = next(option for option in facets['fuel_type'] if option['value'] == Car.DIESEL)
+        self.assertTrue(diesel['selected'])
+        self.assertContains(response, f"Diesel ({diesel['count']})")
+        under = facets['price'][0]
+        self.assertEqual(under['query'], 'fuel_type=diesel&max_price=10000&sort=price-low')
+        self.assertEqual(under['label'], 'Under $10,000')
+
+
+class FeatureTests(CarTestMixin, TestCase):
+    def test_parse_features(self):
+        self.assertEqual(
+            parse_features('Sunroof, bluetooth\n  Heated   seats,,SUNROOF\nBlue-tooth'),
+            [('sunroof', 'Sunroof'), ('bluetooth', 'bluetooth'), ('heated-seats', 'Heated seats'),
+             ('blue-tooth', 'Blue-tooth')],
+        )
+        self.assertEqual(parse_features(''), [])
+
+    def test_non_ascii_names_keep_their_letters(self):
+        self.assertEqual(
+            parse_features('Climatisation élec, Climatisation elec, Камера заднего вида, Straße, 天窗'),
+            [('climatisation-elec', 'Climatisation élec'), ('камера-заднего-вида', 'Камера заднего вида'),
+             ('straße', 'Straße'), ('天窗', '天窗')],
+        )
+        car = create_car(self.seller, self.make, self.model, features='Камера заднего вида')
+        create_car(self.seller, self.make, self.model, features='Sunroof')
+        response = self.client.get(reverse('car-list'), {'feature': 'камера-заднего-вида'})
+        self.assertEqual(list(response.context['cars']), [car])
+
+    def test_migration_links_existing_features(self):
+        migration = importlib.import_module('cars.migrations.0013_feature_catalogue')
+        car = create_car(self.seller, self.make, self.model, features='Sunroof, Climatisation élec, 天窗')
+        # As before the catalogue, and with the slugs of the time
+        Feature.objects.all().delete()
+        migration.link_existing_features(django_apps, None)
+        self.assertEqual(sorted(car.feature_tags.values_list('slug', flat=True)), ['climatisation-elec', 'sunroof'])
+
+    def test_migration_links_non_ascii_features(self):
+        migration = importlib.import_module('cars.migrations.0014_feature_unicode_slug')
+        car = create_car(self.seller, self.make, self.model, features='Sunroof, 天窗')
+        # As before, when the second name had no slug and so no feature
+        car.feature_tags.filter(slug='天窗').delete()
+        migration.relink_non_ascii_features(django_apps, None)
+        self.assertEqual(sorted(car.feature_tags.values_list('slug', flat=True)), ['sunroof', '天窗'])
+
+    def test_links_follow_the_text(self):
+        car = create_car(self.seller, self.make, self.model, features='Sunroof, Bluetooth')
+        other = create_car(self.seller, self.make, self.model, features='sunroof\nAlloy wheels')
+        self.assertEqual(Feature.objects.count(), 3)
+        self.assertEqual(sorted(car.feature_tags.values_list('slug', flat=True)), ['bluetooth', 'sunroof'])
+        self.assertEqual(sorted(other.feature_tags.values_list('slug', flat=True)), ['alloy-wheels', 'sunroof'])
+
+        car.features = 'Bluetooth, Cruise control'
+        car.save()
+        self.assertEqual(sorted(car.feature_tags.values_list('name', flat=True)), ['Bluetooth', 'Cruise control'])
+
+    def test_filter_needs_every_feature(self):
+        both = create_car(self.seller, self.make, self.model, features='Sunroof, Bluetooth, Leather seats')
+        create_car(self.seller, self.make, self.model, features='Sunroof')
+        create_car(self.seller, self.make, self.model, features='Bluetooth')
+
+        form = CarFilterForm(QueryDict('feature=sunroof&feature=bluetooth'))
+        self.assertTrue(form.is_valid())
+        self.assertEqual(list(filter_cars(Car.objects.all(), form.cleaned_data)), [both])
+        form = CarFilterForm(QueryDict('feature=sunroof'))
+        self.assertTrue(form.is_valid())
+        self.assertEqual(filter_cars(Car.objects.all(), form.cleaned_data).count(), 2)
+        self.assertFalse(CarFilterForm(QueryDict('feature=sunroof&feature=jetpack')).is_valid())
+
+    def test_unknown_feature_leaves_the_other_filters(self):
+        used = create_car(self.seller, self.make, self.model, features='Sunroof', car_type=Car.USED)
+        create_car(self.seller, self.make, self.model, features='Sunroof', car_type=Car.RECONDITIONED)
+        form = CarFilterForm(QueryDict('feature=nonexistent&car_type=used'))
+        self.assertEqual(form.errors['feature'], ['Unknown feature: nonexistent.'])
+        response = self.client.get(reverse('car-list'), {'feature': 'nonexistent', 'car_type': Car.USED})
+        self.assertEqual(list(response.context['cars']), [used])
+
+    @skipUnlessDBFeature('supports_partial_indexes')
+    def test_filter_plans_follow_how_common_features_are(self):
+        self.create_cars(30, with_images=False, features='Sunroof, Bluetooth')
+        rare = create_car(self.seller, self.make, self.model, features='Sunroof, Head-up display')
+        ids = dict(Feature.objects.values_list('slug', 'pk'))
+
+        # Common: walk the sort order, probing each car
+        common = filter_cars(Car.objects.filter(is_sold=False), {'feature': [ids['sunroof'], ids['bluetooth']]})
+        plan = common.order_by('-posted_on', '-id')[:12].explain()
+        self.assertIn('car_active_posted_idx', plan)
+        self.assertFalse(is_full_scan(plan))
+        self.assertEqual(common.count(), 30)
+
+        # Rare: start from the rare feature's cars
+        narrow = filter_cars(Car.objects.filter(is_sold=False), {'feature': [ids['sunroof'], ids['head-up-display']]})
+        self.assertIn('car_feature_lookup_idx', narrow[:12].explain())
+        self.assertEqual(list(narrow), [rare])
+
+    def test_list_page_keeps_every_feature(self):
+        self.create_cars(13, features='Sunroof, Bluetooth')
+        response = self.client.get(reverse('car-list'), {'feature': ['sunroof', 'bluetooth']})
+        self.assertEqual(response.context['paginator'].count, 13)
+        self.assertContains(response, '?page=2&feature=sunroof&amp;feature=bluetooth')
+        selected = [feature.slug for feature in response.context['feature_options'] if feature.selected]
+        self.assertEqual(sorted(selected), ['bluetooth', 'sunroof'])
+
+    def test_detail_page_lists_features_escaped(self):
+        car = create_car(self.seller, self.make, self.model, features='Sunroof, <b>Turbo</b>')
+        response = self.client.get(car.get_absolute_url())
+        self.assertContains(response, '<span>Sunroof</span>', html=True)
+        self.assertContains(response, '&lt;b&gt;Turbo&lt;/b&gt;')
+
+
+class KeysetPaginationTests(CarTestMixin, TestCase):
+    def walk(self, paginator):
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(car.id for car in page)
+            if not page.has_next():
+                return seen
+            cursor = page.next_cursor
+
+    def test_walks_every_car_once_with_tied_sort_keys(self):
+        cars = self.create_cars(7, with_images=False)
+        Car.objects.update(posted_on=cars[0].posted_on)
+        paginator = KeysetPaginator(Car.objects.all(), per_page=3)
+        self.assertEqual(paginator.ordering, ['-posted_on', '-id'])
+        self.assertEqual(self.walk(paginator), sorted((car.id for car in cars), reverse=True))
+
+    def test_pages_do_not_use_offset(self):
+        self.create_cars(5, with_images=False)
+        paginator = KeysetPaginator(Car.objects.all(), per_page=2)
+        cursor = paginator.page().next_cursor
+        with CaptureQueriesContext(connection) as ctx:
+            paginator.page(cursor)
+        self.assertNotIn('OFFSET', ctx.captured_queries[0]['sql'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('car-list-json'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_json_feed_continues_from_list_page(self):
+        cars = self.create_cars(14)
+        response = self.client.get(reverse('car-list'))
+        next_cursor = response.context['next_cursor']
+        response = self.client.get(reverse('car-list-json'), {'cursor': next_cursor})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([card['id'] for card in data['results']], [cars[1].id, cars[0].id])
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['results'][0]['image'], '/media/cars/front.jpg')
+
+    @mock.patch.object(CappedPaginator, 'max_pages', 1)
+    def test_list_goes_on_by_cursor_past_the_last_numbered_page(self):
+        cars = self.create_cars(14)
+        self.assertEqual(self.client.get(reverse('car-list'), {'page': 2}).status_code, 404)
+        response = self.client.get(reverse('car-list'))
+        next_cursor = response.context['next_cursor']
+        self.assertContains(response, f'href="?cursor={next_cursor}"')
+        response = self.client.get(reverse('car-list'), {'cursor': next_cursor})
+        self.assertTrue(response.context['cursor_page'])
+        self.assertEqual(list(response.context['cars']), [cars[1], cars[0]])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertEqual(self.client.get(reverse('car-list'), {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_relevance_cursor_survives_rank_changes(self):
+        strong = self.create_cars(1, with_images=False, description='Leather leather leather.')[0]
+        weak = self.create_cars(1, with_images=False, description='Leather seats and a big boot.')[0]
+        paginator = KeysetPaginator(sort_cars(search_cars(Car.objects.all(), 'leather'), 'relevance', searching=True), 1)
+        page = paginator.page()
+        self.assertEqual(page.object_list, [strong])
+        # A new car changes the index's statistics, lowering every rank
+        self.create_cars(1, with_images=False, description='Panoramic sunroof')
+        self.assertEqual(paginator.page(page.next_cursor).object_list, [weak])
+
+    def test_count_is_cached_until_inventory_changes(self):
+        self.create_cars(3, with_images=False)
+        self.assertEqual(CachedCountPaginator(Car.objects.all(), 2).count, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCountPaginator(Car.objects.all(), 2).count, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_cars(1, with_images=False)
+        self.assertEqual(CachedCountPaginator(Car.objects.all(), 2).count, 4)
+
+
+class SortingTests(CarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cheap = self.create_cars(1, with_images=False, price=Decimal('5000'), mileage=90000, year=2012)[0]
+        self.mid_a = self.create_cars(1, with_images=False, price=Decimal('10000'), mileage=40000, year=2018)[0]
+        self.mid_b = self.create_cars(1, with_images=False, price=Decimal('10000'), mileage=40000, year=2018)[0]
+        self.pricey = self.create_cars(1, with_images=False, price=Decimal('30000'), mileage=1000, year=2024)[0]
+
+    def sorted_ids(self, key):
+        return [car.id for car in sort_cars(Car.objects.all(), key)]
+
+    def test_sort_keys(self):
+        ids = [self.cheap.id, self.mid_a.id, self.mid_b.id, self.pricey.id]
+        self.assertEqual(self.sorted_ids('price-low'), ids)
+        self.assertEqual(self.sorted_ids('price-high'), ids[::-1])
+        self.assertEqual(self.sorted_ids('mileage-low'), [self.pricey.id, self.mid_a.id, self.mid_b.id, self.cheap.id])
+        self.assertEqual(self.sorted_ids('year-old'), ids)
+        self.assertEqual(self.sorted_ids('year-new'), ids[::-1])
+        self.assertEqual(self.sorted_ids('oldest'), ids)
+
+    def test_unknown_sort_falls_back(self):
+        self.assertEqual(resolve_sort('bogus'), 'newest')
+        self.assertEqual(resolve_sort('bogus', searching=True), 'relevance')
+        self.assertEqual(resolve_sort('relevance'), 'newest')
+        self.assertEqual(resolve_sort('price-low', searching=True), 'price-low')
+
+    def test_list_view_applies_sort(self):
+        response = self.client.get(reverse('car-list'), {'sort': 'price-high'})
+        self.assertEqual([car.id for car in response.context['cars']][0], self.pricey.id)
+        self.assertContains(response, 'Price: High to Low')
+
+    def test_keyset_pages_follow_sort(self):
+        for key in SORT_OPTIONS:
+            with self.subTest(key):
+                paginator = KeysetPaginator(sort_cars(Car.objects.all(), key), per_page=1)
+                seen, cursor = [], None
+                while True:
+                    page = paginator.page(cursor)
+                    seen.extend(car.id for car in page)
+                    if not page.has_next():
+                        break
+                    cursor = page.next_cursor
+                self.assertEqual(seen, self.sorted_ids(key))
+
+    @skipUnlessDBFeature('supports_partial_indexes')
+    def test_sorts_are_index_backed(self):
+        for key in SORT_OPTIONS:
+            with self.subTest(key):
+                plan = sort_cars(Car.objects.filter(is_sold=False), key)[:12].explain()
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class CachingTests(CarTestMixin, TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(
+            normalize_query(QueryDict('sort=price-low&make=&car_type=new')),
+            normalize_query(QueryDict('car_type=new&sort=price-low')),
+        )
+
+    def test_generations_are_bumped_after_commit(self):
+        before = [get_generation(HOME), get_generation(LISTINGS)]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                car = self.create_cars(1)[0]
+                car.price += 1
+                car.save()
+                # Another request caching now would still see the old rows
+                self.assertEqual([get_generation(HOME), get_generation(LISTINGS)], before)
+        after = [get_generation(HOME), get_generation(LISTINGS)]
+        self.assertTrue(all(new > old for new, old in zip(after, before)))
+
+    def test_home_sections_are_cached_and_invalidated(self):
+        car = self.create_cars(1, is_featured=True)[0]
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['featured_car'], car)
+
+        car.is_featured = False
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        response = self.client.get(reverse('home'))
+        self.assertIsNone(response.context['featured_car'])
+
+    def test_anonymous_list_pages_are_cached(self):
+        self.create_cars(2)
+        url = reverse('car-list')
+        first = self.client.get(url, {'sort': 'price-low', 'make': ''})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'sort': 'price-low'})
+        self.assertEqual(first.content, second.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarImage.objects.filter(car__isnull=False).first().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'sort': 'price-low'})
+        self.assertTrue(ctx.captured_queries)
+
+    def test_authenticated_list_pages_are_not_cached(self):
+        self.create_cars(1)
+        self.client.force_login(self.seller)
+        self.client.get(reverse('car-list'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('car-list'))
+        self.assertTrue(ctx.captured_queries)
+
+    def test_makes_are_invalidated_on_rename(self):
+        self.client.get(reverse('home'))
+        self.make.name = 'Lexus'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make.save()
+        response = self.client.get(reverse('home'))
+        self.assertEqual([make.name for make in response.context['makes']], ['Lexus'])
+
+    def test_hit_and_miss_counters(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        stats = cache_stats()['home']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_cache_stats_view_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, 302)
+        staff = User.objects.create_user('staff', password='secret-pass-123', is_staff=True)
+        self.client.force_login(staff)
+        self.assertIn('listings', self.client.get(reverse('cache-stats')).json())
+
+
+def make_upload(name='photo.jpg', size=(1800, 1200), fmt='JPEG', mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ImageDerivativeTests(CarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.car = self.create_cars(1, with_images=False)[0]
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, image=None, **kwargs):
+        """
+        Create a CarImage and run the derivative task queued on commit (eagerly,
+        as there's no broker in tests).
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            instance = CarImage.objects.create(car=self.car, image=image or make_upload(), **kwargs)
+        instance.refresh_from_db()
+        return instance
+
+    def test_derivatives_are_rendered_on_upload(self):
+        image = self.upload()
+        self.assertEqual(image.processing_status, PROCESSING_READY)
+        self.assertEqual((image.width, image.height), (1800, 1200))
+        card = image.derivatives['card']
+        self.assertEqual((card['width'], card['height']), (600, 440))
+        gallery = image.derivatives['gallery']
+        self.assertEqual((gallery['width'], gallery['height']), (1024, 683))
+        self.assertTrue(card['webp'].endswith('.webp'))
+        self.assertTrue(default_storage.exists(card['webp']))
+        self.assertTrue(default_storage.exists(card['jpeg']))
+        with default_storage.open(card['webp']) as f:
+            self.assertEqual(Image.open(f).format, 'WEBP')
+
+    def test_rendering_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            image = CarImage.objects.create(car=self.car, image=make_upload())
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, PROCESSING_PENDING)
+        self.assertEqual(image.derivatives, {})
+
+        html = Template("{% load car_tags %}{% responsive_image image 'card' %}").render(Context({'image': image}))
+        self.assertIn('image-placeholder', html)
+
+        # The render, and the cache bumps, run once the image is committed
+        for callback in callbacks:
+            callback()
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, PROCESSING_READY)
+        self.assertIn('card', image.derivatives)
+
+    def test_unreadable_upload_is_marked_failed(self):
+        with self.assertLogs('cars.images', 'WARNING'):
+            image = self.upload(SimpleUploadedFile('broken.jpg', b'not an image'))
+        self.assertEqual(image.processing_status, PROCESSING_FAILED)
+        html = Template("{% load car_tags %}{% responsive_image image 'card' %}").render(Context({'image': image}))
+        self.assertNotIn('image-placeholder', html)
+        self.assertIn('broken', html)
+
+    def test_task_bumps_cache_generations(self):
+        before = cache_stats()
+        self.upload()
+        after = cache_stats()
+        self.assertGreater(after['listings']['generation'], before['listings']['generation'])
+        # Car photos don't touch the cached makes
+        self.assertEqual(after['makes']['generation'], before['makes']['generation'])
+
+    def test_errors_are_retried_before_failing(self):
+        image = self.upload()
+        label = CarImage._meta.label
+        with mock.patch('cars.tasks.generate_derivatives', side_effect=RuntimeError('storage down')):
+            # Inline, without a broker: given up on at once, not raised
+            with self.assertLogs('cars.tasks', 'WARNING'):
+                process_image_derivatives.delay(label, image.pk)
+            image.refresh_from_db()
+            self.assertEqual(image.processing_status, PROCESSING_FAILED)
+
+            # On a worker: retried, then marked failed once retries run out
+            with mock.patch.object(process_image_derivatives, 'retry', side_effect=Retry) as retry:
+                process_image_derivatives.push_request(is_eager=False, retries=0)
+                try:
+                    with self.assertRaises(Retry):
+                        process_image_derivatives(label, image.pk)
+                    image.refresh_from_db()
+                    self.assertEqual(image.processing_status, PROCESSING_PENDING)
+
+                    process_image_derivatives.request.retries = process_image_derivatives.max_retries
+                    with self.assertLogs('cars.tasks', 'WARNING'):
+                        process_image_derivatives(label, image.pk)
+                finally:
+                    process_image_derivatives.pop_request()
+            retry.assert_called_once()
+            image.refresh_from_db()
+            self.assertEqual(image.processing_status, PROCESSING_FAILED)
+
+    def test_transparent_logo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make = CarMake.objects.create(name='Audi', logo=make_upload('logo.png', (500, 250), 'PNG', 'RGBA'))
+        make.refresh_from_db()
+        self.assertEqual(make.processing_status, PROCESSING_READY)
+        self.assertEqual(make.derivatives['logo']['width'], 120)
+        self.assertEqual(make.derivatives['logo']['height'], 60)
+
+    def test_replacing_image_removes_old_derivatives(self):
+        image = self.upload(make_upload('old.jpg'))
+        old_card = image.derivatives['card']['webp']
+        image.image = make_upload('new.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+        self.assertFalse(default_storage.exists(old_card))
+        self.assertTrue(default_storage.exists(image.derivatives['card']['webp']))
+
+    def test_responsive_image_tag(self):
+        image = self.upload()
+        html = Template(
+            "{% load car_tags %}{% responsive_image image 'card' sizes='300px' alt='A car' css_class='car-image' %}"
+        ).render(Context({'image': image}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertRegex(html, r'-thumb\.[0-9a-f]{12}\.webp 300w')
+        self.assertRegex(html, r'-card\.[0-9a-f]{12}\.webp 600w')
+        self.assertNotIn('-gallery', html)
+        self.assertIn('width="600" height="440"', html)
+        self.assertIn('class="car-image"', html)
+
+    def test_responsive_image_falls_back_to_original(self):
+        image = self.upload('cars/missing.jpg')
+        self.assertEqual(image.processing_status, PROCESSING_FAILED)
+        html = Template(
+            "{% load car_tags %}{% responsive_image image 'card' %}"
+        ).render(Context({'image': image}))
+        self.assertIn('src="/media/cars/missing.jpg"', html)
+
+    def test_backfill_command(self):
+        image = self.upload()
+        CarImage.objects.filter(pk=image.pk).update(derivatives={}, width=None, height=None)
+        call_command('generate_image_derivatives', stdout=open(os.devnull, 'w'))
+        image.refresh_from_db()
+        self.assertIn('zoom', image.derivatives)
+        self.assertEqual(image.width, 1800)
+
+    def test_backfill_command_records_status(self):
+        rendered = self.upload()
+        missing = self.upload('cars/missing.jpg')
+        CarImage.objects.update(derivatives={}, processing_status=PROCESSING_PENDING)
+        call_command('generate_image_derivatives', stdout=open(os.devnull, 'w'))
+        rendered.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual(rendered.processing_status, PROCESSING_READY)
+        self.assertEqual(missing.processing_status, PROCESSING_FAILED)
+
+    def test_migration_settles_pending_images(self):
+        migration = importlib.import_module('cars.migrations.0016_backfill_processing_status')
+        rendered = self.upload()
+        unrendered = self.upload()
+        CarImage.objects.update(processing_status=PROCESSING_PENDING)
+        CarImage.objects.filter(pk=unrendered.pk).update(derivatives={})
+        migration.settle_pending_images(django_apps, None)
+        self.assertEqual(
+            dict(CarImage.objects.values_list('pk', 'processing_status')),
+            {rendered.pk: PROCESSING_READY, unrendered.pk: PROCESSING_FAILED},
+        )
+
+    def test_backfill_command_can_queue(self):
+        image = self.upload()
+        CarImage.objects.filter(pk=image.pk).update(derivatives={}, processing_status=PROCESSING_PENDING)
+        call_command('generate_image_derivatives', queue=True, stdout=open(os.devnull, 'w'))
+        image.refresh_from_db()
+        self.assertEqual(image.processing_status, PROCESSING_READY)
+        self.assertIn('zoom', image.derivatives)
+
+
+def unsaved_car(seller, make, model, **kwargs):
+    car = Car(seller=seller, make=make, model=model, year=2020, car_type=Car.USED, price=Decimal('15000.00'),
+              mileage=30000, engine_capacity=Decimal('1.8'), transmission=Car.AUTOMATIC,
+              fuel_type=Car.PETROL, color='White', description='A well kept car.')
+    for name, value in kwargs.items():
+        setattr(car, name, value)
+    return car
+
+
+class SlugAllocationTests(CarTestMixin, TestCase):
+    def test_base_slug_uses_names(self):
+        car = unsaved_car(self.seller, self.make, self.model)
+        self.assertEqual(car_base_slug(car), '2020-toyota-corolla')
+
+    def test_counter_starts_after_slugs_in_use(self):
+        for slug in ('2020-toyota-corolla', '2020-toyota-corolla-1', '2020-toyota-corolla-7',
+                     '2020-toyota-corolla-cross', '2020-toyota-corolla-cross-9'):
+            create_car(self.seller, self.make, self.model, slug=slug)
+        self.assertEqual(allocate_slug('2020-toyota-corolla'), '2020-toyota-corolla-8')
+        with self.assertNumQueries(1):
+            self.assertEqual(allocate_slug('2020-toyota-corolla'), '2020-toyota-corolla-9')
+        self.assertEqual(allocate_slug('2020-toyota-camry'), '2020-toyota-camry')
+
+    def test_bulk_allocation(self):
+        create_car(self.seller, self.make, self.model, slug='2020-toyota-corolla')
+        slugs = allocate_slugs(['2020-toyota-corolla', '2021-toyota-corolla', '2020-toyota-corolla'])
+        self.assertEqual(slugs, ['2020-toyota-corolla-1', '2021-toyota-corolla', '2020-toyota-corolla-2'])
+        # Once the bases have counters, one query however many slugs
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(['2020-toyota-corolla', '2021-toyota-corolla', '2020-toyota-corolla'])
+        self.assertEqual(slugs, ['2020-toyota-corolla-3', '2021-toyota-corolla-1', '2020-toyota-corolla-4'])
+
+    def test_counter_catches_up_with_slugs_taken_by_hand(self):
+        save_with_unique_slug(unsaved_car(self.seller, self.make, self.model))
+        create_car(self.seller, self.make, self.model, slug='2020-toyota-corolla-1')
+        create_car(self.seller, self.make, self.model, slug='2020-toyota-corolla-5')
+        car = save_with_unique_slug(unsaved_car(self.seller, self.make, self.model))
+        self.assertEqual(car.slug, '2020-toyota-corolla-6')
+
+    def test_retries_when_slug_is_claimed_after_allocation(self):
+        create_car(self.seller, self.make, self.model, slug='2020-toyota-corolla')
+        real_allocate = slugs.allocate_slug
+        stale = iter(['2020-toyota-corolla'])
+
+        def allocate(base):
+            # First answer is stale, as if another request got there first
+            return next(stale, None) or real_allocate(base)
+
+        with mock.patch.object(slugs, 'allocate_slug', allocate):
+            car = save_with_unique_slug(unsaved_car(self.seller, self.make, self.model))
+        self.assertEqual(car.slug, '2020-toyota-corolla-1')
+        self.assertEqual(Car.objects.filter(slug__startswith='2020-toyota-corolla').count(), 2)
+
+    def test_create_view_allocates_slug(self):
+        create_car(self.seller, self.make, self.model, slug='2020-toyota-corolla')
+        self.client.force_login(self.seller)
+        data = {
+            'make': self.make.pk, 'model': self.model.pk, 'year': 2020, 'car_type': Car.USED,
+            'price': '15000', 'mileage': 30000, 'engine_capacity': '1.8', 'transmission': Car.AUTOMATIC,
+            'fuel_type': Car.PETROL, 'color': 'White', 'doors': 4, 'seats': 5,
+            'features': 'Bluetooth', 'description': 'Nice', 'slug': '',
+            'images-TOTAL_FORMS': 0, 'images-INITIAL_FORMS': 0,
+        }
+        response = self.client.post(reverse('car-create'), data)
+        car = Car.objects.get(slug='2020-toyota-corolla-1')
+        self.assertRedirects(response, car.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEqual(car.seller, self.seller)
+
+
+class ListingFormTests(CarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.client.force_login(self.seller)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def post_data(self, images=(), existing=(), **kwargs):
+        data = {
+            'make': self.make.pk, 'model': self.model.pk, 'year': 2020, 'car_type': Car.USED,
+            'price': '15000', 'mileage': 30000, 'engine_capacity': '1.8', 'transmission': Car.AUTOMATIC,
+            'fuel_type': Car.PETROL, 'color': 'White', 'doors': 4, 'seats': 5,
+            'features': 'Bluetooth', 'description': 'Nice', 'slug': '',
+            'images-TOTAL_FORMS': len(existing) + len(images), 'images-INITIAL_FORMS': len(existing),
+        }
+        for index, image in enumerate(existing):
+            data[f'images-{index}-id'] = image.pk
+        for index, upload in enumerate(images, start=len(existing)):
+            data[f'images-{index}-image'] = upload
+        data.update(kwargs)
+        return data
+
+    def create_listing(self, image_count):
+        data = self.post_data([make_upload(f'{index}.jpg', size=(40, 30)) for index in range(image_count)],
+                              **{'images-0-is_primary': 'on'})
+        with mock.patch('cars.listings.process_image_derivatives') as task:
+            with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('car-create'), data)
+        self.assertEqual(response.status_code, 302)
+        writes = [query['sql'] for query in ctx.captured_queries
+                  if query['sql'].split(None, 1)[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        return writes, task
+
+    def test_create_writes_do_not_grow_with_images(self):
+        # The first listing of a base also starts its slug counter
+        self.create_listing(1)
+        one, _ = self.create_listing(1)
+        five, task = self.create_listing(5)
+        self.assertEqual(len(one), len(five))
+        self.assertEqual(len([sql for sql in five if sql.startswith('INSERT INTO "cars_carimage"')]), 1)
+
+        car = Car.objects.latest('id')
+        self.assertEqual(car.seller, self.seller)
+        self.assertEqual(car.images.count(), 5)
+        self.assertEqual(car.images.get(is_primary=True), car.images.order_by('id').first())
+        # Derivatives are still queued, once per new image
+        self.assertEqual(task.delay.call_count, 5)
+
+    def test_caches_are_dropped_after_commit(self):
+        data = self.post_data([make_upload('a.jpg', size=(40, 30))], **{'images-0-is_primary': 'on'})
+        before = get_generation(LISTINGS)
+        with mock.patch('cars.listings.process_image_derivatives'):
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.post(reverse('car-create'), data)
+            self.assertEqual(get_generation(LISTINGS), before)
+            for callback in callbacks:
+                callback()
+        self.assertGreater(get_generation(LISTINGS), before)
+
+    def test_invalid_images_keep_the_car_unsaved(self):
+        data = self.post_data(
+            [make_upload('a.jpg', size=(40, 30)), make_upload('b.jpg', size=(40, 30))],
+            **{'images-0-is_primary': 'on', 'images-1-is_primary': 'on', 'price': ''},
+        )
+        response = self.client.post(reverse('car-create'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Car.objects.exists())
+        # Both the car and its images report their errors at once
+        self.assertIn('price', response.context['form'].errors)
+        self.assertContains(response, 'Only one image can be the primary image.')
+
+    def test_failed_image_insert_rolls_back_the_car(self):
+        data = self.post_data([make_upload('a.jpg', size=(40, 30))])
+        with mock.patch.object(CarImage.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.post(reverse('car-create'), data)
+        self.assertFalse(Car.objects.exists())
+
+    def test_update_moves_the_primary_image(self):
+        car = self.create_cars(1)[0]
+        side, front = car.images.order_by('id')
+        data = self.post_data(existing=[side, front], slug=car.slug, **{'images-0-is_primary': 'on'})
+        response = self.client.post(reverse('car-update', args=[car.slug]), data)
+        self.assertRedirects(response, car.get_absolute_url(), fetch_redirect_response=False)
+        self.assertEqual(list(car.images.filter(is_primary=True)), [side])
+
+    def test_database_allows_one_primary_image_per_car(self):
+        car = self.create_cars(1)[0]
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CarImage.objects.create(car=car, image='cars/extra.jpg', is_primary=True)
+
+
+class ConcurrentSlugAllocationTests(TransactionTestCase):
+    workers = 8
+    cars_per_worker = 40
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Threads share an in-memory SQLite database through its shared
+            # cache, which fails concurrent writers instead of making them wait.
+            self.skipTest("needs a file-backed or server test database")
+
+    def test_parallel_creates_get_distinct_slugs(self):
+        seller = User.objects.create_user('seller')
+        make = CarMake.objects.create(name='Toyota')
+        model = CarModel.objects.create(make=make, name='Corolla')
+        barrier = threading.Barrier(self.workers)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.cars_per_worker):
+                    save_with_unique_slug(unsaved_car(seller, make, model))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        slugs = list(Car.objects.values_list('slug', flat=True))
+        self.assertEqual(len(slugs), self.workers * self.cars_per_worker)
+        self.assertEqual(len(set(slugs)), len(slugs))
+
+
+class ImportTests(CarTestMixin, TestCase):
+    header = 'make,model,year,car_type,price,mileage,engine_capacity,transmission,fuel_type,color,features,description\n'
+
+    def import_csv(self, body, **kwargs):
+        return import_file(StringIO(self.header + body), self.seller, 'csv', **kwargs)
+
+    def test_imports_rows_and_creates_makes_and_models(self):
+        body = (
+            'Toyota,Corolla,2020,used,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n'
+            'toyota,corolla,2020,Used,16000,20000,1.8,Automatic,Petrol,Black,Bluetooth,Clean\n'
+            'Honda,Civic,2019,reconditioned,18000,10000,1.5,cvt,hybrid,Red,Sunroof,Like new\n'
+        )
+        result = self.import_csv(body)
+        self.assertEqual((result.created, result.errors), (3, []))
+        self.assertEqual(CarMake.objects.filter(name__iexact='toyota').count(), 1)
+        self.assertTrue(CarModel.objects.filter(make__name='Honda', name='Civic').exists())
+        self.assertEqual(Car.objects.filter(feature_tags__slug='bluetooth').count(), 2)
+        self.assertEqual(
+            sorted(Car.objects.values_list('slug', flat=True)),
+            ['2019-honda-civic', '2020-toyota-corolla', '2020-toyota-corolla-1'],
+        )
+        # bulk_create bypasses the signals, so the importer indexes the cars itself
+        self.assertEqual(search_cars(Car.objects.all(), 'civic').count(), 1)
+
+    def test_bad_rows_are_reported_with_their_line(self):
+        body = (
+            'Toyota,Corolla,2020,used,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n'
+            'Toyota,Corolla,twenty,flying,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n'
+            ',Corolla,2020,used,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n'
+        )
+        result = self.import_csv(body)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        self.assertIn('year:', result.errors[0][1])
+        self.assertIn('car_type:', result.errors[0][1])
+        self.assertIn('make:', result.errors[1][1])
+
+    def test_unknown_make_rejected_without_create(self):
+        body = 'Lada,Niva,1990,used,900,250000,1.7,manual,petrol,Green,Winch,Runs\n'
+        result = self.import_csv(body, create_missing=False)
+        self.assertEqual(result.created, 0)
+        self.assertIn("Unknown make 'Lada'", result.errors[0][1])
+        self.assertFalse(CarMake.objects.filter(name='Lada').exists())
+
+    def test_query_count_is_per_batch(self):
+        row = 'Toyota,Corolla,2020,used,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n'
+        # The first import of a base also starts its slug counter
+        self.import_csv(row)
+        with CaptureQueriesContext(connection) as small:
+            self.import_csv(row * 2, batch_size=40)
+        with CaptureQueriesContext(connection) as large:
+            self.import_csv(row * 40, batch_size=40)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_jsonl(self):
+        lines = [
+            json.dumps({'make': 'Toyota', 'model': 'Corolla', 'year': 2021, 'car_type': 'new', 'price': 21000.5,
+                        'mileage': 0, 'engine_capacity': 1.8, 'transmission': 'cvt', 'fuel_type': 'hybrid',
+                        'color': 'Blue', 'features': 'Camera', 'description': 'New'}),
+            '{not json',
+            '[1, 2]',
+        ]
+        result = import_file(StringIO('\n'.join(lines)), self.seller, 'jsonl')
+        self.assertEqual(result.created, 1, result.errors)
+        self.assertEqual(Car.objects.get().price, Decimal('21000.50'))
+        self.assertEqual([line for line, _ in result.errors], [2, 3])
+
+    def test_command_writes_error_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'stock.csv')
+        with open(path, 'w') as f:
+            f.write(self.header)
+            f.write('Toyota,Corolla,2020,used,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n')
+            f.write('Toyota,Corolla,old,used,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n')
+        out = StringIO()
+        call_command('import_cars', path, seller='seller', stdout=out)
+        self.assertIn('Imported 1 cars', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        with open(f'{path}.errors.csv') as f:
+            self.assertEqual(f.readline().strip(), 'line,error')
+            self.assertTrue(f.readline().startswith('3,'))
+
+    def test_admin_import(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile(
+            'stock.csv',
+            (self.header + 'Toyota,Corolla,2020,used,15000,30000,1.8,automatic,petrol,White,Bluetooth,Clean\n').encode(),
+        )
+        response = self.client.post(reverse('admin:cars_car_import'), {
+            'file': upload, 'seller': self.seller.pk, 'create_missing': 'on',
+        })
+        self.assertRedirects(response, reverse('admin:cars_car_changelist'))
+        self.assertEqual(Car.objects.get().seller, self.seller)
+
+
+class DetailPageTests(CarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.car = self.create_cars(1)[0]
+        self.create_cars(3)
+        recommendations.rebuild()
+
+    def test_query_count_is_bounded(self):
+        url = self.car.get_absolute_url()
+        # car + make/model/seller, gallery, features, similar cars, their
+        # primary images
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        for _ in range(5):
+            CarImage.objects.create(car=self.car, image='cars/more.jpg')
+        self.create_cars(2)
+        recommendations.rebuild()
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+    def test_logged_in_buyer(self):
+        buyer = User.objects.create_user('buyer')
+        self.client.force_login(buyer)
+        # user, plus the session unless it lives in the cache, on top of the
+        # anonymous page
+        session_queries = 1 if settings.SESSION_ENGINE == 'django.contrib.sessions.backends.db' else 0
+        with self.assertNumQueries(6 + session_queries):
+            response = self.client.get(self.car.get_absolute_url())
+        self.assertContains(response, 'Send Inquiry')
+
+    def test_fragments_are_cached(self):
+        url = self.car.get_absolute_url()
+        first = self.client.get(url)
+        with self.assertNumQueries(3):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        # Primary image first
+        self.assertLess(first.content.index(b'front.jpg'), first.content.index(b'side.jpg'))
+
+    def test_fragments_follow_edits(self):
+        url = self.car.get_absolute_url()
+        self.client.get(url)
+
+        self.car.color = 'Midnight Purple'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.car.save()
+        self.assertContains(self.client.get(url), 'Midnight Purple')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarImage.objects.create(car=self.car, image='cars/interior.jpg')
+        self.assertContains(self.client.get(url), 'interior.jpg')
+
+
+class RecommendationTests(CarTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.camry = CarModel.objects.create(make=cls.make, name='Camry')
+        cls.honda = CarMake.objects.create(name='Honda')
+        cls.civic = CarModel.objects.create(make=cls.honda, name='Civic')
+
+    def setUp(self):
+        super().setUp()
+        self.car = create_car(self.seller, self.make, self.model)
+        self.twin = create_car(self.seller, self.make, self.model, year=2019, price=Decimal('14500'))
+        self.sibling = create_car(self.seller, self.make, self.camry)
+        self.rival = create_car(self.seller, self.honda, self.civic)
+        self.sold = create_car(self.seller, self.make, self.model, is_sold=True)
+
+    def similar_ids(self, car):
+        return list(SimilarCar.objects.filter(car=car).values_list('similar_id', flat=True))
+
+    def test_ranking(self):
+        recommendations.rebuild()
+        self.assertEqual(self.similar_ids(self.car), [self.twin.pk, self.sibling.pk, self.rival.pk])
+        # Sold cars get recommendations but are never recommended
+        self.assertEqual(len(self.similar_ids(self.sold)), 4)
+        self.assertFalse(SimilarCar.objects.filter(similar=self.sold).exists())
+
+    def test_widening_search_matches_brute_force(self):
+        rng = random.Random(7)
+        rows = [
+            (i, rng.randint(1, 3), rng.randint(1, 4), rng.choice('nru'), rng.choice('pdh'), rng.choice('amc'),
+             rng.randint(2005, 2024), rng.randint(2000, 60000), rng.random() < 0.2)
+            for i in range(1, 400)
+        ]
+        # Model ids must belong to a single make
+        rows = [(i, make, make * 10 + model, *rest) for i, make, model, *rest in rows]
+        matrix = recommendations.FeatureMatrix(rows)
+        everything = np.arange(len(matrix))
+        for car_id, neighbours in matrix.neighbours(everything):
+            row = matrix.positions[car_id]
+            positions, scores = matrix.top(np.array([row]), everything, recommendations.NEIGHBOURS)
+            expected = [int(matrix.ids[p]) for p, score in zip(positions[0], scores[0]) if np.isfinite(score)]
+            self.assertEqual([similar_id for similar_id, _ in neighbours], expected)
+
+    def test_new_listing_joins_neighbour_lists(self):
+        recommendations.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = create_car(self.seller, self.make, self.model, price=Decimal('15000'))
+        self.assertEqual(self.similar_ids(self.car)[0], newcomer.pk)
+        self.assertIn(self.car.pk, self.similar_ids(newcomer))
+
+    def test_sold_and_deleted_cars_are_replaced(self):
+        recommendations.rebuild()
+        self.twin.is_sold = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.twin.save()
+        self.assertEqual(self.similar_ids(self.car), [self.sibling.pk, self.rival.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sibling.delete()
+        self.assertEqual(self.similar_ids(self.car), [self.rival.pk])
+
+    def test_only_scored_edits_queue_a_refresh(self):
+        with mock.patch('cars.signals.refresh_similar_cars') as task:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.car.color = 'Red'
+                self.car.save()
+                self.car.price = Decimal('16000')
+                self.car.save(update_fields=['color'])
+                Car.objects.get(pk=self.car.pk).save()
+            task.delay.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.car.save(update_fields=['price'])
+            task.delay.assert_called_once_with([self.car.pk])
+
+    def test_detail_page_uses_stored_neighbours(self):
+        recommendations.rebuild()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.car.get_absolute_url())
+        self.assertEqual(
+            [car.pk for car in response.context['similar_cars']],
+            [self.twin.pk, self.sibling.pk, self.rival.pk],
+        )
+        self.assertEqual(sum('cars_similarcar' in query['sql'] for query in ctx.captured_queries), 1)
+
+    def test_imported_cars_are_recommended(self):
+        recommendations.rebuild()
+        rows = ImportTests.header + 'Toyota,Corolla,2020,used,15000,30000,1.8,automatic,petrol,White,ABS,Clean\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_file(StringIO(rows), self.seller, 'csv')
+        self.assertEqual(result.created, 1)
+        imported = Car.objects.latest('id')
+        self.assertEqual(self.similar_ids(self.car)[0], imported.pk)
+
+
+class InboxTests(CarTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_seller = User.objects.create_user('other-seller')
+
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.create_cars(2, with_images=False)
+        self.other_car = create_car(self.other_seller, self.make, self.model)
+        self.client.force_login(self.seller)
+
+    def inquire(self, car, count=1, **kwargs):
+        return [
+            CarInquiry.objects.create(
+                car=car, name='Buyer', email='buyer@example.com', phone='555', message='Is it available?', **kwargs
+            )
+            for _ in range(count)
+        ]
+
+    def test_keyset_pages_through_the_inbox(self):
+        inquiries = self.inquire(self.first, INBOX_PAGE_SIZE + 5)
+        response = self.client.get(reverse('my-inquiries'))
+        page = response.context['inquiries']
+        self.assertEqual(len(page.object_list), INBOX_PAGE_SIZE)
+        self.assertEqual(page.object_list[0], inquiries[-1])
+
+        response = self.client.get(reverse('my-inquiries'), {'cursor': page.next_cursor})
+        rest = response.context['inquiries']
+        self.assertEqual(list(rest.object_list), inquiries[4::-1])
+        self.assertFalse(rest.has_next())
+
+        response = self.client.get(reverse('my-inquiries'), {'cursor': 'garbage'})
+        self.assertRedirects(response, reverse('my-inquiries'))
+
+    def test_query_count_is_bounded(self):
+        self.inquire(self.first, 3)
+        self.inquire(self.second, 2, responded=True)
+        # session, user, the page of inquiries, the per-car counts
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('my-inquiries'))
+        self.inquire(self.second, 10)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('my-inquiries'))
+
+        cars = {car.pk: (car.inquiry_count, car.open_count) for car in response.context['cars']}
+        self.assertEqual(cars, {self.first.pk: (3, 3), self.second.pk: (2, 0)})
+        self.assertEqual((response.context['open_total'], response.context['inquiry_total']), (3, 5))
+
+    def test_filters(self):
+        open_first = self.inquire(self.first)
+        answered_first = self.inquire(self.first, responded=True)
+        self.inquire(self.second)
+        self.inquire(self.other_car)
+
+        def listed(**params):
+            return list(self.client.get(reverse('my-inquiries'), params).context['inquiries'].object_list)
+
+        self.assertEqual(len(listed()), 3)
+        self.assertEqual(listed(car=self.first.pk, status='open'), open_first)
+        self.assertEqual(listed(car=self.first.pk, status='responded'), answered_first)
+        self.assertEqual(listed(car=self.other_car.pk), [])
+
+    def test_bulk_mark_is_one_update(self):
+        mine = self.inquire(self.first, 3) + self.inquire(self.second, 2)
+        theirs = self.inquire(self.other_car)[0]
+        ids = [inquiry.pk for inquiry in mine] + [theirs.pk]
+        with self.assertNumQueries(1):
+            self.assertEqual(mark_responded(self.seller, ids), 5)
+        self.assertEqual(CarInquiry.objects.filter(responded=True).count(), 5)
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.responded)
+
+        response = self.client.post(reverse('mark-inquiries-responded'), {
+            'inquiry': ids, 'responded': '0', 'next': f"{reverse('my-inquiries')}?status=open",
+        })
+        self.assertRedirects(response, f"{reverse('my-inquiries')}?status=open")
+        self.assertFalse(CarInquiry.objects.filter(responded=True).exists())
+
+    def test_mark_single_inquiry(self):
+        inquiry = self.inquire(self.first)[0]
+        url = reverse('mark-inquiry-responded', args=[inquiry.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        response = self.client.post(url, {'next': 'https://evil.example.com/'})
+        self.assertRedirects(response, reverse('my-inquiries'))
+        inquiry.refresh_from_db()
+        self.assertTrue(inquiry.responded)
+
+        self.client.post(url, {'responded': '0'})
+        inquiry.refresh_from_db()
+        self.assertFalse(inquiry.responded)
+
+    def test_cannot_mark_other_sellers_inquiries(self):
+        theirs = self.inquire(self.other_car)[0]
+        response = self.client.post(reverse('mark-inquiry-responded', args=[theirs.pk]), follow=True)
+        self.assertContains(response, "You don&#x27;t have permission")
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.responded)
+
+        response = self.client.post(reverse('mark-inquiry-responded', args=[theirs.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+
+class DashboardTests(CarTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_seller = User.objects.create_user('other-seller')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.seller)
+
+    def inquire(self, car, count=1, **kwargs):
+        return [
+            CarInquiry.objects.create(
+                car=car, name='Buyer', email='buyer@example.com', phone='555', message='Still for sale?', **kwargs
+            )
+            for _ in range(count)
+        ]
+
+    def test_stats_in_one_query(self):
+        quiet, busy = self.create_cars(2)
+        self.inquire(busy, 2)
+        latest = self.inquire(busy, responded=True)[0]
+        # session, user, the page with its stats, primary images, tab counts
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('my-listings'))
+        cars = {car.pk: car for car in response.context['cars']}
+        self.assertEqual((cars[busy.pk].inquiry_count, cars[busy.pk].open_inquiry_count), (3, 2))
+        self.assertEqual(cars[busy.pk].latest_inquiry_at, latest.created_at)
+        self.assertEqual((cars[quiet.pk].inquiry_count, cars[quiet.pk].latest_inquiry_at), (0, None))
+        self.assertContains(response, '3 inquiries')
+
+        for car in self.create_cars(10):
+            self.inquire(car, 2)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('my-listings'))
+
+    def test_status_filter_and_pages(self):
+        cars = self.create_cars(DASHBOARD_PAGE_SIZE + 2, with_images=False)
+        sold = self.create_cars(3, with_images=False, is_sold=True)
+        create_car(self.other_seller, self.make, self.model)
+
+        response = self.client.get(reverse('my-listings'))
+        self.assertEqual(
+            response.context['counts'], {'total': DASHBOARD_PAGE_SIZE + 5, 'active': DASHBOARD_PAGE_SIZE + 2, 'sold': 3}
+        )
+        page = response.context['cars']
+        self.assertEqual(len(page), DASHBOARD_PAGE_SIZE)
+        response = self.client.get(reverse('my-listings'), {'cursor': page.next_cursor})
+        self.assertEqual(len(response.context['cars']), 5)
+
+        response = self.client.get(reverse('my-listings'), {'status': 'sold'})
+        self.assertEqual(list(response.context['cars']), sold[::-1])
+        response = self.client.get(reverse('my-listings'), {'status': 'active'})
+        self.assertEqual(list(response.context['cars'])[0], cars[-1])
+
+    def test_bulk_mark_sold(self):
+        mine = self.create_cars(3, with_images=False)
+        theirs = create_car(self.other_seller, self.make, self.model)
+        ids = [car.pk for car in mine] + [theirs.pk]
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(2):
+            self.assertEqual(mark_sold(self.seller, ids), 3)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Car.objects.filter(is_sold=True).count(), 3)
+        self.assertFalse(Car.objects.get(pk=theirs.pk).is_sold)
+
+        response = self.client.post(reverse('my-listings-bulk'), {'car': ids, 'action': 'mark_sold'}, follow=True)
+        self.assertContains(response, '0 listings marked as sold.')
+
+    def test_bulk_mark_sold_drops_cached_listings(self):
+        car = self.create_cars(1)[0]
+        self.assertContains(self.client.get(reverse('car-list')), car.get_absolute_url())
+        self.client.post(reverse('my-listings-bulk'), {'car': [car.pk], 'action': 'mark_sold'})
+        self.assertNotContains(self.client.get(reverse('car-list')), car.get_absolute_url())
+
+    def test_bulk_delete(self):
+        mine = self.create_cars(2)
+        self.inquire(mine[0])
+        theirs = create_car(self.other_seller, self.make, self.model)
+        response = self.client.post(reverse('my-listings-bulk'), {
+            'car': [mine[0].pk, mine[1].pk, theirs.pk], 'action': 'delete', 'next': '//evil.example.com/',
+        })
+        self.assertRedirects(response, reverse('my-listings'))
+        self.assertEqual(list(Car.objects.all()), [theirs])
+        self.assertFalse(CarInquiry.objects.exists())
+        self.assertEqual(self.client.get(reverse('my-listings-bulk')).status_code, 405)
+
+
+class ViewTrackingTests(CarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.car, self.other = self.create_cars(2)
+        recommendations.rebuild()
+
+    def visit(self, car, ip='10.0.0.1'):
+        # A new visitor each time, told apart only by address
+        self.client.cookies.pop(tracking.VISITOR_COOKIE, None)
+        return self.client.get(car.get_absolute_url(), REMOTE_ADDR=ip)
+
+    def test_views_are_buffered_not_written(self):
+        self.visit(self.car)
+        # Same queries as a page without tracking
+        with self.assertNumQueries(3):
+            self.visit(self.car, ip='10.0.0.2')
+        self.assertFalse(CarStats.objects.exists())
+        self.assertEqual(tracking.get_buffer().drain(), {self.car.pk: 2})
+
+    def test_visitors_are_counted_once_per_window(self):
+        self.visit(self.car)
+        self.visit(self.car)
+        self.visit(self.car, ip='10.0.0.2')
+        self.visit(self.other)
+        buyer = User.objects.create_user('buyer')
+        self.client.force_login(buyer)
+        self.visit(self.car, ip='10.0.0.3')
+        self.visit(self.car, ip='10.0.0.4')
+        # Sellers looking at their own listings don't count
+        self.client.force_login(self.seller)
+        self.visit(self.car, ip='10.0.0.5')
+        self.assertEqual(tracking.flush(), 4)
+        views = dict(CarStats.objects.values_list('car_id', 'views'))
+        self.assertEqual(views, {self.car.pk: 3, self.other.pk: 1})
+
+    def test_flush_batches_updates_by_delta(self):
+        cars = self.create_cars(4, with_images=False)
+        CarStats.objects.create(car=cars[0], views=10)
+        buffer = tracking.get_buffer()
+        for car, count in zip(cars, (2, 2, 2, 5)):
+            for _ in range(count):
+                buffer.add(car.pk)
+        gone = self.create_cars(1, with_images=False)[0]
+        buffer.add(gone.pk)
+        gone.delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(tracking.flush(), 11)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        views = dict(CarStats.objects.values_list('car_id', 'views'))
+        self.assertEqual(views, {cars[0].pk: 12, cars[1].pk: 2, cars[2].pk: 2, cars[3].pk: 5})
+        self.assertEqual(tracking.flush(), 0)
+
+    def test_failed_flush_keeps_the_counts(self):
+        tracking.get_buffer().add(self.car.pk)
+        with mock.patch.object(CarStats.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                tracking.flush()
+        self.assertEqual(tracking.flush(), 1)
+        self.assertEqual(CarStats.objects.get(car=self.car).views, 1)
+
+    @override_settings(TRUSTED_PROXY_HOPS=1)
+    def test_visitors_behind_the_proxy_are_told_apart(self):
+        first, second = Client(), Client()
+        # Both reach Django from the proxy's address
+        for client, address in ((first, '203.0.113.7'), (second, '198.51.100.4')):
+            response = client.get(self.car.get_absolute_url(), REMOTE_ADDR='10.0.0.1',
+                                  HTTP_X_FORWARDED_FOR=f'1.2.3.4, {address}')
+            self.assertIn(tracking.VISITOR_COOKIE, response.cookies)
+        # Back with the cookie, from another address
+        first.get(self.car.get_absolute_url(), REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.0.2.1')
+        self.assertEqual(tracking.get_buffer().drain(), {self.car.pk: 2})
+
+    def test_visitor_cookie_tells_apart_visitors_sharing_an_address(self):
+        first, second = Client(), Client()
+        for client in (first, second):
+            client.cookies[tracking.VISITOR_COOKIE] = f'token-{id(client)}'
+            client.get(self.car.get_absolute_url(), REMOTE_ADDR='10.0.0.1')
+        # The forwarded address isn't trusted without TRUSTED_PROXY_HOPS
+        Client().get(self.car.get_absolute_url(), REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.7')
+        Client().get(self.car.get_absolute_url(), REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.4')
+        self.assertEqual(tracking.get_buffer().drain(), {self.car.pk: 3})
+
+    @override_settings(VIEW_COUNT_FLUSH_INTERVAL=0, QUERY_BUDGET_STRICT=True)
+    def test_memory_buffer_flushes_itself(self):
+        # After the response: the writes don't count against the page's
+        # query budget
+        with mock.patch.object(CarDetailView, 'query_budget', 5):
+            self.visit(self.car)
+        self.assertEqual(CarStats.objects.get(car=self.car).views, 1)
+
+    def test_worker_exit_flushes(self):
+        self.visit(self.car)
+        gunicorn_config.worker_exit(mock.Mock(), mock.Mock())
+        self.assertEqual(CarStats.objects.get(car=self.car).views, 1)
+
+    def test_dashboard_shows_view_counts(self):
+        CarStats.objects.create(car=self.car, views=42)
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('my-listings'))
+        self.assertContains(response, 'Views: 42')
+        self.assertContains(response, 'Views: 0')
+
+    @override_settings(
+        REDIS_URL='redis://redis:6379/1',
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/1',
+        }},
+    )
+    def test_redis_buffer(self):
+        tracking.reset_buffer()
+        self.addCleanup(tracking.reset_buffer)
+        with mock.patch('redis.Redis.from_url') as from_url:
+            buffer = tracking.get_buffer()
+        from_url.assert_called_once_with('redis://redis:6379/1')
+        self.assertTrue(buffer.shared)
+        buffer.add(self.car.pk)
+        buffer.client.hincrby.assert_called_once_with(buffer.key, self.car.pk, 1)
+
+        buffer.client.pipeline.return_value.execute.return_value = [{str(self.car.pk).encode(): b'3'}, 1]
+        self.assertEqual(buffer.drain(), {self.car.pk: 3})
+
+    def test_flush_command(self):
+        out = StringIO()
+        call_command('flush_view_counts', stdout=out)
+        self.assertIn("no shared buffer", out.getvalue())
+
+
+class AdminTests(CarTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def populate(self, count):
+        for car in self.create_cars(count, with_images=False):
+            CarInquiry.objects.create(car=car, name='Buyer', email=f'buyer{car.pk}@example.com', phone='555',
+                                      message='Is it still available?')
+
+    def count_queries(self, url, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = [reverse('admin:cars_car_changelist'), reverse('admin:cars_carinquiry_changelist'),
+                reverse('admin:cars_carmodel_changelist')]
+        self.populate(2)
+        small = [self.count_queries(url) for url in urls]
+        self.populate(30)
+        for model in ('Civic', 'Accord', 'Jazz'):
+            CarModel.objects.create(make=self.make, name=model)
+        self.assertEqual([self.count_queries(url) for url in urls], small)
+        # session, user, count, page
+        self.assertEqual(small[0], 4)
+
+    def test_result_counts_are_cached(self):
+        self.populate(3)
+        url = reverse('admin:cars_car_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertFalse([query for query in ctx.captured_queries if 'COUNT(' in query['sql']])
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_make_filter_uses_autocomplete(self):
+        self.populate(2)
+        honda = CarMake.objects.create(name='Honda')
+        civic = create_car(self.seller, honda, CarModel.objects.create(make=honda, name='Civic'))
+        CarMake.objects.create(name='Mazda')
+        url = reverse('admin:cars_car_changelist')
+        response = self.client.get(url, {'is_sold__exact': '0'})
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, '<input type="hidden" name="is_sold__exact" value="0">', html=True)
+        self.assertNotContains(response, 'Mazda')
+
+        response = self.client.get(url, {'make__id__exact': honda.pk})
+        self.assertEqual(list(response.context['cl'].result_list), [civic])
+        self.assertContains(response, f'<option value="{honda.pk}" selected>Honda</option>', html=True)
+        # Clearing the widget submits an empty value
+        response = self.client.get(url, {'make__id__exact': ''})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertEqual(self.client.get(url, {'_facets': 'True'}).status_code, 200)
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'cars', 'model_name': 'car', 'field_name': 'make', 'term': 'hon',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Honda'])
+
+    def test_result_counts_are_kept_through_edits(self):
+        self.populate(3)
+        car_url = reverse('admin:cars_car_changelist')
+        inquiry_url = reverse('admin:cars_carinquiry_changelist')
+        self.client.get(car_url)
+        self.client.get(inquiry_url)
+        car = Car.objects.first()
+        car.price += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(car_url)
+        self.assertFalse([query for query in ctx.captured_queries if 'COUNT(' in query['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarInquiry.objects.create(car=car, name='Ann', email='ann@example.com', phone='1', message='Hi')
+        self.assertEqual(self.client.get(inquiry_url).context['cl'].result_count, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            CarInquiry.objects.filter(email='ann@example.com').delete()
+        self.assertEqual(self.client.get(inquiry_url).context['cl'].result_count, 3)
+        mark_responded(self.seller, CarInquiry.objects.values_list('pk', flat=True))
+        self.assertEqual(self.client.get(inquiry_url, {'responded__exact': '1'}).context['cl'].result_count, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            car.delete()
+        self.assertEqual(self.client.get(car_url).context['cl'].result_count, 2)
+
+    def test_car_search_uses_the_full_text_index(self):
+        self.populate(2)
+        special = create_car(self.seller, self.make, self.model, description='Rare Nardo grey paint')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:cars_car_changelist'), {'q': 'nardo'})
+        self.assertEqual(list(response.context['cl'].result_list), [special])
+        self.assertFalse([query for query in ctx.captured_queries if 'LIKE' in query['sql']])
+
+    def test_inquiry_search_by_email_or_car(self):
+        self.populate(2)
+        special = create_car(self.seller, self.make, self.model, description='Rare Nardo grey paint')
+        inquiry = CarInquiry.objects.create(car=special, name='Ann', email='ann@example.com', phone='1', message='Hi')
+        url = reverse('admin:cars_carinquiry_changelist')
+        for term in ('ann@example.com', 'nardo'):
+            with self.subTest(term):
+                response = self.client.get(url, {'q': term})
+                self.assertEqual(list(response.context['cl'].result_list), [inquiry])
+
+    def test_change_form_uses_autocomplete(self):
+        car = self.create_cars(1, with_images=False)[0]
+        for index in range(5):
+            User.objects.create_user(f'user-{index}')
+        response = self.client.get(reverse('admin:cars_car_change', args=[car.pk]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'user-4')
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'cars', 'model_name': 'carinquiry', 'field_name': 'car', 'term': 'toyota',
+        })
+        self.assertEqual([result['id'] for result in response.json()['results']], [str(car.pk)])
+
+
+class CatalogueTests(CarTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.honda = CarMake.objects.create(name='Honda')
+        cls.civic = CarModel.objects.create(make=cls.honda, name='Civic')
+        cls.cr_v = CarModel.objects.create(make=cls.honda, name='CR-V')
+        cls.hyundai = CarMake.objects.create(name='Hyundai')
+
+    def test_prefix_search_ignores_case(self):
+        catalogue = Catalogue(
+            [(1, 'Honda'), (2, 'Hyundai'), (3, 'hummer'), (4, 'Toyota')],
+            [(10, 1, 'Civic'), (11, 1, 'CR-V'), (12, 2, 'Creta'), (13, 1, 'City')],
+        )
+        self.assertEqual(catalogue.search_makes('h'), [(1, 'Honda'), (3, 'hummer'), (2, 'Hyundai')])
+        self.assertEqual(catalogue.search_makes('HU', limit=1), [(3, 'hummer')])
+        self.assertEqual(catalogue.search_makes('x'), [])
+        self.assertEqual(catalogue.search_models('c', make_id=1), [(13, 'City'), (10, 'Civic'), (11, 'CR-V')])
+        self.assertEqual(catalogue.search_models('cr'), [(11, 'CR-V'), (12, 'Creta')])
+        self.assertEqual(catalogue.resolve_make('honda'), 1)
+        self.assertEqual(catalogue.resolve_model('creta', make_id=1), None)
+        self.assertEqual(catalogue.resolve_model('12', make_id=2), 12)
+
+    def test_rebuilt_when_makes_or_models_change(self):
+        catalogue = get_catalogue()
+        with self.assertNumQueries(0):
+            self.assertIs(get_catalogue(), catalogue)
+
+        self.civic.name = 'Civic Type R'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.civic.save()
+        self.assertEqual(get_catalogue().model_choices(self.honda.pk), [(self.civic.pk, 'Civic Type R'), (self.cr_v.pk, 'CR-V')])
+        with self.captureOnCommitCallbacks(execute=True):
+            CarMake.objects.create(name='Hino')
+        self.assertEqual([name for _, name in get_catalogue().search_makes('h')], ['Hino', 'Honda', 'Hyundai'])
+
+    def test_reloaded_when_too_old(self):
+        catalogue = get_catalogue()
+        # Added by another process, whose generation bump this one's cache
+        # never saw
+        hino = CarMake.objects.bulk_create([CarMake(name='Hino')])[0]
+        self.assertIs(get_catalogue(), catalogue)
+        with mock.patch('time.monotonic', return_value=catalogue.loaded_at + settings.CATALOGUE_MAX_AGE):
+            fresh = get_catalogue()
+        self.assertEqual(fresh.resolve_make('hino'), hino.pk)
+        self.assertNotEqual(fresh.version, catalogue.version)
+
+    def test_json_endpoint(self):
+        url = reverse('catalogue-json')
+        response = self.client.get(url, {'q': 'h'})
+        self.assertEqual(response.json()['results'], [
+            {'id': self.honda.pk, 'name': 'Honda'}, {'id': self.hyundai.pk, 'name': 'Hyundai'},
+        ])
+        self.assertIn('max-age=300', response['Cache-Control'])
+
+        response = self.client.get(url, {'make': self.honda.pk})
+        self.assertEqual([result['name'] for result in response.json()['results']], ['Civic', 'CR-V'])
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, {'make': self.honda.pk}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarModel.objects.create(make=self.honda, name='Accord')
+        self.assertEqual(self.client.get(url, {'make': self.honda.pk}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_car_form_lists_only_the_chosen_makes_models(self):
+        self.client.force_login(self.seller)
+        car = create_car(self.seller, self.honda, self.civic)
+        get_catalogue()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('car-update', args=[car.slug]))
+        # The heading still fetches the car's own make and model, by id
+        listings = [
+            query['sql'] for query in ctx.captured_queries
+            if re.search(r'FROM "cars_car(make|model)"', query['sql']) and '"id" = ' not in query['sql']
+        ]
+        self.assertEqual(listings, [])
+        model_field = response.context['form']['model']
+        self.assertEqual([choice[1] for choice in model_field.field.choices], ['---------', 'Civic', 'CR-V'])
+        self.assertContains(response, 'data-models-url="%s"' % reverse('catalogue-json'))
+
+    def test_car_form_rejects_a_model_of_another_make(self):
+        form = CarForm(data={'make': self.honda.pk, 'model': self.model.pk})
+        self.assertFalse(form.is_valid())
+        self.assertIn('model', form.errors)
+
+    def test_filter_by_name_resolves_to_ids(self):
+        corolla = self.create_cars(1, with_images=False)[0]
+        form = CarFilterForm({'make': 'toyota', 'model': 'COROLLA'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual((form.cleaned_data['make'], form.cleaned_data['model']), (self.make.pk, self.model.pk))
+        self.assertEqual(list(filter_cars(Car.objects.all(), form.cleaned_data)), [corolla])
+
+        form = CarFilterForm({'make': 'Honda', 'model': 'Corolla'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(list(form.errors), ['model'])
+        self.assertFalse(CarFilterForm({'make': 'Lada'}).is_valid())
+
+    def test_unknown_make_leaves_the_other_filters(self):
+        used = self.create_cars(1, with_images=False, car_type=Car.USED)[0]
+        self.create_cars(1, with_images=False, car_type=Car.RECONDITIONED)
+        for params in ({'make': 'Toyot', 'car_type': Car.USED}, {'model': 'Corola', 'car_type': Car.USED}):
+            with self.subTest(params):
+                response = self.client.get(reverse('car-list'), params)
+                self.assertEqual(list(response.context['cars']), [used])
+
+
+@override_settings(QUERY_BUDGET_STRICT=False, REQUEST_METRICS_SAMPLE_RATE=1)
+class RequestMetricsTests(CarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.car = self.create_cars(1)[0]
+
+    def test_server_timing(self):
+        response = self.client.get(self.car.get_absolute_url())
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$',
+        )
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_pass_through(self):
+        with mock.patch('core.instrumentation.RequestMetrics') as metrics:
+            response = self.client.get(reverse('home'))
+        metrics.assert_not_called()
+        self.assertNotIn('Server-Timing', response)
+
+    def test_slow_request_log(self):
+        url = self.car.get_absolute_url()
+        with override_settings(SLOW_REQUEST_MS=0), self.assertLogs('core.instrumentation', 'WARNING') as logs:
+            self.client.get(url)
+        record = logs.records[0]
+        metrics = record.request_metrics
+        self.assertEqual((metrics['view'], metrics['status'], metrics['query_budget']), ('car-detail', 200, 14))
+        self.assertGreater(metrics['queries'], 0)
+        self.assertGreater(metrics['template_ms'], 0)
+        self.assertEqual(json.loads(record.args[0]), metrics)
+
+        with self.assertNoLogs('core.instrumentation'):
+            self.client.get(url)
+
+    def test_repeated_queries(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x' LIMIT 21"),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)  AND name = %s LIMIT 1'),
+        )
+        self.create_cars(3, with_images=False)
+
+        def view(request):
+            # A make query per car
+            return HttpResponse(', '.join(car.make.name for car in Car.objects.all()))
+
+        with override_settings(SLOW_REQUEST_REPEATED_QUERIES=4), self.assertLogs('core.instrumentation') as logs:
+            RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        repeated = logs.records[0].request_metrics['repeated_queries']
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['count'], 4)
+        self.assertIn('FROM "cars_carmake"', repeated[0]['sql'])
+
+    def test_query_budget(self):
+        self.assertEqual(view_budget(my_inquiries), 6)
+        self.assertEqual(view_budget(CarListView.as_view()), 14)
+
+        url = self.car.get_absolute_url()
+        with mock.patch.object(CarDetailView, 'query_budget', 2):
+            with self.assertLogs('core.instrumentation', 'WARNING') as logs:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertIn('car-detail took 5 queries, over its budget of 2', logs.output[0])
+
+            with override_settings(QUERY_BUDGET_STRICT=True), self.assertLogs('django.request', 'ERROR'):
+                with self.assertRaises(QueryBudgetExceeded):
+                    self.client.get(url)
+
+
+class StaticBundleTests(CarTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            STATIC_ROOT=cls.static_root,
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.static_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_pages_link_hashed_bundles(self):
+        car = self.create_cars(1)[0]
+        for url in (reverse('home'), reverse('car-list'), car.get_absolute_url()):
+            content = self.client.get(url).content.decode()
+            self.assertNotIn('<style>', content)
+            self.assertIn(static('css/base.css'), content)
+            self.assertRegex(static('css/base.css'), r'^/static/css/base\.[0-9a-f]{12}\.css$')
+
+    def test_bundles_have_compressed_siblings(self):
+        name = staticfiles_storage.stored_name('js/car_form.js')
+        with staticfiles_storage.open(name) as original:
+            data = original.read()
+        with staticfiles_storage.open(f'{name}.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), data)
+        self.assertEqual(staticfiles_storage.exists(f'{name}.br'), brotli is not None)
+
+    def test_serves_precompressed_bundle_with_immutable_caching(self):
+        url = static('css/car_detail.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response.headers['Content-Encoding'], 'br' if brotli else 'gzip')
+        self.assertEqual(response.headers['Content-Type'], 'text/css')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+
+        response = self.client.get(url)
+        self.assertNotIn('Content-Encoding', response.headers)
+        with staticfiles_storage.open(staticfiles_storage.stored_name('css/car_detail.css')) as original:
+            self.assertEqual(b''.join(response.streaming_content), original.read())
+
+    def test_unhashed_names_get_a_short_lifetime(self):
+        response = self.client.get('/static/css/car_detail.css')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
+        with self.assertRaises(Http404):
+            serve_static(RequestFactory().get('/'), '../core/settings.py')
+
+    def test_pages_are_compressed_and_files_are_not(self):
+        response = self.client.get(reverse('home'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'<!DOCTYPE html>', gzip.decompress(response.content))
+
+        response = self.client.get(static('car.webp'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response.headers)
+
+
+class FileServingTests(CarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.data = bytes(range(256)) * 40
+        default_storage.save('cars/photo.jpg', ContentFile(self.data))
+        self.url = '/media/cars/photo.jpg'
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_full_response(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response.headers['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.headers['Content-Length'], str(len(self.data)))
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=3600')
+        self.assertIn('ETag', response.headers)
+        self.assertIn('Last-Modified', response.headers)
+
+    def test_conditional_requests(self):
+        first = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(response.headers['Cache-Control'], first.headers['Cache-Control'])
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first.headers['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_ranges(self):
+        size = len(self.data)
+        for header, start, end in (
+            ('bytes=10-19', 10, 19),
+            ('bytes=10000-', 10000, size - 1),
+            ('bytes=-5', size - 5, size - 1),
+            ('bytes=100-999999', 100, size - 1),
+        ):
+            with self.subTest(header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), self.data[start:end + 1])
+                self.assertEqual(response.headers['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(response.headers['Content-Length'], str(end - start + 1))
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['Content-Range'], f'bytes */{size}')
+
+        # A stale partial copy gets the whole file back
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_hashed_derivatives_are_immutable(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = CarImage.objects.create(car=self.create_cars(1, with_images=False)[0], image=make_upload())
+        image.refresh_from_db()
+        response = self.client.get(derivative_url(image, 'card'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'image/webp')
+        self.assertEqual(response.headers['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_missing_and_escaping_paths(self):
+        self.assertEqual(self.client.get('/media/cars/missing.jpg').status_code, 404)
+        with self.assertRaises(Http404):
+            serve_media(RequestFactory().get('/'), '../db.sqlite3')
+
+    def test_x_accel_redirect_hands_off_to_proxy(self):
+        with override_settings(X_ACCEL_REDIRECT_PREFIX='/internal/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        media_dir = os.path.basename(self.media_root)
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/internal/{media_dir}/cars/photo.jpg')
+        self.assertEqual(response.headers['Content-Type'], 'image/jpeg')
+        self.assertIn('ETag', response.headers)
+
+
+class ServerProfileTests(TestCase):
+    def load_config(self, **env):
+        with mock.patch.dict(os.environ, env), mock.patch('multiprocessing.cpu_count', return_value=4):
+            return importlib.reload(gunicorn_config)
+
+    def tearDown(self):
+        importlib.reload(gunicorn_config)
+
+    def test_worker_counts_follow_cpu_count(self):
+        config = self.load_config(GUNICORN_PROFILE='sync')
+        self.assertEqual((config.worker_class, config.workers, config.threads), ('sync', 9, 1))
+        config = self.load_config(GUNICORN_PROFILE='gthread', GUNICORN_THREADS='8')
+        self.assertEqual((config.worker_class, config.workers, config.threads), ('gthread', 5, 8))
+        self.assertEqual(config.wsgi_app, 'core.wsgi:application')
+        config = self.load_config(GUNICORN_PROFILE='uvicorn', WEB_CONCURRENCY='3')
+        self.assertEqual((config.worker_class, config.workers), ('uvicorn_worker.UvicornWorker', 3))
+        self.assertEqual(config.wsgi_app, 'core.asgi:application')
+        self.assertTrue(config.preload_app)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(RuntimeError):
+            self.load_config(GUNICORN_PROFILE='eventlet')
+
+
+class SettingsTests(TestCase):
+    def load_settings(self, **env):
+        # Only what's passed: ignore the variables of the shell running the tests
+        with mock.patch.dict(os.environ, env, clear=True), mock.patch('environ.Env.read_env'):
+            return importlib.reload(base_settings)
+
+    def tearDown(self):
+        importlib.reload(base_settings)
+
+    def test_defaults_to_sqlite_and_locmem(self):
+        config = self.load_settings()
+        self.assertEqual(config.DATABASES['default']['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config.DATABASES['default']['CONN_MAX_AGE'], 60)
+        self.assertEqual(config.CACHES['default']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertFalse(hasattr(config, 'SESSION_ENGINE'))
+        self.assertFalse(config.DEBUG)
+        self.assertEqual(config.REQUEST_METRICS_SAMPLE_RATE, 0)
+        self.assertFalse(config.QUERY_BUDGET_STRICT)
+
+    def test_postgres_with_pooled_connections(self):
+        config = self.load_settings(DATABASE_URL='postgres://cars:secret@db:5432/cars', DATABASE_POOL_MAX_SIZE='20')
+        database = config.DATABASES['default']
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((database['HOST'], database['NAME']), ('db', 'cars'))
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool']['max_size'], 20)
+
+    def test_redis_cache_and_sessions(self):
+        config = self.load_settings(REDIS_URL='redis://redis:6379/0')
+        self.assertEqual(config.CACHES['default']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(config.SESSION_ENGINE, 'django.contrib.sessions.backends.cache')
+        self.assertEqual(config.CACHES[config.SESSION_CACHE_ALIAS]['LOCATION'], 'redis://redis:6379/0')
+        self.assertEqual(config.CELERY_BROKER_URL, 'redis://redis:6379/0')
+        self.assertFalse(config.CELERY_TASK_ALWAYS_EAGER)
+
+    PROD_ENV = {'SECRET_KEY': 'prod-secret', 'ALLOWED_HOSTS': 'cars.example.com', 'REDIS_URL': 'redis://redis:6379/0'}
+
+    def load_prod(self, **env):
+        with mock.patch.dict(os.environ, env, clear=True):
+            importlib.reload(base_settings)
+            prod = importlib.import_module('core.settings.prod')
+            return importlib.reload(prod)
+
+    def test_prod_caches_compiled_templates(self):
+        prod = self.load_prod(**self.PROD_ENV)
+        self.assertEqual(prod.ALLOWED_HOSTS, ['cars.example.com'])
+        loaders = prod.TEMPLATES[0]['OPTIONS']['loaders']
+        self.assertEqual(loaders[0][0], 'django.template.loaders.cached.Loader')
+        self.assertFalse(prod.DEBUG)
+        self.assertEqual(prod.STORAGES['staticfiles']['BACKEND'], 'core.storage.CompressedManifestStaticFilesStorage')
+
+    def test_prod_requires_a_real_secret_key_hosts_and_redis(self):
+        for key in ('', 'your-secret-key', 'django-insecure-abc123'):
+            with self.subTest(key=key), self.assertRaises(ImproperlyConfigured):
+                self.load_prod(**{**self.PROD_ENV, 'SECRET_KEY': key})
+        for name in ('ALLOWED_HOSTS', 'REDIS_URL'):
+            env = dict(self.PROD_ENV)
+            del env[name]
+            with self.subTest(missing=name), self.assertRaises(ImproperlyConfigured):
+                self.load_prod(**env)
@@ -0,0 +1,246 @@
+"""
+Listing view counts, written behind.
+
+A view is counted at most once per visitor and car within
+VIEW_COUNT_DEDUPE_WINDOW seconds. Anonymous visitors are told apart by a
+first-party cookie the detail page sets, and before they have one by their
+address (see ``client_ip``). Counted views are added up in a buffer and
+only reach the database when the buffer is flushed: one UPDATE per batch of
+cars that gained the same number of views, instead of a write per request.
+
+With the Redis cache the buffer is a Redis hash shared by every process, and
+it is flushed by the ``flush_view_counts`` Celery beat task (or management
+command). Otherwise each process buffers in its own memory and flushes that
+itself every VIEW_COUNT_FLUSH_INTERVAL seconds, after the response has gone
+out, and once more when a gunicorn worker exits.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+
+import redis
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Car, CarStats
+
+PENDING_KEY = 'cars:views:pending'
+
+VISITOR_COOKIE = 'visitor'
+VISITOR_COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class MemoryBuffer:
+    """
+    View counts of this process only.
+    """
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self.last_flush = time.monotonic()
+
+    def add(self, car_id):
+        with self._lock:
+            self._counts[car_id] += 1
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self.last_flush = time.monotonic()
+        return dict(counts)
+
+    def restore(self, counts):
+        with self._lock:
+            self._counts.update(counts)
+
+    def due(self):
+        interval = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 60)
+        return bool(self._counts) and time.monotonic() - self.last_flush >= interval
+
+
+class RedisBuffer:
+    """
+    View counts of every process, in a hash on the REDIS_URL server.
+    """
+    shared = True
+
+    def __init__(self, url, key):
+        # Connects on first use
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+
+    def add(self, car_id):
+        self.client.hincrby(self.key, car_id, 1)
+
+    def drain(self):
+        # Read and reset in one MULTI, so no increment falls in between
+        pipeline = self.client.pipeline()
+        pipeline.hgetall(self.key)
+        pipeline.delete(self.key)
+        counts, _ = pipeline.execute()
+        return {int(car_id): int(count) for car_id, count in counts.items()}
+
+    def restore(self, counts):
+        pipeline = self.client.pipeline()
+        for car_id, count in counts.items():
+            pipeline.hincrby(self.key, car_id, count)
+        pipeline.execute()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            backend = caches['default']
+            if isinstance(backend, RedisCache) and getattr(settings, 'REDIS_URL', None):
+                _buffer = RedisBuffer(settings.REDIS_URL, backend.make_key(PENDING_KEY))
+            else:
+                _buffer = MemoryBuffer()
+        return _buffer
+
+
+def reset_buffer():
+    """
+    Forget the current buffer, and everything in it if it's in memory.
+    """
+    global _buffer
+    with _buffer_lock:
+        _buffer = None
+
+
+def client_ip(request):
+    """
+    The visitor's address. Behind TRUSTED_PROXY_HOPS proxies that each append
+    the address they got the request from to X-Forwarded-For, that's the
+    entry the outermost proxy added; entries before it are the client's own
+    claims. Otherwise REMOTE_ADDR.
+    """
+    hops = getattr(settings, 'TRUSTED_PROXY_HOPS', 0)
+    if hops:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [address for address in forwarded if address]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _visitor(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key:
+        return f'session:{request.session.session_key}'
+    token = request.COOKIES.get(VISITOR_COOKIE)
+    if token:
+        return f'visitor:{token[:64]}'
+    return f'ip:{client_ip(request)}'
+
+
+def set_visitor_cookie(request, response):
+    """
+    Hand out the visitor cookie ``record_view`` picked for a new anonymous
+    visitor.
+    """
+    token = getattr(request, 'visitor_token', None)
+    if token:
+        response.set_cookie(
+            VISITOR_COOKIE, token, max_age=VISITOR_COOKIE_MAX_AGE,
+            httponly=True, samesite='Lax', secure=request.is_secure(),
+        )
+
+
+def _first_view(car, visitor):
+    """
+    Whether this is ``visitor``'s first view of ``car`` in the dedupe
+    window; it isn't for the rest of the window.
+    """
+    # Hashed so cache keys don't hold IP addresses
+    digest = hashlib.md5(f'{car.pk}:{visitor}'.encode(), usedforsecurity=False).hexdigest()
+    window = getattr(settings, 'VIEW_COUNT_DEDUPE_WINDOW', 30 * 60)
+    return cache.add(f'cars:views:seen:{digest}', 1, window)
+
+
+def record_view(request, car):
+    """
+    Count a view of ``car`` unless this visitor was counted within the
+    dedupe window. Sellers looking at their own cars aren't counted.
+    Returns whether the view was counted.
+    """
+    if request.user.is_authenticated and request.user.pk == car.seller_id:
+        return False
+    visitor = _visitor(request)
+    counted = _first_view(car, visitor)
+    if visitor.startswith('ip:'):
+        # A visitor without a cookie yet gets one (see set_visitor_cookie),
+        # which has seen this car too
+        request.visitor_token = secrets.token_urlsafe(16)
+        _first_view(car, f'visitor:{request.visitor_token}')
+    if not counted:
+        return False
+
+    get_buffer().add(car.pk)
+    return True
+
+
+def flush_local(force=False):
+    """
+    Flush this process's own buffer, when views are buffered in memory and
+    the flush interval has passed (or ``force``). Returns the number of
+    views written.
+    """
+    buffer = get_buffer()
+    if buffer.shared or not (force or buffer.due()):
+        return 0
+    return flush(buffer)
+
+
+def flush(buffer=None, batch_size=500):
+    """
+    Add the buffered view counts to CarStats and empty the buffer. Returns
+    the number of views written.
+    """
+    buffer = buffer or get_buffer()
+    counts = buffer.drain()
+    if not counts:
+        return 0
+    try:
+        return _apply(counts, batch_size)
+    except Exception:
+        # Put them back for the next flush rather than losing them
+        buffer.restore(counts)
+        raise
+
+
+def _apply(counts, batch_size):
+    car_ids = sorted(counts)
+    existing = []
+    # Cars deleted since they were viewed have nothing to count against
+    for start in range(0, len(car_ids), batch_size):
+        existing.extend(Car.objects.filter(pk__in=car_ids[start:start + batch_size]).values_list('pk', flat=True))
+
+    by_delta = defaultdict(list)
+    for car_id in existing:
+        by_delta[counts[car_id]].append(car_id)
+
+    now = timezone.now()
+    with transaction.atomic():
+        CarStats.objects.bulk_create(
+            [CarStats(car_id=car_id) for car_id in existing], batch_size=batch_size, ignore_conflicts=True,
+        )
+        for delta, ids in by_delta.items():
+            for start in range(0, len(ids), batch_size):
+                CarStats.objects.filter(car_id__in=ids[start:start + batch_size]).update(
+                    views=F('views') + delta, updated_on=now,
+                )
+    return sum(counts[car_id] for car_id in existing)
@@ -8,11 +8,16 @@ urlpatterns = [
     path('new/', views.CarListView.as_view(), {'car_type': 'new'}, name='new-cars'),
     path('reconditioned/', views.CarListView.as_view(), {'car_type': 'reconditioned'}, name='reconditioned-cars'),
     path('add/', views.CarCreateView.as_view(), name='car-create'),
+    path('feed/', views.CarListJSONView.as_view(), name='car-list-json'),
+    path('cache-stats/', views.cache_stats_view, name='cache-stats'),
+    path('catalogue/', views.catalogue_json, name='catalogue-json'),
     path('<slug:slug>/', views.CarDetailView.as_view(), name='car-detail'),
     path('<slug:slug>/update/', views.CarUpdateView.as_view(), name='car-update'),
     path('<slug:slug>/delete/', views.CarDeleteView.as_view(), name='car-delete'),
     path('<slug:slug>/mark-sold/', views.mark_as_sold, name='mark-as-sold'),
     path('my/listings/', views.my_listings, name='my-listings'),
+    path('my/listings/bulk/', views.my_listings_bulk, name='my-listings-bulk'),
     path('my/inquiries/', views.my_inquiries, name='my-inquiries'),
+    path('my/inquiries/mark-responded/', views.mark_inquiries_responded, name='mark-inquiries-responded'),
     path('inquiry/<int:pk>/mark-responded/', views.mark_inquiry_responded, name='mark-inquiry-responded'),
 ]
\ No newline at end of file
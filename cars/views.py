@@ -1,15 +1,44 @@
+from urllib.parse import urlencode
+
 from django import template
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db.models import Q
-from django.utils.text import slugify
-
-from .models import Car, CarImage, CarInquiry, CarMake, CarModel
+from django.core.paginator import InvalidPage
+from django.http import Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.safestring import mark_safe
+from django.utils.timesince import timesince
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+
+from core.instrumentation import query_budget
+
+from .models import Car, CarImage, CarInquiry, CarMake, CarModel, Feature
+from . import cache
+from .cache import cache_stats, cached
+from .catalogue import get_catalogue
+from .dashboard import (
+    DASHBOARD_PAGE_SIZE, STATUSES as LISTING_STATUSES, delete_listings, listing_counts, mark_sold,
+    seller_listings,
+)
+from .facets import build_facets, facet_counts
+from .features import popular_features
+from .filters import filter_cars, normalize_query
 from .forms import CarForm, CarImageFormSet, CarInquiryForm, CarFilterForm
+from .images import derivative_url
+from .inbox import INBOX_PAGE_SIZE, STATUSES, inquiry_counts, mark_responded, seller_inquiries
+from .listings import save_listing
+from .pagination import CappedPaginator, KeysetPage, KeysetPaginator
+from .recommendations import similar_cars
+from .search import search_cars
+from .sorting import get_sort_options, resolve_sort, sort_cars
+from .tracking import record_view, set_visitor_cookie
 
 register = template.Library()
 
@@ -20,99 +49,231 @@ class HomeView(ListView):
     context_object_name = 'cars'
 
     def get_queryset(self):
-        return Car.objects.filter(is_featured=True, is_sold=False)[:6]
+        return Car.objects.with_card_data().filter(is_featured=True, is_sold=False)[:6]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['new_cars'] = Car.objects.filter(car_type=Car.NEW, is_sold=False)[:3]
-        context['reconditioned_cars'] = Car.objects.filter(car_type=Car.RECONDITIONED, is_sold=False)[:3]
-        context['makes'] = CarMake.objects.all()
+        cars = Car.objects.with_card_data().filter(is_sold=False)
+        context['new_cars'] = cars.filter(car_type=Car.NEW)[:3]
+        context['reconditioned_cars'] = cars.filter(car_type=Car.RECONDITIONED)[:3]
+        context['makes'] = get_makes()
         return context
 
-def home(request):
-    context = {
-        'makes': CarMake.objects.all(),
-        'featured_cars': Car.objects.filter(is_featured=True, is_sold=False)[:6],
-        'new_cars': Car.objects.filter(car_type='new', is_sold=False)[:6],
-        'reconditioned_cars': Car.objects.filter(car_type='reconditioned', is_sold=False)[:6],
-        'featured_car': Car.objects.filter(is_featured=True, is_sold=False).first(),
+def get_makes():
+    return cached(cache.MAKES, 'all', lambda: list(CarMake.objects.all()))
+
+
+def get_home_sections():
+    cars = Car.objects.with_card_data().filter(is_sold=False)
+    featured_cars = list(cars.filter(is_featured=True)[:6])
+    return {
+        'featured_cars': featured_cars,
+        'new_cars': list(cars.filter(car_type='new')[:6]),
+        'reconditioned_cars': list(cars.filter(car_type='reconditioned')[:6]),
+        # The hero car is the first featured car, so reuse it instead of querying again
+        'featured_car': featured_cars[0] if featured_cars else None,
     }
+
+
+@query_budget(10)
+def home(request):
+    context = dict(cached(cache.HOME, 'sections', get_home_sections))
+    context['makes'] = get_makes()
     return render(request, 'home.html', context)
 
 
-class CarListView(ListView):
-    model = Car
-    template_name = 'cars/car_list.html'
-    context_object_name = 'cars'
-    paginate_by = 12
+def car_card_data(car):
+    """
+    The fields a listing card shows, for JSON consumers of the car list.
+    """
+    image = car.primary_image
+    return {
+        'id': car.id,
+        'url': car.get_absolute_url(),
+        'title': f"{car.year} {car.make.name} {car.model.name}",
+        'image': derivative_url(image, 'card') if image else None,
+        'car_type': car.car_type,
+        'car_type_display': car.get_car_type_display(),
+        'mileage': car.mileage,
+        'transmission': car.get_transmission_display(),
+        'fuel_type': car.get_fuel_type_display(),
+        'country_of_origin': car.country_of_origin,
+        'description': car.description,
+        'price': str(car.price),
+        'posted_on': car.posted_on.isoformat(),
+        'posted_ago': timesince(car.posted_on),
+    }
 
-    def get_queryset(self):
-        queryset = Car.objects.filter(is_sold=False)
 
-        # Apply filters
-        form = CarFilterForm(self.request.GET)
-        if form.is_valid():
-            data = form.cleaned_data
+def _query_without(params, *names):
+    query = params.copy()
+    for name in names:
+        query.pop(name, None)
+    return query.urlencode()
 
-            if data.get('make'):
-                queryset = queryset.filter(make__name__icontains=data['make'])
 
-            if data.get('model'):
-                queryset = queryset.filter(model__name__icontains=data['model'])
+def feature_options(selected_ids):
+    """
+    The features the sidebar offers: the most common ones, plus any picked
+    that aren't among them. Each is flagged ``selected`` or not.
+    """
+    features = popular_features()
+    missing = set(selected_ids) - {feature.pk for feature in features}
+    if missing:
+        features = features + list(Feature.objects.filter(pk__in=missing))
+    for feature in features:
+        feature.selected = feature.pk in selected_ids
+    return features
 
-            if data.get('car_type'):
-                queryset = queryset.filter(car_type=data['car_type'])
 
-            if data.get('min_price'):
-                queryset = queryset.filter(price__gte=data['min_price'])
+@query_budget(14)
+class CarListView(ListView):
+    model = Car
+    template_name = 'cars/car_list.html'
+    context_object_name = 'cars'
+    paginate_by = 12
+    # Numbered pages stop at CappedPaginator.max_pages; past that the list
+    # goes on by ?cursor=, which costs the same however deep it is
+    paginator_class = CappedPaginator
 
-            if data.get('max_price'):
-                queryset = queryset.filter(price__lte=data['max_price'])
+    def get(self, request, *args, **kwargs):
+        # Anonymous visitors all see the same page for a given query, so serve
+        # it from cache. Pending flash messages are per-visitor; skip those.
+        if request.user.is_authenticated or len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
 
-            if data.get('min_year'):
-                queryset = queryset.filter(year__gte=data['min_year'])
+        def render_page():
+            response = super(CarListView, self).get(request, *args, **kwargs)
+            return response.render().content
 
-            if data.get('max_year'):
-                queryset = queryset.filter(year__lte=data['max_year'])
+        key = f"{request.path}?{normalize_query(request.GET)}"
+        return HttpResponse(cached(cache.LISTINGS, key, render_page))
 
-            if data.get('transmission'):
-                queryset = queryset.filter(transmission=data['transmission'])
+    def get_queryset(self):
+        queryset = Car.objects.with_card_data().filter(is_sold=False)
 
-            if data.get('fuel_type'):
-                queryset = queryset.filter(fuel_type=data['fuel_type'])
+        # Apply filters
+        form = CarFilterForm(self.request.GET)
+        # A field that doesn't validate (an unknown make, say) is left out of
+        # cleaned_data on its own; the other filters still apply
+        form.is_valid()
+        self.filters = form.cleaned_data
+        queryset = filter_cars(queryset, self.filters)
 
         # Search query
         q = self.request.GET.get('q')
         if q:
-            queryset = queryset.filter(
-                Q(make__name__icontains=q) |
-                Q(model__name__icontains=q) |
-                Q(description__icontains=q) |
-                Q(features__icontains=q)
-            )
-
-        return queryset
+            queryset = search_cars(queryset, q)
+
+        self.sort = resolve_sort(self.request.GET.get('sort'), searching=bool(q))
+        return sort_cars(queryset, self.sort, searching=bool(q))
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get('cursor')
+        if not cursor:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            page = paginator.page(cursor)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, False)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['filter_form'] = CarFilterForm(self.request.GET)
-        context['car_types'] = Car.CAR_TYPE_CHOICES
-        context['makes'] = CarMake.objects.all()
+        context['makes'] = get_makes()
+        counts = facet_counts(self.filters, self.request.GET.get('q', ''))
+        context['facets'] = build_facets(counts, self.request.GET, context['makes'])
+        make_id = self.filters.get('make')
+        context['make_models'] = get_catalogue().model_choices(make_id) if make_id else []
+        context['selected_model'] = self.filters.get('model')
+        context['feature_options'] = feature_options(self.filters.get('feature', []))
+        sort_options = get_sort_options(searching=bool(self.request.GET.get('q')))
+        context['sort_options'] = sort_options.items()
+        context['current_sort'] = sort_options[self.sort]
+        # Filters to carry over into the sort and page links; features repeat
+        context['page_query'] = _query_without(self.request.GET, 'page', 'cursor')
+        context['sort_query'] = _query_without(self.request.GET, 'page', 'cursor', 'sort')
+
+        # Let infinite scroll, and the pager past the last numbered page,
+        # continue from the last car on this page by cursor
+        page = context['page_obj']
+        context['cursor_page'] = isinstance(page, KeysetPage)
+        if context['cursor_page']:
+            context['next_cursor'] = page.next_cursor
+        elif page and page.paginator.has_more(page):
+            keyset = KeysetPaginator(self.object_list, self.paginate_by)
+            context['next_cursor'] = keyset.encode_cursor(page[len(page) - 1])
+            context['is_paginated'] = True
         return context
 
 
+class CarListJSONView(CarListView):
+    """
+    Cursor-paginated card data for the list page's infinite scroll. Takes the
+    same filter, search and sort parameters as CarListView.
+    """
+
+    def get(self, request, *args, **kwargs):
+        paginator = KeysetPaginator(self.get_queryset(), self.paginate_by)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidPage as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({
+            'results': [car_card_data(car) for car in page],
+            'next_cursor': page.next_cursor,
+        })
+
+
+def render_detail_fragment(car, name, get_context=None):
+    """
+    Render ``cars/includes/car_<name>.html`` for ``car``, cached until the car
+    is edited (its ``updated_on`` is part of the key) or its images, make or
+    model change. ``get_context`` supplies extra context and is only called
+    on a cache miss.
+    """
+    def render():
+        context = {'car': car, **(get_context() if get_context else {})}
+        return str(render_to_string(f'cars/includes/car_{name}.html', context))
+
+    key = f'{name}:{car.pk}:{car.updated_on.timestamp()}'
+    return mark_safe(cached(cache.DETAIL, key, render))
+
+
+@query_budget(14)
 class CarDetailView(DetailView):
     model = Car
     template_name = 'cars/car_detail.html'
     context_object_name = 'car'
 
+    def get_queryset(self):
+        return Car.objects.with_detail_data()
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        record_view(request, self.object)
+        set_visitor_cookie(request, response)
+        return response
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['gallery_html'] = render_detail_fragment(self.object, 'gallery', lambda: {
+            'gallery': list(self.object.images.order_by('-is_primary', 'id')),
+        })
+        context['features_html'] = render_detail_fragment(self.object, 'features', lambda: {
+            'features': list(self.object.feature_tags.all()),
+        })
+        context['specs_html'] = render_detail_fragment(self.object, 'specs')
         context['inquiry_form'] = CarInquiryForm()
-        context['similar_cars'] = Car.objects.filter(
-            make=self.object.make,
-            is_sold=False
-        ).exclude(id=self.object.id)[:3]
+        context['similar_cars'] = list(similar_cars(self.object))
+        if not context['similar_cars']:
+            # Neighbours not computed yet (a brand new listing)
+            context['similar_cars'] = Car.objects.with_card_data().filter(
+                make=self.object.make,
+                is_sold=False
+            ).exclude(id=self.object.id)[:3]
         return context
 
     def post(self, request, *args, **kwargs):
@@ -130,81 +291,53 @@ class CarDetailView(DetailView):
         return self.render_to_response(context)
 
 
-class CarCreateView(LoginRequiredMixin, CreateView):
-    model = Car
-    form_class = CarForm
-    template_name = 'cars/car_form.html'
-
-    def form_valid(self, form):
-        form.instance.seller = self.request.user
-
-        # Generate slug
-        base_slug = slugify(f"{form.instance.year} {form.instance.make} {form.instance.model}")
-        slug = base_slug
-        counter = 1
-
-        while Car.objects.filter(slug=slug).exists():
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-
-        form.instance.slug = slug
+class CarFormsetMixin:
+    """
+    Validates the car form and its image formset together, and saves them
+    in one transaction only when both are valid (see cars.listings).
+    """
+    formset = None
+    success_message = None
 
-        # Save the car first
-        response = super().form_valid(form)
-
-        # Then handle the images
-        formset = CarImageFormSet(self.request.POST, self.request.FILES, instance=self.object)
-        if formset.is_valid():
-            formset.save()
-
-        messages.success(self.request, "Car listing created successfully!")
-        return response
+    def get_formset(self):
+        # Built once per request and shared by validation and rendering
+        if self.formset is None:
+            if self.request.method == 'POST':
+                self.formset = CarImageFormSet(self.request.POST, self.request.FILES, instance=self.object)
+            else:
+                self.formset = CarImageFormSet(instance=self.object)
+        return self.formset
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        kwargs.setdefault('formset', self.get_formset())
+        return super().get_context_data(**kwargs)
 
-        if self.request.POST:
-            context['formset'] = CarImageFormSet(self.request.POST, self.request.FILES)
-        else:
-            context['formset'] = CarImageFormSet()
+    def form_valid(self, form):
+        formset = self.get_formset()
+        if not formset.is_valid():
+            return self.form_invalid(form)
+        self.object = save_listing(form, formset, seller=self.request.user)
+        messages.success(self.request, self.success_message)
+        return redirect(self.get_success_url())
 
-        return context
 
+class CarCreateView(LoginRequiredMixin, CarFormsetMixin, CreateView):
+    model = Car
+    form_class = CarForm
+    template_name = 'cars/car_form.html'
+    success_message = "Car listing created successfully!"
 
-class CarUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+
+class CarUpdateView(LoginRequiredMixin, UserPassesTestMixin, CarFormsetMixin, UpdateView):
     model = Car
     form_class = CarForm
     template_name = 'cars/car_form.html'
+    success_message = "Car listing updated successfully!"
 
     def test_func(self):
         car = self.get_object()
         return self.request.user == car.seller
 
-    def form_valid(self, form):
-        response = super().form_valid(form)
-
-        # Handle the images
-        formset = CarImageFormSet(self.request.POST, self.request.FILES, instance=self.object)
-        if formset.is_valid():
-            formset.save()
-
-        messages.success(self.request, "Car listing updated successfully!")
-        return response
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-
-        if self.request.POST:
-            context['formset'] = CarImageFormSet(
-                self.request.POST,
-                self.request.FILES,
-                instance=self.object
-            )
-        else:
-            context['formset'] = CarImageFormSet(instance=self.object)
-
-        return context
-
 
 class CarDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Car
@@ -230,30 +363,131 @@ def mark_as_sold(request, slug):
     return redirect('my-listings')
 
 
+@query_budget(8)
 @login_required
 def my_listings(request):
-    cars = Car.objects.filter(seller=request.user)
-    return render(request, 'cars/my_listings.html', {'cars': cars})
+    status = request.GET.get('status')
+    status = status if status in LISTING_STATUSES else ''
+    paginator = KeysetPaginator(seller_listings(request.user, status), DASHBOARD_PAGE_SIZE)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidPage:
+        return redirect('my-listings')
+
+    return render(request, 'cars/my_listings.html', {
+        'cars': page,
+        'counts': listing_counts(request.user),
+        'status': status,
+        'filter_query': urlencode({'status': status} if status else {}),
+    })
+
+
+def _listings_redirect(request):
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+        return redirect(next_url)
+    return redirect('my-listings')
 
 
+@login_required
+@require_POST
+def my_listings_bulk(request):
+    ids = [value for value in request.POST.getlist('car') if value.isdigit()]
+    action = request.POST.get('action')
+    if not ids:
+        messages.error(request, "Select at least one listing first.")
+    elif action == 'mark_sold':
+        updated = mark_sold(request.user, ids)
+        messages.success(request, f"{updated} listing{'' if updated == 1 else 's'} marked as sold.")
+    elif action == 'delete':
+        deleted = delete_listings(request.user, ids)
+        messages.success(request, f"{deleted} listing{'' if deleted == 1 else 's'} deleted.")
+    else:
+        messages.error(request, "Unknown action.")
+    return _listings_redirect(request)
+
+
+@query_budget(6)
 @login_required
 def my_inquiries(request):
-    cars = Car.objects.filter(seller=request.user)
-    inquiries = CarInquiry.objects.filter(car__in=cars).order_by('-created_at')
-    return render(request, 'cars/my_inquiries.html', {'inquiries': inquiries})
+    car_id = request.GET.get('car')
+    car_id = int(car_id) if car_id and car_id.isdigit() else None
+    status = request.GET.get('status')
+    paginator = KeysetPaginator(seller_inquiries(request.user, car_id, status), INBOX_PAGE_SIZE)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidPage:
+        return redirect('my-inquiries')
+
+    cars = list(inquiry_counts(request.user))
+    return render(request, 'cars/my_inquiries.html', {
+        'inquiries': page,
+        'cars': cars,
+        'open_total': sum(car.open_count for car in cars),
+        'inquiry_total': sum(car.inquiry_count for car in cars),
+        'selected_car': car_id,
+        'status': status if status in STATUSES else '',
+        'filter_query': urlencode({key: value for key, value in (('car', car_id), ('status', status)) if value}),
+    })
+
+
+def _inbox_redirect(request):
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+        return redirect(next_url)
+    return redirect('my-inquiries')
 
 
 @login_required
+@require_POST
 def mark_inquiry_responded(request, pk):
-    inquiry = get_object_or_404(CarInquiry, pk=pk)
-
-    if request.user != inquiry.car.seller:
+    responded = request.POST.get('responded', '1') == '1'
+    if not mark_responded(request.user, [pk], responded):
+        # Only the failure path pays for telling the two cases apart
+        get_object_or_404(CarInquiry, pk=pk)
         messages.error(request, "You don't have permission to perform this action.")
-        return redirect('my-inquiries')
+        return _inbox_redirect(request)
 
-    inquiry.responded = not inquiry.responded
-    inquiry.save()
-
-    status = "responded to" if inquiry.responded else "not responded to"
+    status = "responded to" if responded else "not responded to"
     messages.success(request, f"Inquiry marked as {status}.")
-    return redirect('my-inquiries')
\ No newline at end of file
+    return _inbox_redirect(request)
+
+
+@login_required
+@require_POST
+def mark_inquiries_responded(request):
+    ids = [value for value in request.POST.getlist('inquiry') if value.isdigit()]
+    responded = request.POST.get('responded', '1') == '1'
+    updated = mark_responded(request.user, ids, responded) if ids else 0
+    status = "responded to" if responded else "not responded to"
+    messages.success(request, f"{updated} inquir{'y' if updated == 1 else 'ies'} marked as {status}.")
+    return _inbox_redirect(request)
+
+
+CATALOGUE_LIMIT = 20
+
+
+def catalogue_etag(request):
+    return f"catalogue-{get_catalogue().version}"
+
+
+@cache_control(public=True, max_age=300)
+@condition(etag_func=catalogue_etag)
+def catalogue_json(request):
+    """
+    Typeahead over makes, or with ``make`` over that make's models. ``q`` is
+    a name prefix; without one, a make's models are all returned.
+    """
+    catalogue = get_catalogue()
+    prefix = request.GET.get('q', '').strip()
+    make = request.GET.get('make', '')
+    if make.isdigit():
+        results = catalogue.search_models(prefix, int(make), limit=CATALOGUE_LIMIT if prefix else None)
+    else:
+        results = catalogue.search_makes(prefix, limit=CATALOGUE_LIMIT)
+    return JsonResponse({'results': [{'id': pk, 'name': name} for pk, name in results]})
+
+
+@staff_member_required
+def cache_stats_view(request):
+    return JsonResponse(cache_stats())
@@ -0,0 +1,16 @@
+"""
+Celery app for the core project.
+
+Workers are started with ``celery -A core worker``. Settings prefixed with
+``CELERY_`` in core.settings configure the app.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+app = Celery('core')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,104 @@
+"""
+gunicorn settings for production::
+
+    gunicorn -c python:core.gunicorn_config
+
+GUNICORN_PROFILE picks the worker model:
+
+``sync``
+    One request per process, ``2 * CPUs + 1`` processes. Most predictable;
+    the right choice when requests are CPU bound.
+``gthread`` (default)
+    ``CPUs + 1`` processes with GUNICORN_THREADS threads each (default 4).
+    Threads overlap database and cache round trips, and each keeps its own
+    persistent database connection.
+``uvicorn``
+    ``CPUs + 1`` asyncio workers serving ``core.asgi`` (needs
+    ``uvicorn-worker``). Database connections are closed after every
+    request there, as Django recommends for ASGI.
+
+WEB_CONCURRENCY overrides the process count, PORT the port (default 8000).
+"""
+import multiprocessing
+import os
+
+PROFILES = ('sync', 'gthread', 'uvicorn')
+
+profile = os.environ.get('GUNICORN_PROFILE', 'gthread')
+if profile not in PROFILES:
+    raise RuntimeError(f"GUNICORN_PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}")
+
+cpus = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+if profile == 'sync':
+    worker_class = 'sync'
+    default_workers = 2 * cpus + 1
+    threads = 1
+elif profile == 'gthread':
+    worker_class = 'gthread'
+    default_workers = cpus + 1
+    threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+else:
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    default_workers = cpus + 1
+    threads = 1
+    # Persistent connections don't outlive an async request's thread
+    os.environ.setdefault('CONN_MAX_AGE', '0')
+
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers))
+
+wsgi_app = 'core.asgi:application' if profile == 'uvicorn' else 'core.wsgi:application'
+
+# Import Django once in the master and fork the loaded app: faster boots
+# and copy-on-write sharing of the import-time memory.
+preload_app = True
+
+# Recycle workers now and then so slow leaks can't build up; the jitter
+# keeps them from restarting all at once.
+max_requests = 2000
+max_requests_jitter = 200
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat files on tmpfs: Docker's overlay filesystem can stall them.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# GUNICORN_ACCESS_LOG='' turns the access log off (e.g. under load tests)
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# Trust X-Forwarded-* from the proxy in front of us
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def when_ready(server):
+    # Drop any connection opened while preloading before workers are forked
+    # from the master; a socket shared between processes corrupts both.
+    from django.db import DatabaseError, connections
+
+    # Build the make/model catalogue once here, so forked workers start
+    # with it instead of each loading it on its first request.
+    if preload_app:
+        from cars.catalogue import get_catalogue
+        try:
+            get_catalogue()
+        except DatabaseError:
+            server.log.warning("Couldn't preload the make/model catalogue", exc_info=True)
+    connections.close_all()
+
+
+def worker_exit(server, worker):
+    # Without Redis each worker buffers view counts in memory: write them
+    # before the worker is recycled or shut down.
+    from django.db import DatabaseError
+
+    from cars.tracking import flush_local
+    try:
+        flush_local(force=True)
+    except DatabaseError:
+        server.log.warning("Couldn't write the buffered view counts", exc_info=True)
@@ -0,0 +1,205 @@
+"""
+Per-request performance numbers, gathered by RequestMetricsMiddleware.
+
+A measured request records its SQL queries (how many, how long they took and
+how often each statement shape repeated, which is how N+1 loops show up),
+the time spent rendering templates and its total time. The numbers go out in
+a Server-Timing header, and requests over any of the SLOW_REQUEST_*
+thresholds are logged to ``core.instrumentation`` with the numbers attached
+as ``request_metrics``.
+
+REQUEST_METRICS_SAMPLE_RATE is the share of requests measured; at 0 the
+middleware hands requests straight on. With QUERY_BUDGET_STRICT (the default
+in development, and so in tests) every request is measured, and a view that
+runs more queries than its ``query_budget`` raises QueryBudgetExceeded
+instead of logging a warning.
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_metrics', default=None)
+
+# Quoted strings and numbers written into the SQL, and parameter placeholders
+_VALUES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+# A run of values, as in IN (...) lists of any length
+_VALUE_LISTS = re.compile(r'\?(?:\s*,\s*\?)*')
+
+# How many of the most repeated statements a log record lists
+REPORTED_REPEATS = 5
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(queries):
+    """
+    Decorate a view function or class with the most queries a request to it
+    should take.
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def view_budget(view_func):
+    """
+    The ``query_budget`` of a view function, or of the class a class-based
+    view was made from.
+    """
+    budget = getattr(view_func, 'query_budget', None)
+    if budget is None:
+        budget = getattr(getattr(view_func, 'view_class', None), 'query_budget', None)
+    return budget
+
+
+def fingerprint(sql):
+    """
+    ``sql`` with its values left out, so the statements of a loop that
+    differ only in ids come out the same.
+    """
+    return _VALUE_LISTS.sub('?', _VALUES.sub('?', ' '.join(sql.split())))
+
+
+def should_measure():
+    if settings.QUERY_BUDGET_STRICT:
+        return True
+    rate = settings.REQUEST_METRICS_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def current_metrics():
+    """
+    The metrics of the request being measured, None when it isn't.
+    """
+    return _current.get()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_time = 0.0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.queries = 0
+        self.statements = Counter()
+        self.budget = None
+        self.rendering = False
+
+    def activate(self):
+        """
+        Make these the current metrics; returns a token for ``deactivate``.
+        """
+        return _current.set(self)
+
+    def deactivate(self, token):
+        self.total_time = time.perf_counter() - self.started
+        _current.reset(token)
+
+    def __call__(self, execute, sql, params, many, context):
+        # A database execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[fingerprint(sql)] += 1
+
+    def repeated(self):
+        """
+        ``(count, statement)`` for each statement run more than once, most
+        repeated first.
+        """
+        return [(count, sql) for sql, count in self.statements.most_common() if count > 1]
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f'tpl;dur={self.template_time * 1000:.1f}, '
+            f'total;dur={self.total_time * 1000:.1f}'
+        )
+
+    def summary(self, request, response):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(self.total_time * 1000, 1),
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'queries': self.queries,
+            'query_budget': self.budget,
+            'repeated_queries': [
+                {'count': count, 'sql': sql} for count, sql in self.repeated()[:REPORTED_REPEATS]
+            ],
+        }
+
+    def is_slow(self):
+        repeats = self.repeated()
+        return (
+            self.total_time * 1000 >= settings.SLOW_REQUEST_MS
+            or self.queries >= settings.SLOW_REQUEST_QUERIES
+            or (repeats and repeats[0][0] >= settings.SLOW_REQUEST_REPEATED_QUERIES)
+        )
+
+    def report(self, request, response):
+        """
+        Log the request if it was slow, and hold its view to its query
+        budget.
+        """
+        slow = self.is_slow()
+        over_budget = self.budget is not None and self.queries > self.budget
+        if not (slow or over_budget):
+            return
+        summary = self.summary(request, response)
+        if slow:
+            logger.warning(
+                'Slow request %s', json.dumps(summary, sort_keys=True), extra={'request_metrics': summary},
+            )
+        if over_budget:
+            message = f"{summary['view']} took {self.queries} queries, over its budget of {self.budget}"
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(f"{message}; repeated: {summary['repeated_queries']}")
+            logger.warning(message, extra={'request_metrics': summary})
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        # Templates rendered inside another one count once, with it
+        if metrics is None or metrics.rendering:
+            return super().render(context, request)
+        metrics.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.rendering = False
+            metrics.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    The Django template backend, with render times counted toward the
+    measured request's template time.
+    """
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
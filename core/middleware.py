@@ -0,0 +1,53 @@
+from contextlib import ExitStack
+
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+
+from . import instrumentation
+
+
+class PageGZipMiddleware(GZipMiddleware):
+    """
+    Compress rendered pages on the fly. Streamed responses (static and media
+    files) are skipped: static bundles ship pre-compressed siblings and
+    images are compressed formats already.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+        return super().process_response(request, response)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure a sample of requests: queries, database, template and total
+    time, reported in a Server-Timing header and, past the SLOW_REQUEST_*
+    thresholds, in the log (see core.instrumentation). Goes first in
+    MIDDLEWARE, so the total covers every other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not instrumentation.should_measure():
+            return self.get_response(request)
+
+        metrics = instrumentation.RequestMetrics()
+        token = metrics.activate()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        response.headers['Server-Timing'] = metrics.server_timing()
+        metrics.report(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = instrumentation.current_metrics()
+        if metrics is not None:
+            metrics.budget = instrumentation.view_budget(view_func)
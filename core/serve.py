@@ -0,0 +1,224 @@
+"""
+Static and media file serving for deployments without a separate file
+server in front of gunicorn.
+
+Files are streamed with ``FileResponse`` (the WSGI server's ``sendfile``
+wrapper where there is one) and carry ``ETag``/``Last-Modified`` validators,
+so revalidations end in a 304. Single byte ranges are honoured for resumed
+downloads and media seeking. Content-hashed names (collected static files,
+rendered image derivatives) are cacheable for a year.
+
+With ``X_ACCEL_REDIRECT_PREFIX`` set, Django only resolves the file and its
+cache headers and hands the transfer to nginx through ``X-Accel-Redirect``::
+
+    location /internal/ {
+        internal;
+        alias /code/;             # BASE_DIR: staticfiles/ and media/ below it
+        gzip_static on;
+        brotli_static on;         # with ngx_brotli
+    }
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Content-hashed names never change content, so browsers may keep them
+# for a year without revalidating.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Unhashed names (e.g. referenced from old HTML) get a short lifetime.
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+# Preferred first when the browser accepts both.
+CONTENT_CODINGS = ('br', 'gzip')
+
+# Rendered image derivatives carry a content hash, e.g.
+# cars/derivatives/front-card.3f2a9c1b7d4e.webp
+HASHED_MEDIA_RE = re.compile(r'(^|/)derivatives/[^/]+\.[0-9a-f]{12}\.\w+$')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def accepted_codings(request):
+    """
+    Content codings the ``Accept-Encoding`` header allows (q > 0).
+    """
+    codings = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+def resolve(root, path):
+    """
+    Normalised name and filesystem path of ``path`` under ``root``; 404 for
+    anything outside it or missing.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid path")
+    if not os.path.isfile(full_path):
+        raise Http404(f"'{name}' could not be found")
+    return name, full_path
+
+
+def byte_range(request, size, etag, last_modified):
+    """
+    The ``(start, end)`` (inclusive) of a satisfiable single-range request,
+    ``None`` to send the whole file, or ``False`` when the range can't be
+    satisfied. Multi-range requests get the whole file, as RFC 9110 allows.
+    """
+    header = request.headers.get('Range')
+    if not header or request.method != 'GET':
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        # The client's partial copy is stale
+        return None
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(request, full_path, name, *, content_type, cache_control, accel_path=None, coding=None,
+                  vary=False):
+    """
+    Response for the file at ``full_path`` (served as ``name``): conditional
+    (304), partial (206/416) or full, or an ``X-Accel-Redirect`` to
+    ``accel_path`` when that's given.
+    """
+    stat = os.stat(full_path)
+    last_modified = int(stat.st_mtime)
+    etag = f'"{last_modified:x}-{stat.st_size:x}{"-" + coding if coding else ""}"'
+
+    response = HttpResponse(content_type=content_type)
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = cache_control
+    if vary:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if accel_path:
+        # nginx does the conditional and range handling itself
+        response.headers['X-Accel-Redirect'] = quote(accel_path)
+        return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+    if conditional is not response:
+        return conditional
+
+    headers = {key: value for key, value in response.headers.items() if key != 'Content-Type'}
+    headers['Accept-Ranges'] = 'bytes'
+    if coding:
+        headers['Content-Encoding'] = coding
+    requested = byte_range(request, stat.st_size, etag, last_modified)
+    if requested is False:
+        headers['Content-Range'] = f'bytes */{stat.st_size}'
+        return HttpResponse(status=416, headers=headers)
+    if requested:
+        start, end = requested
+        headers['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        headers['Content-Length'] = str(end - start + 1)
+        return StreamingHttpResponse(
+            iter_range(open(full_path, 'rb'), start, end - start + 1),
+            status=206, content_type=content_type, headers=headers,
+        )
+    return FileResponse(
+        open(full_path, 'rb'), content_type=content_type, filename=posixpath.basename(name), headers=headers,
+    )
+
+
+def accel_path(kind, name):
+    prefix = getattr(settings, 'X_ACCEL_REDIRECT_PREFIX', '')
+    return f"{prefix.rstrip('/')}/{kind}/{name}" if prefix else None
+
+
+def guess_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Serve a collected static file from ``STATIC_ROOT``, picking its
+    pre-compressed brotli or gzip sibling when the browser accepts one.
+    """
+    name, full_path = resolve(staticfiles_storage.location, path)
+    hashed = name in getattr(staticfiles_storage, 'hashed_names', ())
+    compressed_path = getattr(staticfiles_storage, 'compressed_path', None)
+    options = {
+        'content_type': guess_type(name),
+        'cache_control': IMMUTABLE_CACHE_CONTROL if hashed else DEFAULT_CACHE_CONTROL,
+        'vary': compressed_path is not None,
+    }
+    redirect = accel_path(os.path.basename(staticfiles_storage.location), name)
+    if redirect:
+        # nginx's gzip_static/brotli_static pick the sibling
+        return file_response(request, full_path, name, accel_path=redirect, **options)
+
+    if compressed_path is not None:
+        accepted = accepted_codings(request)
+        for candidate in CONTENT_CODINGS:
+            if candidate in accepted:
+                sibling = compressed_path(name, candidate)
+                if sibling:
+                    return file_response(request, sibling, name, coding=candidate, **options)
+    return file_response(request, full_path, name, **options)
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded file or image derivative from ``MEDIA_ROOT``.
+    """
+    name, full_path = resolve(settings.MEDIA_ROOT, path)
+    return file_response(
+        request, full_path, name,
+        content_type=guess_type(name),
+        cache_control=IMMUTABLE_CACHE_CONTROL if HASHED_MEDIA_RE.search(name) else DEFAULT_CACHE_CONTROL,
+        accel_path=accel_path(os.path.basename(os.path.normpath(settings.MEDIA_ROOT)), name),
+    )
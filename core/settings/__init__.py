@@ -0,0 +1,11 @@
+"""
+DJANGO_ENV picks the settings module: ``dev`` (the default) or ``prod``.
+Either can also be named directly, e.g.
+DJANGO_SETTINGS_MODULE=core.settings.prod.
+"""
+import os
+
+if os.environ.get('DJANGO_ENV', 'dev') == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
@@ -0,0 +1,267 @@
+"""
+Django settings for core project, shared by the dev and prod modules.
+
+Values come from the environment through django-environ (dev also reads a
+.env file next to manage.py). Generated by 'django-admin startproject' using
+Django 5.2.1.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.2/ref/settings/
+"""
+import os
+from pathlib import Path
+
+import environ
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+env = environ.Env()
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = env('SECRET_KEY', default='django-insecure-$-#k1o91srfi4qk99caoym8*(6ri%5*1x-vugi=8ka%-o(zz6l')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = env.bool('DEBUG', default=False)
+
+ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=['*'])
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+
+    'cars',
+    'accounts',
+    'crispy_forms',
+    "crispy_bootstrap5",
+    'django_filters',
+]
+
+MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PageGZipMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'core.urls'
+
+TEMPLATES = [
+    {
+        # Django's backend, timing renders for core.instrumentation
+        'BACKEND': 'core.instrumentation.DjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'core.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+
+# DATABASE_URL selects the database, e.g. postgres://user:pass@db:5432/name;
+# without it, the SQLite file next to manage.py.
+DATABASES = {
+    'default': env.db('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+}
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # A pool of open connections per worker process, handed to requests as
+    # they come (needs psycopg[pool]). Pooling replaces CONN_MAX_AGE.
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+        'timeout': env.int('DATABASE_POOL_TIMEOUT', default=10),
+    }
+else:
+    # Reuse each thread's connection across requests for this many
+    # seconds instead of reconnecting every time; checked before reuse.
+    DATABASES['default']['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=60)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# A file-backed SQLite test database lets tests run threads against it
+# (an in-memory one locks up under concurrent writers).
+if env('TEST_DATABASE_NAME', default=None):
+    DATABASES['default']['TEST'] = {'NAME': env('TEST_DATABASE_NAME')}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+REDIS_URL = env('REDIS_URL', default=None)
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'sessions': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'session',
+            # Sessions expire on their own schedule
+            'TIMEOUT': None,
+        },
+    }
+    # Session reads and writes skip the database entirely
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+    SESSION_CACHE_ALIAS = 'sessions'
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# How long cached home sections, makes and listing pages live. Entries are
+# invalidated as soon as inventory changes, so this only bounds memory use.
+CAR_CACHE_TIMEOUT = 60 * 60
+
+# Each process reloads its make/model catalogue at least this often (in
+# seconds), besides whenever it sees the makes change (see cars.catalogue).
+CATALOGUE_MAX_AGE = env.int('CATALOGUE_MAX_AGE', default=5 * 60)
+
+# Listing views are counted once per visitor and car within this many
+# seconds, and buffered before they're written (see cars.tracking). Without
+# Redis each process flushes its own buffer this often.
+VIEW_COUNT_DEDUPE_WINDOW = env.int('VIEW_COUNT_DEDUPE_WINDOW', default=30 * 60)
+VIEW_COUNT_FLUSH_INTERVAL = env.int('VIEW_COUNT_FLUSH_INTERVAL', default=60)
+
+# Proxies in front of Django that append the address they got each request
+# from to X-Forwarded-For (nginx in front of gunicorn: 1). With 0 the
+# header is ignored, as clients can send any value.
+TRUSTED_PROXY_HOPS = env.int('TRUSTED_PROXY_HOPS', default=0)
+
+
+# Request instrumentation (see core.instrumentation): the share of requests
+# measured, from 0 (none) to 1, and the total time, query count or repeats
+# of one statement past which a measured request is logged as slow.
+REQUEST_METRICS_SAMPLE_RATE = env.float('REQUEST_METRICS_SAMPLE_RATE', default=0.0)
+SLOW_REQUEST_MS = env.int('SLOW_REQUEST_MS', default=500)
+SLOW_REQUEST_QUERIES = env.int('SLOW_REQUEST_QUERIES', default=50)
+SLOW_REQUEST_REPEATED_QUERIES = env.int('SLOW_REQUEST_REPEATED_QUERIES', default=10)
+# Measure every request, and fail the ones whose view runs more queries than
+# its query_budget instead of logging them.
+QUERY_BUDGET_STRICT = env.bool('QUERY_BUDGET_STRICT', default=False)
+
+
+# Celery
+# https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default=REDIS_URL or 'memory://')
+CELERY_TASK_IGNORE_RESULT = True
+# Without a real broker (local development, tests) tasks run inline.
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=CELERY_BROKER_URL == 'memory://')
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Run with `celery -A core beat`
+CELERY_BEAT_SCHEDULE = {
+    'flush-view-counts': {
+        'task': 'cars.tasks.flush_view_counts',
+        'schedule': float(VIEW_COUNT_FLUSH_INTERVAL),
+    },
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.2/howto/static-files/
+
+# Static files (CSS, JavaScript, Images)
+STATIC_URL = '/static/'
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Media files
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Outside DEBUG, Django serves STATIC_URL and MEDIA_URL itself (see
+# core/serve.py). Behind nginx, set this to an `internal` location aliasing
+# BASE_DIR and Django hands the transfer over with X-Accel-Redirect.
+X_ACCEL_REDIRECT_PREFIX = env('X_ACCEL_REDIRECT_PREFIX', default='')
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
+CRISPY_TEMPLATE_PACK = "bootstrap5"
+
+
+# Add to your project's settings.py
+LOGIN_URL = 'login'
+LOGIN_REDIRECT_URL = 'home'
+LOGOUT_REDIRECT_URL = 'home'
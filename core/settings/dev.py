@@ -0,0 +1,19 @@
+"""
+Local development: DEBUG on, files served by runserver, and views held to
+their query budgets. Variables missing from the environment are read from
+a .env file next to manage.py.
+"""
+from pathlib import Path
+
+import environ
+
+environ.Env.read_env(Path(__file__).resolve().parent.parent.parent / '.env')
+
+from .base import *  # noqa: E402,F401,F403
+from .base import env  # noqa: E402
+
+DEBUG = env.bool('DEBUG', default=True)
+
+# Every request is measured, and a view over its query budget fails, so
+# the test suite catches new N+1 queries
+QUERY_BUDGET_STRICT = env.bool('QUERY_BUDGET_STRICT', default=DEBUG)
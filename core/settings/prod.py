@@ -0,0 +1,49 @@
+"""
+Production: DEBUG off, the secret key, hosts and Redis from the environment
+(no .env file is read), hashed and pre-compressed static files, and compiled
+templates kept in memory.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import REDIS_URL, TEMPLATES, env
+
+DEBUG = False
+
+# Keys that ship with the code, and so are no secret
+PLACEHOLDER_SECRET_KEYS = {'your-secret-key', 'changeme', 'secret'}
+
+SECRET_KEY = env('SECRET_KEY', default='')
+if not SECRET_KEY or SECRET_KEY in PLACEHOLDER_SECRET_KEYS or SECRET_KEY.startswith('django-insecure-'):
+    raise ImproperlyConfigured('Set SECRET_KEY to a long random value.')
+
+ALLOWED_HOSTS = env.list('ALLOWED_HOSTS')
+
+# Cache generations (see cars.cache) are how one worker's writes reach the
+# pages every other worker cached, so the cache has to be shared.
+if not REDIS_URL:
+    raise ImproperlyConfigured('Set REDIS_URL: production needs a cache shared by all worker processes.')
+
+# `collectstatic` writes content-hashed names plus gzip and brotli
+# siblings; pages then reference the hashed names.
+STORAGES = {
+    **STORAGES,  # noqa: F405
+    'staticfiles': {
+        'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Parse each template once per process instead of on every render
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
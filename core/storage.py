@@ -0,0 +1,75 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.functional import cached_property
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip siblings are written
+    brotli = None
+
+# Text assets worth compressing; images and fonts are compressed already.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.html')
+
+# Skip files so small the compressed copy saves next to nothing.
+MIN_COMPRESS_SIZE = 256
+
+
+def compressors():
+    """
+    Map each content coding to the extension of its sibling file and a
+    function compressing bytes with it.
+    """
+    codings = {'gzip': ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        codings['br'] = ('.br', lambda data: brotli.compress(data, quality=11))
+    return codings
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ``collectstatic`` storage that content-hashes every file name (via the
+    manifest) and writes pre-compressed ``.gz`` and, if brotli is installed,
+    ``.br`` siblings of the hashed text assets, so they can be served with
+    far-future cache headers and no per-request compression.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        codings = compressors()
+        for hashed_name in self.hashed_files.values():
+            if not hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            with self.open(hashed_name) as original:
+                data = original.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            for extension, compress in codings.values():
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                name = hashed_name + extension
+                if self.exists(name):
+                    self.delete(name)
+                self._save(name, ContentFile(compressed))
+                yield name, name, True
+
+    @cached_property
+    def hashed_names(self):
+        """
+        Every content-hashed name in the manifest.
+        """
+        return frozenset(self.hashed_files.values())
+
+    def compressed_path(self, name, coding):
+        """
+        Filesystem path of the pre-compressed sibling of ``name`` for the
+        content ``coding`` ('br' or 'gzip'), or None if there isn't one.
+        """
+        extension = {'gzip': '.gz', 'br': '.br'}[coding]
+        path = self.path(name + extension)
+        return path if os.path.exists(path) else None
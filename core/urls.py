@@ -16,11 +16,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.contrib.auth.views import LogoutView
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from cars.views import home
+from core.serve import serve_media, serve_static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -35,3 +36,10 @@ path('logout/', LogoutView.as_view(next_page='home'), name='logout'),
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    # Collected static bundles and uploads, with validators, byte ranges and
+    # long-lived caching of hashed names
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static, name='static'),
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+    ]
@@ -0,0 +1,67 @@
+// Modern navbar scroll effect
+document.addEventListener('DOMContentLoaded', function() {
+    const navbar = document.getElementById('mainNavbar');
+    const navLinks = document.querySelectorAll('.navbar-nav .nav-link');
+
+    // Navbar scroll effect
+    window.addEventListener('scroll', function() {
+        if (window.scrollY > 50) {
+            navbar.classList.add('scrolled');
+        } else {
+            navbar.classList.remove('scrolled');
+        }
+    });
+
+    // Active nav link highlighting
+    const currentLocation = location.pathname;
+    navLinks.forEach(link => {
+        if (link.getAttribute('href') === currentLocation) {
+            link.classList.add('active');
+        }
+    });
+
+    // Auto-dismiss alerts after 5 seconds
+    const alerts = document.querySelectorAll('.alert');
+    alerts.forEach(alert => {
+        setTimeout(() => {
+            const bsAlert = new bootstrap.Alert(alert);
+            bsAlert.close();
+        }, 5000);
+    });
+
+    // Search form enhancement
+    const searchForm = document.querySelector('.search-form');
+    const searchButton = searchForm?.querySelector('button[type="submit"]');
+
+    if (searchForm && searchButton) {
+        searchForm.addEventListener('submit', function() {
+            searchButton.classList.add('btn-loading');
+            searchButton.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+        });
+    }
+
+    // Smooth scroll for anchor links
+    document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+        anchor.addEventListener('click', function (e) {
+            e.preventDefault();
+            const target = document.querySelector(this.getAttribute('href'));
+            if (target) {
+                target.scrollIntoView({
+                    behavior: 'smooth',
+                    block: 'start'
+                });
+            }
+        });
+    });
+
+    // Loading state for buttons
+    document.querySelectorAll('form').forEach(form => {
+        form.addEventListener('submit', function() {
+            const submitButton = form.querySelector('button[type="submit"], input[type="submit"]');
+            if (submitButton) {
+                submitButton.classList.add('btn-loading');
+                submitButton.disabled = true;
+            }
+        });
+    });
+});
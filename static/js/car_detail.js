@@ -0,0 +1,120 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Initialize carousel and thumbnails
+    const carousel = document.getElementById('carCarousel');
+    const thumbnails = document.querySelectorAll('.thumbnail');
+
+    if (carousel && thumbnails.length > 0) {
+        const carouselInstance = new bootstrap.Carousel(carousel);
+
+        // Thumbnail click handlers
+        thumbnails.forEach(function(thumbnail) {
+            thumbnail.addEventListener('click', function() {
+                const slideIndex = parseInt(this.getAttribute('data-bs-slide-to'));
+                carouselInstance.to(slideIndex);
+
+                // Update active thumbnail
+                thumbnails.forEach(thumb => thumb.classList.remove('active'));
+                this.classList.add('active');
+            });
+        });
+
+        // Update active thumbnail when carousel slides
+        carousel.addEventListener('slid.bs.carousel', function(event) {
+            const slideIndex = event.to;
+
+            thumbnails.forEach(function(thumb, index) {
+                thumb.classList.remove('active');
+                if (index === slideIndex) {
+                    thumb.classList.add('active');
+                    // Scroll thumbnail into view
+                    thumb.scrollIntoView({
+                        behavior: 'smooth',
+                        block: 'nearest',
+                        inline: 'center'
+                    });
+                }
+            });
+        });
+    }
+
+    // Intersection Observer for animations
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach((entry) => {
+            if (entry.isIntersecting) {
+                entry.target.classList.add('animate-fade-in-up');
+            }
+        });
+    }, {
+        threshold: 0.1,
+        rootMargin: '0px 0px -50px 0px'
+    });
+
+    // Observe elements for animation
+    document.querySelectorAll('.gallery-section, .quick-specs, .detail-tabs, .sidebar-card, .similar-car-card').forEach((el) => {
+        observer.observe(el);
+    });
+
+    // Contact form enhancement
+    const contactForm = document.querySelector('.contact-form form');
+    if (contactForm) {
+        contactForm.addEventListener('submit', function(e) {
+            const submitButton = this.querySelector('button[type="submit"]');
+            submitButton.innerHTML = '<i class="fas fa-spinner fa-spin"></i>Sending...';
+            submitButton.disabled = true;
+        });
+    }
+
+    // Smooth scroll for tabs
+    document.querySelectorAll('.nav-tabs .nav-link').forEach(tab => {
+        tab.addEventListener('click', function() {
+            setTimeout(() => {
+                document.querySelector('.detail-tabs').scrollIntoView({
+                    behavior: 'smooth',
+                    block: 'start'
+                });
+            }, 100);
+        });
+    });
+
+    // Price formatting animation
+    const priceElement = document.querySelector('.car-price');
+    if (priceElement) {
+        const price = priceElement.textContent;
+        priceElement.textContent = '$0';
+
+        const targetPrice = parseInt(price.replace(/[$,]/g, ''));
+        const increment = Math.ceil(targetPrice / 50);
+        let currentPrice = 0;
+
+        const priceAnimation = setInterval(() => {
+            currentPrice += increment;
+            if (currentPrice >= targetPrice) {
+                currentPrice = targetPrice;
+                clearInterval(priceAnimation);
+            }
+            priceElement.textContent = '$' + currentPrice.toLocaleString();
+        }, 20);
+    }
+
+    // Add loading states to share buttons
+    document.querySelectorAll('.share-btn').forEach(btn => {
+        btn.addEventListener('click', function() {
+            this.style.transform = 'scale(0.95)';
+            setTimeout(() => {
+                this.style.transform = '';
+            }, 150);
+        });
+    });
+
+    // Keyboard navigation for carousel
+    document.addEventListener('keydown', function(e) {
+        if (carousel) {
+            const carouselInstance = bootstrap.Carousel.getInstance(carousel);
+            if (e.key === 'ArrowLeft') {
+                carouselInstance.prev();
+            } else if (e.key === 'ArrowRight') {
+                carouselInstance.next();
+            }
+        }
+    });
+});
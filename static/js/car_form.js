@@ -0,0 +1,360 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Add Bootstrap classes to form elements
+    const formControls = document.querySelectorAll('input[type="text"], input[type="number"], input[type="email"], input[type="url"], select, textarea');
+    formControls.forEach(element => {
+        if (!element.classList.contains('form-check-input')) {
+            element.classList.add('form-control');
+        }
+    });
+
+    // Add Bootstrap classes to select elements
+    const selectElements = document.querySelectorAll('select');
+    selectElements.forEach(select => {
+        select.classList.remove('form-control');
+        select.classList.add('form-select');
+    });
+
+    // Only offer models of the chosen make
+    const makeField = document.querySelector('#id_make');
+    const modelField = document.querySelector('#id_model');
+    if (makeField && modelField && makeField.dataset.modelsUrl) {
+        makeField.addEventListener('change', function() {
+            modelField.length = 1;
+            if (!makeField.value) {
+                return;
+            }
+            fetch(makeField.dataset.modelsUrl + '?make=' + encodeURIComponent(makeField.value))
+                .then(response => response.json())
+                .then(data => {
+                    data.results.forEach(model => modelField.add(new Option(model.name, model.id)));
+                });
+        });
+    }
+
+    // Form validation and progress tracking
+    const form = document.getElementById('carForm');
+    const progressFill = document.getElementById('progressFill');
+    const progressText = document.getElementById('progressText');
+    const submitBtn = document.getElementById('submitBtn');
+    const reconditionSection = document.querySelector('.recondition-section');
+    const carTypeSelect = document.querySelector('#id_car_type');
+
+    // Required fields for progress calculation
+    const requiredFields = [
+        '#id_make', '#id_model', '#id_year', '#id_car_type', '#id_price',
+        '#id_mileage', '#id_engine_capacity', '#id_transmission', '#id_fuel_type',
+        '#id_color', '#id_doors', '#id_seats', '#id_description', '#id_features'
+    ];
+
+    // Toggle reconditioning fields
+    function toggleReconditionFields() {
+        if (carTypeSelect && carTypeSelect.value === 'reconditioned') {
+            reconditionSection.classList.remove('hidden');
+        } else {
+            reconditionSection.classList.add('hidden');
+        }
+    }
+
+    // Calculate form progress
+    function updateProgress() {
+        let completedFields = 0;
+        const totalFields = requiredFields.length;
+
+        requiredFields.forEach(selector => {
+            const field = document.querySelector(selector);
+            if (field && field.value.trim() !== '') {
+                completedFields++;
+            }
+        });
+
+        const progress = Math.round((completedFields / totalFields) * 100);
+        progressFill.style.width = progress + '%';
+
+        if (progress === 100) {
+            progressText.textContent = 'All required fields completed! Ready to publish.';
+            progressText.style.color = '#10b981';
+        } else {
+            progressText.textContent = `${completedFields}/${totalFields} required fields completed (${progress}%)`;
+            progressText.style.color = '#6b7280';
+        }
+    }
+
+    // Initialize
+    if (carTypeSelect) {
+        toggleReconditionFields();
+        carTypeSelect.addEventListener('change', toggleReconditionFields);
+    }
+
+    // Update progress on field changes
+    requiredFields.forEach(selector => {
+        const field = document.querySelector(selector);
+        if (field) {
+            field.addEventListener('input', updateProgress);
+            field.addEventListener('change', updateProgress);
+        }
+    });
+
+    // Initial progress calculation
+    updateProgress();
+
+    // Handle primary image selection
+    const primaryCheckboxes = document.querySelectorAll('input[id$="-is_primary"]');
+    primaryCheckboxes.forEach(checkbox => {
+        checkbox.addEventListener('change', function() {
+            if (this.checked) {
+                primaryCheckboxes.forEach(cb => {
+                    if (cb !== this) {
+                        cb.checked = false;
+                        // Remove primary badge from other images
+                        const card = cb.closest('.image-form-card');
+                        const badge = card.querySelector('.primary-badge');
+                        if (badge) {
+                            badge.remove();
+                        }
+                    }
+                });
+
+                // Add primary badge to selected image
+                const card = this.closest('.image-form-card');
+                const container = card.querySelector('.image-preview-container');
+                let badge = container.querySelector('.primary-badge');
+                if (!badge) {
+                    badge = document.createElement('div');
+                    badge.className = 'primary-badge';
+                    badge.textContent = 'Primary';
+                    container.appendChild(badge);
+                }
+            }
+        });
+    });
+
+    // File input change handlers
+    const fileInputs = document.querySelectorAll('input[type="file"]');
+    fileInputs.forEach(input => {
+        input.addEventListener('change', function() {
+            const file = this.files[0];
+            const card = this.closest('.image-form-card');
+            const container = card.querySelector('.image-preview-container');
+            const placeholder = container.querySelector('.image-placeholder');
+            let preview = container.querySelector('.image-preview');
+
+            if (file) {
+                const reader = new FileReader();
+                reader.onload = function(e) {
+                    if (preview) {
+                        preview.src = e.target.result;
+                    } else {
+                        preview = document.createElement('img');
+                        preview.className = 'image-preview';
+                        preview.src = e.target.result;
+                        preview.alt = 'Car Image Preview';
+
+                        if (placeholder) {
+                            container.replaceChild(preview, placeholder);
+                        } else {
+                            container.appendChild(preview);
+                        }
+                    }
+                };
+                reader.readAsDataURL(file);
+            }
+        });
+    });
+
+    // Form validation summary
+    function showValidationSummary() {
+        const errors = [];
+        const requiredFieldsData = [
+            { id: '#id_make', name: 'Make' },
+            { id: '#id_model', name: 'Model' },
+            { id: '#id_year', name: 'Year' },
+            { id: '#id_car_type', name: 'Car Type' },
+            { id: '#id_price', name: 'Price' },
+            { id: '#id_mileage', name: 'Mileage' },
+            { id: '#id_engine_capacity', name: 'Engine Capacity' },
+            { id: '#id_transmission', name: 'Transmission' },
+            { id: '#id_fuel_type', name: 'Fuel Type' },
+            { id: '#id_color', name: 'Color' },
+            { id: '#id_doors', name: 'Doors' },
+            { id: '#id_seats', name: 'Seats' },
+            { id: '#id_description', name: 'Description' },
+            { id: '#id_features', name: 'Features' }
+        ];
+
+        requiredFieldsData.forEach(field => {
+            const element = document.querySelector(field.id);
+            if (element && !element.value.trim()) {
+                errors.push(field.name);
+            }
+        });
+
+        if (errors.length > 0) {
+            const errorMsg = document.createElement('div');
+            errorMsg.className = 'alert alert-danger mb-3';
+            errorMsg.innerHTML = `
+                <h6><i class="fas fa-exclamation-triangle me-2"></i>Please complete the following required fields:</h6>
+                <ul class="mb-0 mt-2">
+                    ${errors.map(error => `<li>${error}</li>`).join('')}
+                </ul>
+            `;
+
+            // Remove existing error message
+            const existingError = document.querySelector('.alert-danger');
+            if (existingError) {
+                existingError.remove();
+            }
+
+            // Insert at top of form
+            form.insertBefore(errorMsg, form.firstChild);
+
+            // Scroll to top
+            errorMsg.scrollIntoView({ behavior: 'smooth', block: 'center' });
+
+            return false;
+        }
+
+        return true;
+    }
+
+    // Enhanced form submission
+    form.addEventListener('submit', function(e) {
+        // Validate form before submission
+        if (!showValidationSummary()) {
+            e.preventDefault();
+            submitBtn.classList.remove('btn-loading');
+            submitBtn.disabled = false;
+            return;
+        }
+
+        // Show loading state
+        submitBtn.classList.add('btn-loading');
+        submitBtn.disabled = true;
+        submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Processing...';
+
+        // Update progress to 100%
+        progressFill.style.width = '100%';
+        progressText.textContent = 'Submitting your listing...';
+        progressText.style.color = '#10b981';
+    });
+
+    // Image upload enhancements
+    const imageCards = document.querySelectorAll('.image-form-card');
+    imageCards.forEach((card, index) => {
+        const deleteCheckbox = card.querySelector('input[name$="-DELETE"]');
+
+        if (deleteCheckbox) {
+            deleteCheckbox.addEventListener('change', function() {
+                if (this.checked) {
+                    card.style.opacity = '0.5';
+                    card.style.pointerEvents = 'none';
+                } else {
+                    card.style.opacity = '1';
+                    card.style.pointerEvents = 'auto';
+                }
+            });
+        }
+    });
+
+    // Field focus effects
+    const allFormFields = document.querySelectorAll('.form-control, .form-select');
+    allFormFields.forEach(field => {
+        field.addEventListener('focus', function() {
+            this.closest('.form-group').classList.add('focused');
+        });
+
+        field.addEventListener('blur', function() {
+            this.closest('.form-group').classList.remove('focused');
+        });
+    });
+
+    // Auto-resize textareas
+    const textareas = document.querySelectorAll('textarea');
+    textareas.forEach(textarea => {
+        // Set initial rows
+        if (textarea.id === 'id_description') {
+            textarea.rows = 6;
+        } else if (textarea.id === 'id_features') {
+            textarea.rows = 6;
+        }
+
+        // Auto-resize on input
+        textarea.addEventListener('input', function() {
+            this.style.height = 'auto';
+            this.style.height = this.scrollHeight + 'px';
+        });
+    });
+
+    // Price formatting
+    const priceInput = document.querySelector('#id_price');
+    if (priceInput) {
+        priceInput.addEventListener('input', function() {
+            // Remove non-numeric characters except decimal point
+            let value = this.value.replace(/[^0-9.]/g, '');
+
+            // Ensure only one decimal point
+            const parts = value.split('.');
+            if (parts.length > 2) {
+                value = parts[0] + '.' + parts.slice(1).join('');
+            }
+
+            this.value = value;
+        });
+    }
+
+    // Keyboard shortcuts
+    document.addEventListener('keydown', function(e) {
+        // Ctrl/Cmd + S to save
+        if ((e.ctrlKey || e.metaKey) && e.key === 's') {
+            e.preventDefault();
+            form.dispatchEvent(new Event('submit'));
+        }
+
+        // Escape to go back
+        if (e.key === 'Escape') {
+            const backBtn = document.querySelector('.btn-secondary-modern');
+            if (backBtn) {
+                window.location.href = backBtn.href;
+            }
+        }
+    });
+
+    // Smooth scroll animations
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach((entry) => {
+            if (entry.isIntersecting) {
+                entry.target.classList.add('animate-fade-in-up');
+            }
+        });
+    }, {
+        threshold: 0.1,
+        rootMargin: '0px 0px -50px 0px'
+    });
+
+    document.querySelectorAll('.form-section').forEach((el) => {
+        observer.observe(el);
+    });
+
+    // Field validation on blur
+    requiredFields.forEach(selector => {
+        const field = document.querySelector(selector);
+        if (field) {
+            field.addEventListener('blur', function() {
+                if (!this.value.trim()) {
+                    this.style.borderColor = '#dc2626';
+                    this.style.boxShadow = '0 0 0 3px rgba(220, 38, 38, 0.1)';
+                } else {
+                    this.style.borderColor = '#10b981';
+                    this.style.boxShadow = '0 0 0 3px rgba(16, 185, 129, 0.1)';
+
+                    // Reset to normal after a short delay
+                    setTimeout(() => {
+                        this.style.borderColor = '';
+                        this.style.boxShadow = '';
+                    }, 2000);
+                }
+            });
+        }
+    });
+
+    console.log('Modern car form initialized successfully');
+});
@@ -0,0 +1,297 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const filterForm = document.getElementById('filterForm');
+    const loadingOverlay = document.getElementById('loadingOverlay');
+    const sortLinks = document.querySelectorAll('.dropdown-item');
+
+    // Show loading overlay on form submission
+    if (filterForm) {
+        filterForm.addEventListener('submit', function() {
+            showLoading();
+        });
+    }
+
+    // Show loading overlay on sort links
+    sortLinks.forEach(link => {
+        link.addEventListener('click', function() {
+            showLoading();
+        });
+    });
+
+    // Show loading overlay on pagination links
+    document.querySelectorAll('.pagination .page-link').forEach(link => {
+        link.addEventListener('click', function() {
+            if (!this.parentElement.classList.contains('disabled') &&
+                !this.parentElement.classList.contains('active')) {
+                showLoading();
+            }
+        });
+    });
+
+    function showLoading() {
+        loadingOverlay.classList.add('show');
+    }
+
+    // Infinite scroll: append the next page of cards when the sentinel comes into view
+    const scrollSentinel = document.getElementById('infiniteScroll');
+    const carGrid = document.querySelector('.car-grid');
+
+    function escapeHtml(value) {
+        const div = document.createElement('div');
+        div.textContent = value == null ? '' : value;
+        return div.innerHTML;
+    }
+
+    function truncateWords(text, count) {
+        const words = (text || '').split(/\s+/).filter(Boolean);
+        return words.length > count ? words.slice(0, count).join(' ') + ' …' : words.join(' ');
+    }
+
+    function renderCard(car) {
+        const image = car.image || 'https://via.placeholder.com/300x220/667eea/ffffff?text=No+Image';
+        const origin = car.country_of_origin ? `
+            <div class="car-spec-item">
+                <i class="fas fa-globe"></i>
+                ${escapeHtml(car.country_of_origin)}
+            </div>` : '';
+        return `
+            <a href="${escapeHtml(car.url)}" class="car-card">
+                <div class="car-image-container">
+                    <img src="${escapeHtml(image)}" alt="${escapeHtml(car.title)}" class="car-image">
+                    <div class="car-badge badge-${escapeHtml(car.car_type)}">${escapeHtml(car.car_type_display)}</div>
+                </div>
+                <div class="car-content">
+                    <h3 class="car-title">${escapeHtml(car.title)}</h3>
+                    <div class="car-specs">
+                        <div class="car-spec-item">
+                            <i class="fas fa-tachometer-alt"></i>
+                            ${Number(car.mileage).toLocaleString()} km
+                        </div>
+                        <div class="car-spec-item">
+                            <i class="fas fa-cog"></i>
+                            ${escapeHtml(car.transmission)}
+                        </div>
+                        <div class="car-spec-item">
+                            <i class="fas fa-gas-pump"></i>
+                            ${escapeHtml(car.fuel_type)}
+                        </div>
+                        ${origin}
+                    </div>
+                    <p class="car-description">${escapeHtml(truncateWords(car.description, 20))}</p>
+                    <div class="car-footer">
+                        <div class="car-price">$${Math.round(parseFloat(car.price)).toLocaleString()}</div>
+                        <div class="car-posted">${escapeHtml(car.posted_ago)} ago</div>
+                    </div>
+                </div>
+            </a>`;
+    }
+
+    if (scrollSentinel && carGrid && 'IntersectionObserver' in window) {
+        const pagination = document.querySelector('.pagination-container');
+        let loadingMore = false;
+
+        if (pagination) {
+            pagination.style.display = 'none';
+        }
+
+        const observer = new IntersectionObserver(entries => {
+            if (!entries[0].isIntersecting || loadingMore) {
+                return;
+            }
+            loadingMore = true;
+
+            const params = new URLSearchParams(window.location.search);
+            params.delete('page');
+            params.set('cursor', scrollSentinel.dataset.cursor);
+
+            fetch(`${scrollSentinel.dataset.feedUrl}?${params.toString()}`, {
+                headers: {'Accept': 'application/json'}
+            })
+                .then(response => response.json())
+                .then(data => {
+                    carGrid.insertAdjacentHTML('beforeend', data.results.map(renderCard).join(''));
+                    if (data.next_cursor) {
+                        scrollSentinel.dataset.cursor = data.next_cursor;
+                    } else {
+                        observer.disconnect();
+                        scrollSentinel.remove();
+                    }
+                })
+                .catch(() => {
+                    // Fall back to regular pagination links
+                    observer.disconnect();
+                    if (pagination) {
+                        pagination.style.display = '';
+                    }
+                })
+                .finally(() => {
+                    loadingMore = false;
+                });
+        }, {rootMargin: '400px'});
+
+        observer.observe(scrollSentinel);
+    }
+
+    // Auto-submit form on filter changes (optional)
+    const autoSubmitElements = document.querySelectorAll('#filterForm select, #filterForm input[type="radio"]');
+    autoSubmitElements.forEach(element => {
+        element.addEventListener('change', function() {
+            // Optional: Auto-submit form on filter changes
+            // Uncomment the line below if you want instant filtering
+            // filterForm.submit();
+        });
+    });
+
+    // Price range validation
+    const minPriceInput = document.querySelector('input[name="min_price"]');
+    const maxPriceInput = document.querySelector('input[name="max_price"]');
+
+    if (minPriceInput && maxPriceInput) {
+        minPriceInput.addEventListener('input', function() {
+            const minValue = parseFloat(this.value);
+            const maxValue = parseFloat(maxPriceInput.value);
+
+            if (minValue && maxValue && minValue > maxValue) {
+                maxPriceInput.value = minValue;
+            }
+        });
+
+        maxPriceInput.addEventListener('input', function() {
+            const minValue = parseFloat(minPriceInput.value);
+            const maxValue = parseFloat(this.value);
+
+            if (minValue && maxValue && maxValue < minValue) {
+                minPriceInput.value = maxValue;
+            }
+        });
+    }
+
+    // Year range validation
+    const minYearInput = document.querySelector('input[name="min_year"]');
+    const maxYearInput = document.querySelector('input[name="max_year"]');
+    const currentYear = new Date().getFullYear();
+
+    if (minYearInput && maxYearInput) {
+        minYearInput.addEventListener('input', function() {
+            const minValue = parseInt(this.value);
+            const maxValue = parseInt(maxYearInput.value);
+
+            if (minValue && minValue > currentYear) {
+                this.value = currentYear;
+            }
+
+            if (minValue && maxValue && minValue > maxValue) {
+                maxYearInput.value = minValue;
+            }
+        });
+
+        maxYearInput.addEventListener('input', function() {
+            const minValue = parseInt(minYearInput.value);
+            const maxValue = parseInt(this.value);
+
+            if (maxValue && maxValue > currentYear) {
+                this.value = currentYear;
+            }
+
+            if (minValue && maxValue && maxValue < minValue) {
+                minYearInput.value = maxValue;
+            }
+        });
+    }
+
+    // Smooth scroll to top when filtering
+    if (window.location.search.includes('page=') || window.location.search.includes('sort=')) {
+        window.scrollTo({ top: 0, behavior: 'smooth' });
+    }
+
+    // Add fade-in animation to car cards
+    const observerOptions = {
+        threshold: 0.1,
+        rootMargin: '0px 0px -50px 0px'
+    };
+
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                entry.target.style.opacity = '0';
+                entry.target.style.transform = 'translateY(20px)';
+                entry.target.style.transition = 'opacity 0.6s ease, transform 0.6s ease';
+
+                setTimeout(() => {
+                    entry.target.style.opacity = '1';
+                    entry.target.style.transform = 'translateY(0)';
+                }, 100);
+
+                observer.unobserve(entry.target);
+            }
+        });
+    }, observerOptions);
+
+    // Observe car cards for animation
+    document.querySelectorAll('.car-card').forEach(card => {
+        observer.observe(card);
+    });
+
+    // Mobile filter toggle (if needed)
+    const filterToggle = document.getElementById('filterToggle');
+    const filterSidebar = document.querySelector('.filter-sidebar');
+
+    if (filterToggle && filterSidebar) {
+        filterToggle.addEventListener('click', function() {
+            filterSidebar.classList.toggle('show');
+        });
+    }
+
+    // Clear individual filters
+    document.querySelectorAll('.filter-clear').forEach(button => {
+        button.addEventListener('click', function() {
+            const filterType = this.dataset.filter;
+
+            if (filterType === 'car_type') {
+                document.getElementById('type_all').checked = true;
+            } else if (filterType === 'make') {
+                document.getElementById('make').value = '';
+            } else if (filterType === 'price') {
+                document.querySelector('input[name="min_price"]').value = '';
+                document.querySelector('input[name="max_price"]').value = '';
+            } else if (filterType === 'year') {
+                document.querySelector('input[name="min_year"]').value = '';
+                document.querySelector('input[name="max_year"]').value = '';
+            } else if (filterType === 'transmission') {
+                document.getElementById('transmission').value = '';
+            } else if (filterType === 'fuel_type') {
+                document.getElementById('fuel_type').value = '';
+            }
+        });
+    });
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+  // For car type selection
+  const carTypeInputs = document.querySelectorAll('input[name="car_type"]');
+  carTypeInputs.forEach(input => {
+    input.addEventListener('click', function() {
+      // Submit the form when a car type is clicked
+      document.getElementById('car-filter-form').submit();
+    });
+  });
+
+  // Offer the chosen make's models, from the catalogue endpoint
+  const makeSelect = document.querySelector('select[name="make"]');
+  const modelSelect = document.querySelector('select[name="model"]');
+  const modelFilter = document.getElementById('modelFilter');
+  if (makeSelect && modelSelect && makeSelect.dataset.modelsUrl) {
+    makeSelect.addEventListener('change', function() {
+      modelSelect.length = 1;
+      if (!makeSelect.value) {
+        modelFilter.hidden = true;
+        return;
+      }
+      fetch(makeSelect.dataset.modelsUrl + '?make=' + encodeURIComponent(makeSelect.value))
+        .then(response => response.json())
+        .then(data => {
+          data.results.forEach(model => modelSelect.add(new Option(model.name, model.id)));
+          modelFilter.hidden = data.results.length === 0;
+        });
+    });
+  }
+});
@@ -0,0 +1,41 @@
+// Add smooth scrolling and animations
+document.addEventListener('DOMContentLoaded', function() {
+    // Intersection Observer for animations
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach((entry) => {
+            if (entry.isIntersecting) {
+                entry.target.classList.add('animate-fade-in-up');
+            }
+        });
+    });
+
+    // Observe all cards
+    document.querySelectorAll('.car-card, .feature-card').forEach((el) => {
+        observer.observe(el);
+    });
+
+    // Add loading state to search form
+    const searchForm = document.querySelector('.search-form');
+    const searchButton = document.querySelector('.btn-search');
+
+    if (searchForm && searchButton) {
+        searchForm.addEventListener('submit', function() {
+            searchButton.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i>Searching...';
+            searchButton.disabled = true;
+        });
+    }
+
+    // Smooth scroll for anchor links
+    document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+        anchor.addEventListener('click', function (e) {
+            e.preventDefault();
+            const target = document.querySelector(this.getAttribute('href'));
+            if (target) {
+                target.scrollIntoView({
+                    behavior: 'smooth',
+                    block: 'start'
+                });
+            }
+        });
+    });
+});
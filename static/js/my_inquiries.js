@@ -0,0 +1,12 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const selectAll = document.getElementById('select-all-inquiries');
+    if (!selectAll) {
+        return;
+    }
+    const checkboxes = document.querySelectorAll('.inquiry-checkbox');
+    selectAll.addEventListener('change', function() {
+        checkboxes.forEach(checkbox => {
+            checkbox.checked = selectAll.checked;
+        });
+    });
+});
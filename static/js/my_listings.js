@@ -0,0 +1,20 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('listing-bulk-form');
+    if (!form) {
+        return;
+    }
+    const selectAll = document.getElementById('select-all-listings');
+    const checkboxes = document.querySelectorAll('.listing-checkbox');
+    selectAll.addEventListener('change', function() {
+        checkboxes.forEach(checkbox => {
+            checkbox.checked = selectAll.checked;
+        });
+    });
+
+    form.addEventListener('submit', function(event) {
+        const message = event.submitter && event.submitter.dataset.confirm;
+        if (message && !confirm(message)) {
+            event.preventDefault();
+        }
+    });
+});